@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from one_stop_booking_hub.images import image_pipeline
+        from .models import CustomUser
+        image_pipeline.register(CustomUser, 'profile_photo')
@@ -5,7 +5,10 @@ from django.contrib import messages
 from django.contrib.auth.forms import AuthenticationForm
 from .forms import CustomUserCreationForm
 from .models import CustomUser
+from one_stop_booking_hub.page_cache import cache_anonymous_page
+from sabji_market import guest_cart
 
+@cache_anonymous_page()
 def home_view(request):
     """Home page view - accessible to all users"""
     return render(request, 'home.html')
@@ -23,10 +26,11 @@ def login_view(request):
             user = authenticate(username=username, password=password)
             if user is not None:
                 login(request, user)
+                guest_cart.merge(request, user)
                 messages.success(request, f'Welcome back, {username}!')
                 # Redirect to next page or home
                 next_page = request.GET.get('next', 'accounts:home')
-                return redirect(next_page)
+                return guest_cart.clear(redirect(next_page))
             else:
                 messages.error(request, 'Invalid username or password.')
         else:
@@ -48,7 +52,8 @@ def register_view(request):
             username = form.cleaned_data.get('username')
             messages.success(request, f'Account created for {username}!')
             login(request, user)  # Auto login after registration
-            return redirect('accounts:home')
+            guest_cart.merge(request, user)
+            return guest_cart.clear(redirect('accounts:home'))
         else:
             messages.error(request, 'Please correct the errors below.')
     else:
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CabBookingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cab_booking'
+
+    def ready(self):
+        from . import signals  # noqa: F401
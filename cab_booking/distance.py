@@ -0,0 +1,323 @@
+# cab_booking/distance.py
+import csv
+import heapq
+import math
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+from decimal import Decimal
+from pathlib import Path
+from xml.etree import ElementTree
+
+from django.conf import settings
+
+from one_stop_booking_hub.geo import GridIndex, haversine_km
+
+# Bundled localities of major cities with approximate coordinates; point
+# settings.LOCALITY_GAZETTEER_FILE at a fuller table with the same columns
+BUNDLED_GAZETTEER = Path(__file__).resolve().parent / 'data' / 'localities.csv'
+
+# Typical ratio of road to straight-line distance within Indian cities
+DETOUR_FACTOR = 1.3
+
+# Longer trips are outstation travel, which these fares do not cover
+MAX_TRIP_KM = 150
+
+# Trip ends farther than this from any road node are routed by the estimate
+SNAP_KM = 1.0
+
+# Road graph cells of 0.01 degree are about 1.1 km tall, so a snap looks at a few cells
+GRAPH_CELL_DEGREES = 0.01
+
+# Highway values of ways a car can drive along
+DRIVABLE = frozenset({
+    'motorway', 'motorway_link', 'trunk', 'trunk_link', 'primary', 'primary_link',
+    'secondary', 'secondary_link', 'tertiary', 'tertiary_link', 'unclassified',
+    'residential', 'living_street', 'service', 'road',
+})
+
+# Normalized location pairs remembered per process
+DEFAULT_MAXSIZE = 4096
+
+TOKEN_RE = re.compile(r'\w+')
+COORDINATES_RE = re.compile(r'^\s*(-?\d{1,2}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)\s*$')
+
+Place = namedtuple('Place', 'name city latitude longitude')
+Route = namedtuple('Route', 'distance_km method origin destination')
+
+
+def normalize(text):
+    return ' '.join(TOKEN_RE.findall((text or '').lower()))
+
+
+class RouteError(ValueError):
+    """A trip that cannot be quoted; ``field`` names the form field at fault, if any"""
+
+    field = None
+
+
+class UnknownLocation(RouteError):
+    def __init__(self, end, text):
+        self.field = f'{end}_location'
+        self.text = text
+        super().__init__(f'Could not find "{text}"; try a locality and city, e.g. "MP Nagar, Bhopal"')
+
+
+class Gazetteer:
+    """Locality names and aliases to places, loaded once from a CSV.
+
+    A location is read as the longest run of words that names a locality,
+    so "Near Gate 2, MP Nagar Zone 1" finds MP Nagar. Names several cities
+    share ("Airport", "MG Road") are settled by a city named in the text or
+    passed by the caller, and are otherwise left unresolved.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.names = None
+        self.cities = None
+        self.longest = 0
+        self.lock = threading.Lock()
+
+    def load(self):
+        path = self.path or getattr(settings, 'LOCALITY_GAZETTEER_FILE', None) or BUNDLED_GAZETTEER
+        names = defaultdict(list)
+        cities = {}
+        with open(path, newline='', encoding='utf-8') as handle:
+            for row in csv.DictReader(handle):
+                try:
+                    place = Place(
+                        row['locality'].strip(), row['city'].strip(),
+                        float(row['latitude']), float(row['longitude']),
+                    )
+                except (KeyError, AttributeError, ValueError):
+                    continue
+                keys = {normalize(alias) for alias in [place.name, *(row.get('aliases') or '').split(';')]}
+                keys.discard('')
+                for key in keys:
+                    if place not in names[key]:
+                        names[key].append(place)
+                # The city's own row makes its names (and aliases) city mentions
+                if normalize(place.name) == normalize(place.city):
+                    cities.update(dict.fromkeys(keys, place.city))
+        self.longest = max((len(key.split(' ')) for key in names), default=0)
+        self.cities = cities
+        self.names = dict(names)
+
+    def ensure_loaded(self):
+        if self.names is None:
+            with self.lock:
+                if self.names is None:
+                    self.load()
+
+    def places(self):
+        self.ensure_loaded()
+        return sorted({place for places in self.names.values() for place in places})
+
+    def labels(self):
+        """A display name per place, with the city added where another place shares the name"""
+        places = self.places()
+        counts = Counter(place.name for place in places)
+        return sorted(place.name if counts[place.name] == 1 else f'{place.name}, {place.city}' for place in places)
+
+    def phrases(self, words):
+        """Runs of up to ``longest`` words, longest first"""
+        for size in range(min(self.longest, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                yield ' '.join(words[start:start + size])
+
+    def resolve(self, text, city=None):
+        """The Place ``text`` names, or None; ``city`` settles names shared between cities"""
+        self.ensure_loaded()
+        match = COORDINATES_RE.match(text or '')
+        if match:
+            latitude, longitude = float(match.group(1)), float(match.group(2))
+            if abs(latitude) <= 90 and abs(longitude) <= 180:
+                return Place(text.strip(), None, latitude, longitude)
+            return None
+
+        words = normalize(text).split()
+        phrases = list(self.phrases(words))
+        city = next((self.cities[phrase] for phrase in phrases if phrase in self.cities), city)
+        for phrase in phrases:
+            places = self.names.get(phrase)
+            if not places:
+                continue
+            if len(places) == 1:
+                return places[0]
+            for place in places:
+                if place.city == city:
+                    return place
+        return None
+
+
+class RoadGraph:
+    """Drivable ways of an OpenStreetMap XML extract, as a graph for shortest paths"""
+
+    def __init__(self):
+        self.nodes = {}
+        # Node id to [(neighbour, km)]
+        self.edges = defaultdict(list)
+        self.index = GridIndex(cell_degrees=GRAPH_CELL_DEGREES)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @classmethod
+    def load(cls, path):
+        coordinates = {}
+        ways = []
+        for event, element in ElementTree.iterparse(path):
+            if element.tag == 'node':
+                coordinates[int(element.get('id'))] = (float(element.get('lat')), float(element.get('lon')))
+                element.clear()
+            elif element.tag == 'way':
+                tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+                if tags.get('highway') in DRIVABLE:
+                    ways.append(([int(nd.get('ref')) for nd in element.iter('nd')], tags.get('oneway', 'no')))
+                element.clear()
+
+        graph = cls()
+        for refs, oneway in ways:
+            if oneway == '-1':
+                refs.reverse()
+            for a, b in zip(refs, refs[1:]):
+                if a in coordinates and b in coordinates:
+                    graph.connect(a, coordinates[a], b, coordinates[b], both=oneway not in ('yes', 'true', '1', '-1'))
+        return graph
+
+    def connect(self, a, point_a, b, point_b, both=True):
+        for node, point in ((a, point_a), (b, point_b)):
+            if node not in self.nodes:
+                self.nodes[node] = point
+                self.index.add(node, *point)
+        km = haversine_km(*point_a, *point_b)
+        self.edges[a].append((b, km))
+        if both:
+            self.edges[b].append((a, km))
+
+    def shortest_km(self, source, target):
+        """Length of the shortest path by A*, with straight-line distance as the heuristic; None if unreachable"""
+        goal = self.nodes[target]
+        best = {source: 0.0}
+        heap = [(haversine_km(*self.nodes[source], *goal), 0.0, source)]
+        while heap:
+            estimate, km, node = heapq.heappop(heap)
+            if node == target:
+                return km
+            if km > best[node]:
+                continue
+            for neighbour, length in self.edges.get(node, ()):
+                total = km + length
+                if total < best.get(neighbour, math.inf):
+                    best[neighbour] = total
+                    heapq.heappush(heap, (total + haversine_km(*self.nodes[neighbour], *goal), total, neighbour))
+        return None
+
+    def route_km(self, origin, destination):
+        """Road distance between two Places, counting the walk to and from the road; None if off the graph"""
+        start = self.index.nearest(origin.latitude, origin.longitude, 1, SNAP_KM)
+        end = self.index.nearest(destination.latitude, destination.longitude, 1, SNAP_KM)
+        if not start or not end:
+            return None
+        (approach, source), (departure, target) = start[0], end[0]
+        path = self.shortest_km(source, target)
+        return None if path is None else approach + path + departure
+
+
+class DistanceEngine:
+    """Trip distances between free-text locations, memoized in a bounded LRU.
+
+    Both ends are resolved against the gazetteer, each using the other's
+    city to settle shared names. With a road graph configured
+    (settings.ROAD_GRAPH_FILE) the distance is the shortest drivable path;
+    otherwise, or when an end is off the graph, it is the great-circle
+    distance times DETOUR_FACTOR. Routes are keyed by the normalized pair of
+    texts, so the repeated quotes of a customer filling in the booking form
+    cost one dictionary lookup.
+    """
+
+    def __init__(self, gazetteer=None, graph_path=None, maxsize=DEFAULT_MAXSIZE):
+        self.gazetteer = gazetteer or Gazetteer()
+        self.graph_path = graph_path
+        self.graph = None
+        self.graph_loaded = False
+        self.maxsize = maxsize
+        self.routes = OrderedDict()
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.routes),
+            'maxsize': self.maxsize,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+
+    def get_graph(self):
+        if not self.graph_loaded:
+            with self.lock:
+                if not self.graph_loaded:
+                    path = self.graph_path or getattr(settings, 'ROAD_GRAPH_FILE', None)
+                    self.graph = RoadGraph.load(path) if path else None
+                    self.graph_loaded = True
+        return self.graph
+
+    def route(self, pickup, drop):
+        """The Route from ``pickup`` to ``drop``; raises RouteError"""
+        key = (normalize(pickup), normalize(drop))
+        with self.lock:
+            route = self.routes.get(key)
+            if route is not None:
+                self.routes.move_to_end(key)
+                self.hits += 1
+                return route
+
+        route = self.compute(pickup, drop)
+        with self.lock:
+            self.misses += 1
+            self.routes[key] = route
+            while len(self.routes) > self.maxsize:
+                self.routes.popitem(last=False)
+                self.evictions += 1
+        return route
+
+    def compute(self, pickup, drop):
+        resolve = self.gazetteer.resolve
+        origin = resolve(pickup)
+        destination = resolve(drop, origin.city if origin else None)
+        if origin is None and destination is not None:
+            origin = resolve(pickup, destination.city)
+        if origin is None:
+            raise UnknownLocation('pickup', pickup)
+        if destination is None:
+            raise UnknownLocation('drop', drop)
+
+        straight = haversine_km(origin.latitude, origin.longitude, destination.latitude, destination.longitude)
+        if straight > MAX_TRIP_KM:
+            raise RouteError(
+                f'{origin.name} and {destination.name} are {straight:.0f} km apart; '
+                f'trips are limited to {MAX_TRIP_KM} km'
+            )
+        graph = self.get_graph()
+        km = graph.route_km(origin, destination) if graph is not None else None
+        method = 'road'
+        if km is None:
+            km, method = straight * DETOUR_FACTOR, 'estimate'
+        return Route(Decimal(km).quantize(Decimal('0.01')), method, origin, destination)
+
+
+distance_engine = DistanceEngine()
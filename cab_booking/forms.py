@@ -1,6 +1,7 @@
 # cab_booking/forms.py
 from django import forms
-from .models import CabBooking, CabService, CabType
+from one_stop_booking_hub.reference_cache import CachedModelChoiceField
+from .models import CabBooking
 
 class CabBookingForm(forms.ModelForm):
     class Meta:
@@ -13,6 +14,10 @@ class CabBookingForm(forms.ModelForm):
             'pickup_time',
             'special_instructions'
         ]
+        field_classes = {
+            'cab_service': CachedModelChoiceField,
+            'cab_type': CachedModelChoiceField,
+        }
         widgets = {
             'pickup_time': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
             'pickup_location': forms.TextInput(attrs={'placeholder': 'Enter pickup location'}),
@@ -21,10 +26,9 @@ class CabBookingForm(forms.ModelForm):
         }
 
 class FareCalculatorForm(forms.Form):
+    # Quotes every active service and cab type, so there is nothing to choose
     pickup_location = forms.CharField(max_length=200, widget=forms.TextInput(attrs={'placeholder': 'Pickup location'}))
     drop_location = forms.CharField(max_length=200, widget=forms.TextInput(attrs={'placeholder': 'Drop location'}))
-    cab_service = forms.ModelChoiceField(queryset=CabService.objects.filter(is_active=True))
-    cab_type = forms.ModelChoiceField(queryset=CabType.objects.all())
 
 class BookingSearchForm(forms.Form):
     booking_id = forms.CharField(max_length=20, required=False, widget=forms.TextInput(attrs={'placeholder': 'Booking ID'}))
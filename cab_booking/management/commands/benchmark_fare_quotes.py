@@ -0,0 +1,98 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from cab_booking.distance import DistanceEngine, Gazetteer, RoadGraph
+from cab_booking.models import CabService, CabType
+from cab_booking.tariffs import TariffTable
+
+# Lattice spacing of the synthetic road graph, about half a kilometre
+GRID_STEP = 0.005
+
+
+class Command(BaseCommand):
+    help = 'Time trip distance quotes between gazetteer localities, cold and through the route LRU, and tariff comparisons'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quotes', type=int, default=10_000)
+        parser.add_argument('--pairs', type=int, default=2000, help='Distinct pickup/drop pairs quoted')
+        parser.add_argument('--services', type=int, default=10, help='Synthetic services in the tariff table')
+        parser.add_argument('--grid', type=int, default=0, help='Route over an N x N synthetic road lattice around Bhopal')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        gazetteer = Gazetteer()
+        places = gazetteer.places()
+        graph = None
+        if options['grid']:
+            graph = self.lattice(options['grid'])
+            places = [place for place in places if place.city == 'Bhopal']
+            self.stdout.write(f'Routing over a synthetic graph of {len(graph)} road nodes')
+
+        by_city = {}
+        for place in places:
+            by_city.setdefault(place.city, []).append(place)
+        cities = [city for city, members in by_city.items() if len(members) > 1]
+        pairs = []
+        while len(pairs) < options['pairs']:
+            origin, destination = rng.sample(by_city[rng.choice(cities)], 2)
+            pairs.append((f'{origin.name}, {origin.city}', f'{destination.name}, {destination.city}'))
+        # Popular trips recur: weight pairs like a Zipf distribution
+        trips = rng.choices(pairs, weights=[1 / (rank + 1) for rank in range(len(pairs))], k=options['quotes'])
+
+        cold = self.engine(gazetteer, graph, maxsize=0)
+        rate = self.run(cold, pairs)
+        self.stdout.write(f'    cold: {rate:10.0f} quotes/s over {len(pairs)} distinct pairs')
+
+        warm = self.engine(gazetteer, graph)
+        rate = self.run(warm, trips)
+        stats = warm.stats()
+        self.stdout.write(
+            f'     lru: {rate:10.0f} quotes/s over {len(trips)} quotes, '
+            f'hit ratio {stats["hit_ratio"]:.2%}, {stats["size"]} routes cached'
+        )
+        if rate >= 10_000:
+            self.stdout.write(self.style.SUCCESS('Quotes through the LRU sustain 10k per second'))
+
+        # Unsaved rows: the table only reads their fields
+        services = [
+            CabService(pk=pk, name=f'Service {pk}', base_fare=rng.randint(30, 80), per_km_rate=rng.randint(8, 20))
+            for pk in range(options['services'])
+        ]
+        cab_types = [CabType(pk=pk, name=name, price_multiplier=multiplier) for pk, (name, multiplier) in enumerate(
+            (('mini', '0.90'), ('sedan', '1.00'), ('suv', '1.40'), ('luxury', '2.20'))
+        )]
+        table = TariffTable(services, cab_types)
+        distances = [warm.route(pickup, drop).distance_km for pickup, drop in trips]
+        start = time.perf_counter()
+        for distance in distances:
+            table.fares(distance)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f' tariffs: {len(distances) / elapsed:10.0f} comparisons/s of {len(table)} fares each, '
+            f'{elapsed / len(distances) * 1e6:.1f} us per trip'
+        )
+
+    def engine(self, gazetteer, graph, maxsize=None):
+        engine = DistanceEngine(gazetteer) if maxsize is None else DistanceEngine(gazetteer, maxsize=maxsize)
+        engine.graph, engine.graph_loaded = graph, True
+        return engine
+
+    def run(self, engine, trips):
+        start = time.perf_counter()
+        for pickup, drop in trips:
+            engine.route(pickup, drop)
+        return len(trips) / (time.perf_counter() - start)
+
+    def lattice(self, size):
+        graph = RoadGraph()
+        south, west = 23.26 - size * GRID_STEP / 2, 77.41 - size * GRID_STEP / 2
+        points = [(south + row * GRID_STEP, west + col * GRID_STEP) for row in range(size) for col in range(size)]
+        for node, point in enumerate(points):
+            if (node + 1) % size:
+                graph.connect(node, point, node + 1, points[node + 1])
+            if node + size < len(points):
+                graph.connect(node, point, node + size, points[node + size])
+        return graph
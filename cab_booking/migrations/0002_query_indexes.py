@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cab_booking', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='cabbooking',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AddIndex(
+            model_name='cabbooking',
+            index=models.Index(fields=['user', '-created_at'], name='cabbooking_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='driver',
+            index=models.Index(fields=['cab_service', 'vehicle_type', 'is_available'], name='driver_service_type_avail_idx'),
+        ),
+    ]
@@ -1,7 +1,7 @@
 # cab_booking/models.py
 from django.db import models
 from django.conf import settings
-import uuid
+from one_stop_booking_hub.ids import new_id
 
 class CabService(models.Model):
     """Different cab service providers (Ola, Uber, etc.)"""
@@ -40,6 +40,11 @@ class Driver(models.Model):
     is_available = models.BooleanField(default=True)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=5.00)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['cab_service', 'vehicle_type', 'is_available'], name='driver_service_type_avail_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.vehicle_number}"
 
@@ -80,12 +85,18 @@ class CabBooking(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.booking_id:
-            self.booking_id = f"CAB{uuid.uuid4().hex[:8].upper()}"
+            self.booking_id = new_id('CAB')
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.booking_id} - {self.user.username}"
 
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='cabbooking_user_created_idx'),
+        ]
+
 class FareCalculation(models.Model):
     """Store fare calculation details"""
     booking = models.OneToOneField(CabBooking, on_delete=models.CASCADE)
@@ -0,0 +1,16 @@
+# cab_booking/query_plans.py
+"""Main query of each cab booking view, checked by the check_query_plans command.
+
+Each entry is (label, callable returning an unevaluated queryset), built by
+the same helper the view calls. Sample ids are fine: EXPLAIN only needs the
+query shape.
+"""
+from .views import booking_list, get_available_drivers, recent_bookings, user_bookings
+
+QUERY_PLANS = [
+    ('cab_booking_home: recent bookings', lambda: recent_bookings(1)),
+    ('my_bookings', lambda: booking_list(1, {}).page_queryset()),
+    ('my_bookings: by status', lambda: booking_list(1, {'status': 'completed'}).page_queryset()),
+    ('booking_detail', lambda: user_bookings(1).filter(booking_id='CAB00000000')),
+    ('available drivers', lambda: get_available_drivers(1, 1)),
+]
@@ -0,0 +1,21 @@
+# cab_booking/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from one_stop_booking_hub.reference_cache import reference_cache
+
+from .models import CabService, CabType
+from .tariffs import tariffs
+
+
+@receiver(post_save, sender=CabService)
+@receiver(post_save, sender=CabType)
+@receiver(post_delete, sender=CabService)
+@receiver(post_delete, sender=CabType)
+def reload_tariffs(sender, **kwargs):
+    tariffs.reset()
+
+
+# Tariff tables are keyed off these versions, so every process must bump them
+reference_cache.register(CabService)
+reference_cache.register(CabType)
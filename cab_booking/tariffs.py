@@ -0,0 +1,129 @@
+# cab_booking/tariffs.py
+import threading
+from collections import namedtuple
+from decimal import Decimal
+from types import MappingProxyType
+
+from one_stop_booking_hub.reference_cache import reference_cache
+
+from .models import CabService, CabType
+
+# Fares are whole paise, distances and multipliers whole hundredths, so the
+# per-km part of a fare comes out in 1/10000ths of a paisa
+SCALE = 100 * 100
+HALF = SCALE // 2
+
+Quote = namedtuple('Quote', 'service cab_type fare')
+
+
+def hundredths(value):
+    """Integer hundredths of a rupee amount, distance or multiplier"""
+    return int((Decimal(str(value)) * 100).to_integral_value())
+
+
+def fare_paise(base, rate, distance):
+    """Fare from a base fare in paise, a rate in paise x hundredths per km, and hundredths of a km"""
+    return base + (distance * rate + HALF) // SCALE
+
+
+def rupees(paise):
+    return Decimal(paise).scaleb(-2)
+
+
+class TariffTable:
+    """Immutable fares of every active service and cab type, as flat tuples of integers.
+
+    Combination ``i`` is service ``i // len(cab_types)`` with cab type
+    ``i % len(cab_types)``; its base fare and per-km rate, the service's rate
+    times the type's multiplier, are computed once here, so quoting a trip
+    for every combination is one pass of integer arithmetic.
+    """
+
+    __slots__ = ('services', 'cab_types', 'version', 'bases', 'rates', 'positions')
+
+    def __init__(self, services, cab_types, version=None):
+        assign = super().__setattr__
+        assign('services', tuple(services))
+        assign('cab_types', tuple(cab_types))
+        assign('version', version)
+        combinations = [(service, cab_type) for service in self.services for cab_type in self.cab_types]
+        assign('bases', tuple(hundredths(service.base_fare) for service, cab_type in combinations))
+        assign('rates', tuple(
+            hundredths(service.per_km_rate) * hundredths(cab_type.price_multiplier)
+            for service, cab_type in combinations
+        ))
+        assign('positions', MappingProxyType({
+            (service.pk, cab_type.pk): position
+            for position, (service, cab_type) in enumerate(combinations)
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TariffTable is immutable; build a new one')
+
+    def __len__(self):
+        return len(self.bases)
+
+    def fares(self, distance_km):
+        """Fare in paise of every combination, in table order"""
+        distance = hundredths(distance_km)
+        # fare_paise inlined: this loop is the whole cost of a comparison
+        return [base + (distance * rate + HALF) // SCALE for base, rate in zip(self.bases, self.rates)]
+
+    def quote(self, service_id, cab_type_id, distance_km):
+        """The Quote for one combination; raises KeyError for an inactive or unknown one"""
+        position = self.positions[(int(service_id), int(cab_type_id))]
+        width = len(self.cab_types)
+        fare = fare_paise(self.bases[position], self.rates[position], hundredths(distance_km))
+        return Quote(self.services[position // width], self.cab_types[position % width], rupees(fare))
+
+    def quotes(self, distance_km):
+        """A Quote per combination, in rupees"""
+        width = len(self.cab_types)
+        return [
+            Quote(self.services[position // width], self.cab_types[position % width], rupees(fare))
+            for position, fare in enumerate(self.fares(distance_km))
+        ]
+
+    def grid(self, distance_km):
+        """``(service, [fare per cab type])`` rows for a comparison table"""
+        fares = [rupees(fare) for fare in self.fares(distance_km)]
+        width = len(self.cab_types)
+        return [
+            (service, fares[row * width:(row + 1) * width])
+            for row, service in enumerate(self.services)
+        ]
+
+
+class Tariffs:
+    """The current TariffTable, rebuilt when services or cab types change.
+
+    Save/delete signals drop this process's table; other processes notice
+    through the reference cache's versions, which the same writes bump. A
+    steady-state lookup is two shared-cache reads and no queries.
+    """
+
+    def __init__(self):
+        self.current = None
+        self.lock = threading.Lock()
+
+    def table(self):
+        version = reference_cache.version_tag(CabService, CabType)
+        table = self.current
+        if table is None or table.version != version:
+            with self.lock:
+                table = self.current
+                if table is None or table.version != version:
+                    table = TariffTable(
+                        reference_cache.get_list(CabService.objects.filter(is_active=True).order_by('name', 'pk')),
+                        reference_cache.get_list(CabType.objects.order_by('price_multiplier', 'pk')),
+                        version,
+                    )
+                    self.current = table
+        return table
+
+    def reset(self):
+        with self.lock:
+            self.current = None
+
+
+tariffs = Tariffs()
@@ -1,3 +1,289 @@
+import os
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from one_stop_booking_hub.geo import haversine_km
+from one_stop_booking_hub.reference_cache import ReferenceCache, reference_cache
+from one_stop_booking_hub.testing import assert_max_queries
+
+from .distance import DETOUR_FACTOR, DistanceEngine, RoadGraph, RouteError, UnknownLocation, distance_engine
+from .models import CabBooking, CabService, CabType
+from .tariffs import tariffs
+from .views import calculate_fare
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    """Booking lists run a constant number of queries however many bookings they show"""
+
+    SIZES = (1, 10, 100)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rider', password='pass12345')
+        self.cab_type = CabType.objects.create(name='sedan')
+        self.services = [CabService.objects.create(name=f'Service {i}') for i in range(5)]
+        self.client.force_login(self.user)
+        reference_cache.clear()
+
+    def seed(self, count):
+        for i in range(CabBooking.objects.count(), count):
+            CabBooking.objects.create(
+                user=self.user, cab_service=self.services[i % len(self.services)], cab_type=self.cab_type,
+                pickup_location='MP Nagar', drop_location='New Market', pickup_time=timezone.now(),
+            )
+
+    def assert_view_budget(self, budget, url):
+        # Measure the steady state, once reference data is cached
+        self.client.get(url)
+        for size in self.SIZES:
+            self.seed(size)
+            with assert_max_queries(budget):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_home(self):
+        self.assert_view_budget(3, reverse('cab_booking:home'))
+
+    def test_my_bookings(self):
+        self.assert_view_budget(3, reverse('cab_booking:my_bookings'))
+
+
+class BookingIdTests(TestCase):
+    def test_booking_ids_are_time_ordered(self):
+        user = User.objects.create_user(username='rider', password='pass12345')
+        service, cab_type = CabService.objects.create(name='City'), CabType.objects.create(name='mini')
+        bookings = [
+            CabBooking.objects.create(
+                user=user, cab_service=service, cab_type=cab_type,
+                pickup_location='MP Nagar', drop_location='New Market', pickup_time=timezone.now(),
+            )
+            for _ in range(5)
+        ]
+        booking_ids = [booking.booking_id for booking in bookings]
+        self.assertTrue(all(booking_id.startswith('CAB') for booking_id in booking_ids))
+        self.assertEqual(sorted(booking_ids), booking_ids)
+
+
+class ConditionalGetTests(TestCase):
+    def test_booking_status_is_not_modified_until_it_changes(self):
+        user = User.objects.create_user(username='rider', password='pass12345')
+        booking = CabBooking.objects.create(
+            user=user, cab_service=CabService.objects.create(name='City'), cab_type=CabType.objects.create(name='mini'),
+            pickup_location='MP Nagar', drop_location='New Market', pickup_time=timezone.now(),
+            estimated_fare=Decimal('120.00'),
+        )
+        self.client.force_login(user)
+        url = reverse('cab_booking:api_booking_status', args=[booking.booking_id])
+        first = self.client.get(url)
+        self.assertEqual(first.json()['status'], booking.status)
+
+        # Session and user lookups, then the one aggregate
+        with assert_max_queries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        booking.status = 'confirmed'
+        booking.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'confirmed')
+
+
+ROAD_EXTRACT = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="23.2332" lon="77.4343"/>
+  <node id="2" lat="23.2400" lon="77.4200"/>
+  <node id="3" lat="23.2335" lon="77.4010"/>
+  <node id="4" lat="23.2200" lon="77.4100"/>
+  <way id="10">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/>
+    <tag k="highway" v="primary"/>
+  </way>
+  <way id="11">
+    <nd ref="3"/><nd ref="4"/>
+    <tag k="highway" v="residential"/>
+    <tag k="oneway" v="yes"/>
+  </way>
+  <way id="12">
+    <nd ref="1"/><nd ref="4"/>
+    <tag k="highway" v="footway"/>
+  </way>
+</osm>
+"""
+
+
+class DistanceEngineTests(TestCase):
+    def setUp(self):
+        self.engine = DistanceEngine(graph_path='')
+        self.engine.graph_loaded = True
+
+    def test_estimate_is_great_circle_distance_with_detour(self):
+        route = self.engine.route('MP Nagar', 'New Market')
+        straight = haversine_km(23.2332, 77.4343, 23.2335, 77.4010)
+        self.assertEqual(route.method, 'estimate')
+        self.assertEqual((route.origin.name, route.destination.name), ('MP Nagar', 'New Market'))
+        self.assertAlmostEqual(float(route.distance_km), straight * DETOUR_FACTOR, places=2)
+
+    def test_locations_are_read_from_free_text(self):
+        route = self.engine.route('Near Gate 2, Zone 1 MP Nagar', 'habibganj station')
+        self.assertEqual((route.origin.name, route.destination.name), ('MP Nagar', 'Rani Kamlapati Station'))
+        route = self.engine.route('23.2332, 77.4343', 'New Market')
+        self.assertEqual(route.origin.latitude, 23.2332)
+
+    def test_shared_names_are_settled_by_city(self):
+        route = self.engine.route('Airport', 'Vijay Nagar')
+        self.assertEqual(route.origin.name, 'Devi Ahilyabai Holkar Airport')
+        route = self.engine.route('MG Road, Bengaluru', 'Airport')
+        self.assertEqual((route.origin.city, route.destination.name), ('Bengaluru', 'Kempegowda International Airport'))
+        with self.assertRaises(UnknownLocation):
+            self.engine.route('Airport', 'MG Road')
+
+    def test_unplaceable_trips_raise_route_errors(self):
+        with self.assertRaises(UnknownLocation) as raised:
+            self.engine.route('MP Nagar', 'Nowhere In Particular')
+        self.assertEqual(raised.exception.field, 'drop_location')
+        with self.assertRaises(RouteError) as raised:
+            self.engine.route('MP Nagar, Bhopal', 'Colaba, Mumbai')
+        self.assertIsNone(raised.exception.field)
+
+    def test_routes_are_memoized_by_normalized_pair(self):
+        engine = DistanceEngine(maxsize=2)
+        engine.graph_loaded = True
+        first = engine.route('MP Nagar', 'New Market')
+        self.assertIs(engine.route('  mp nagar ', 'NEW MARKET'), first)
+        engine.route('TT Nagar', 'New Market')
+        engine.route('Arera Colony', 'New Market')
+        self.assertEqual(engine.stats()['evictions'], 1)
+        self.assertIsNot(engine.route('MP Nagar', 'New Market'), first)
+        self.assertEqual((engine.stats()['hits'], engine.stats()['misses']), (1, 4))
+
+    def test_road_graph_routes_along_drivable_ways(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.osm', delete=False) as extract:
+            extract.write(ROAD_EXTRACT)
+        self.addCleanup(os.remove, extract.name)
+        graph = RoadGraph.load(extract.name)
+        self.assertEqual(len(graph), 4)
+
+        # The footway is not a road, and the residential way is one way
+        self.assertIsNotNone(graph.shortest_km(3, 4))
+        self.assertIsNone(graph.shortest_km(4, 3))
+        self.assertGreater(graph.shortest_km(1, 4), graph.shortest_km(1, 3))
+
+        engine = DistanceEngine(graph_path=extract.name)
+        route = engine.route('MP Nagar', 'New Market')
+        road = haversine_km(23.2332, 77.4343, 23.24, 77.42) + haversine_km(23.24, 77.42, 23.2335, 77.4010)
+        self.assertEqual(route.method, 'road')
+        self.assertAlmostEqual(float(route.distance_km), road, places=2)
+
+        # Ends off the graph fall back to the estimate
+        self.assertEqual(engine.route('MP Nagar', 'Bairagarh').method, 'estimate')
+
+
+class FareQuoteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rider', password='pass12345')
+        self.service = CabService.objects.create(name='City')
+        self.cab_type = CabType.objects.create(name='mini')
+        self.client.force_login(self.user)
+        reference_cache.clear()
+        distance_engine.clear()
+
+    def test_fare_quote_uses_the_distance_engine(self):
+        response = self.client.get(reverse('cab_booking:calculate_fare_ajax'), {
+            'pickup': 'MP Nagar', 'drop': 'New Market', 'service_id': self.service.pk, 'type_id': self.cab_type.pk,
+        })
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['distance'], float(distance_engine.route('MP Nagar', 'New Market').distance_km))
+
+        response = self.client.get(reverse('cab_booking:calculate_fare_ajax'), {
+            'pickup': 'MP Nagar', 'drop': 'Atlantis', 'service_id': self.service.pk, 'type_id': self.cab_type.pk,
+        })
+        self.assertEqual(response.json()['field'], 'drop_location')
+
+    def test_booking_with_unknown_location_shows_form_error(self):
+        response = self.client.post(reverse('cab_booking:book_cab'), {
+            'cab_service': self.service.pk, 'cab_type': self.cab_type.pk,
+            'pickup_location': 'Atlantis', 'drop_location': 'New Market',
+            'pickup_time': '2030-01-01T10:00',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Could not find', response.context['form'].errors['pickup_location'][0])
+        self.assertFalse(CabBooking.objects.exists())
+
+
+class TariffTests(TestCase):
+    def setUp(self):
+        self.city = CabService.objects.create(name='City', base_fare=Decimal('50.00'), per_km_rate=Decimal('10.00'))
+        self.metro = CabService.objects.create(name='Metro', base_fare=Decimal('40.00'), per_km_rate=Decimal('12.50'))
+        self.mini = CabType.objects.create(name='mini', price_multiplier=Decimal('0.90'))
+        self.suv = CabType.objects.create(name='suv', price_multiplier=Decimal('1.45'))
+        reference_cache.clear()
+        tariffs.reset()
+        distance_engine.clear()
+
+    def test_table_quotes_every_combination_like_calculate_fare(self):
+        table = tariffs.table()
+        distance = Decimal('7.33')
+        quotes = table.quotes(distance)
+        self.assertEqual(len(quotes), 4)
+        for quote in quotes:
+            self.assertEqual(quote.fare, calculate_fare(quote.service, quote.cab_type, distance))
+        # 40 + 7.33 * 12.50 * 1.45 = 172.855625
+        self.assertEqual(table.quote(self.metro.pk, self.suv.pk, distance).fare, Decimal('172.86'))
+        self.assertEqual([fare for service, fares in table.grid(distance) for fare in fares], [q.fare for q in quotes])
+        with self.assertRaises(AttributeError):
+            table.rates = ()
+
+    def test_table_reloads_when_tariffs_change(self):
+        before = tariffs.table().quote(self.city.pk, self.mini.pk, 10).fare
+        self.city.per_km_rate = Decimal('20.00')
+        self.city.save()
+        self.assertEqual(tariffs.table().quote(self.city.pk, self.mini.pk, 10).fare, before + 90)
+
+        self.metro.is_active = False
+        self.metro.save()
+        with self.assertRaises(KeyError):
+            tariffs.table().quote(self.metro.pk, self.mini.pk, 10)
+
+        # Bulk writes send no signals; bumping the reference cache reaches every process
+        CabType.objects.filter(pk=self.mini.pk).update(price_multiplier=Decimal('1.00'))
+        reference_cache.bump(CabType)
+        self.assertEqual(tariffs.table().quote(self.city.pk, self.mini.pk, 10).fare, Decimal('250.00'))
+
+    def test_writes_reach_other_processes_before_any_read(self):
+        # A process that has never quoted a fare, like an admin worker
+        other = ReferenceCache()
+        version = other.get_version(CabService)
+        self.city.per_km_rate = Decimal('20.00')
+        self.city.save()
+        self.assertNotEqual(other.get_version(CabService), version)
+
+    def test_fare_comparison_runs_no_queries(self):
+        url = reverse('cab_booking:fare_calculator')
+        trip = {'pickup_location': 'MP Nagar', 'drop_location': 'New Market'}
+        self.client.get(url, trip)
+        with assert_max_queries(0):
+            response = self.client.get(url, trip)
+        route = distance_engine.route('MP Nagar', 'New Market')
+        self.assertEqual(response.context['grid'], tariffs.table().grid(route.distance_km))
+        self.assertContains(response, 'Metro')
+
+        with assert_max_queries(0):
+            response = self.client.get(reverse('cab_booking:calculate_fare_ajax'), {'pickup': 'MP Nagar', 'drop': 'New Market'})
+        self.assertEqual(
+            [(quote['service_id'], quote['type_id']) for quote in response.json()['quotes']],
+            [(service.pk, cab_type.pk) for service in (self.city, self.metro) for cab_type in (self.mini, self.suv)],
+        )
 
-# Create your tests here.
+    def test_unknown_combination_is_reported(self):
+        response = self.client.get(reverse('cab_booking:calculate_fare_ajax'), {
+            'pickup': 'MP Nagar', 'drop': 'New Market', 'service_id': self.city.pk, 'type_id': 'x',
+        })
+        self.assertEqual(response.json(), {'success': False, 'error': 'Unknown cab service or type'})
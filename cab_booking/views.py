@@ -5,23 +5,49 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.core.paginator import Paginator
 from django.db.models import Q
+from one_stop_booking_hub.conditional import conditional_page
+from one_stop_booking_hub.pagination import CursorPaginator
+from one_stop_booking_hub.reference_cache import reference_cache
+from .distance import RouteError, distance_engine
 from .models import CabBooking, CabService, CabType, Driver, FareCalculation
+from .tariffs import fare_paise, hundredths, rupees, tariffs
 from .forms import CabBookingForm, FareCalculatorForm, BookingSearchForm, RatingForm
 import json
 import random
-from decimal import Decimal
+
+# The main query of each view, also EXPLAINed by check_query_plans (see
+# query_plans.py), so the plans checked are the ones production runs
+
+def user_bookings(user):
+    """``user``'s bookings with their service and cab type"""
+    return CabBooking.objects.filter(user=user).select_related('cab_service', 'cab_type')
+
+def recent_bookings(user):
+    return user_bookings(user)[:3]
+
+def booking_list(user, filters):
+    """``user``'s bookings for BookingSearchForm's cleaned data, as a CursorPaginator"""
+    bookings = user_bookings(user)
+    if filters.get('booking_id'):
+        bookings = bookings.filter(booking_id__icontains=filters['booking_id'])
+    if filters.get('status'):
+        bookings = bookings.filter(status=filters['status'])
+    if filters.get('date_from'):
+        bookings = bookings.filter(created_at__date__gte=filters['date_from'])
+    if filters.get('date_to'):
+        bookings = bookings.filter(created_at__date__lte=filters['date_to'])
+    return CursorPaginator(bookings, 10)
 
 @login_required
 def cab_booking_home(request):
     """Main cab booking page"""
-    recent_bookings = CabBooking.objects.filter(user=request.user)[:3]
-    cab_services = CabService.objects.filter(is_active=True)
-    cab_types = CabType.objects.all()
+    recent = recent_bookings(request.user)
+    cab_services = reference_cache.get_list(CabService.objects.filter(is_active=True))
+    cab_types = reference_cache.get_list(CabType.objects.all())
     
     context = {
-        'recent_bookings': recent_bookings,
+        'recent_bookings': recent,
         'cab_services': cab_services,
         'cab_types': cab_types,
     }
@@ -37,29 +63,38 @@ def book_cab(request):
             booking.user = request.user
             
             # Calculate estimated fare
-            distance = calculate_distance(
-                form.cleaned_data['pickup_location'],
-                form.cleaned_data['drop_location']
-            )
-            booking.distance_km = distance
-            booking.estimated_fare = calculate_fare(
-                booking.cab_service,
-                booking.cab_type,
-                distance
-            )
-            
-            booking.save()
-            messages.success(request, f'Cab booked successfully! Booking ID: {booking.booking_id}')
-            return redirect('cab_booking:booking_detail', booking_id=booking.booking_id)
+            try:
+                distance = calculate_distance(
+                    form.cleaned_data['pickup_location'],
+                    form.cleaned_data['drop_location']
+                )
+            except RouteError as error:
+                form.add_error(error.field, str(error))
+            else:
+                booking.distance_km = distance
+                booking.estimated_fare = calculate_fare(
+                    booking.cab_service,
+                    booking.cab_type,
+                    distance
+                )
+                
+                booking.save()
+                messages.success(request, f'Cab booked successfully! Booking ID: {booking.booking_id}')
+                return redirect('cab_booking:booking_detail', booking_id=booking.booking_id)
     else:
         form = CabBookingForm()
     
-    return render(request, 'cab_booking/book_cab.html', {'form': form})
+    context = {
+        'form': form,
+        'locations': distance_engine.gazetteer.labels(),
+    }
+    return render(request, 'cab_booking/book_cab.html', context)
 
 @login_required
+@conditional_page(lambda request, booking_id: CabBooking.objects.filter(booking_id=booking_id, user=request.user), CabService, CabType)
 def booking_detail(request, booking_id):
     """View booking details"""
-    booking = get_object_or_404(CabBooking, booking_id=booking_id, user=request.user)
+    booking = get_object_or_404(user_bookings(request.user), booking_id=booking_id)
     
     # Handle rating form
     if request.method == 'POST' and booking.status == 'completed':
@@ -80,27 +115,9 @@ def booking_detail(request, booking_id):
 @login_required
 def my_bookings(request):
     """List all user bookings with search/filter"""
-    bookings_list = CabBooking.objects.filter(user=request.user)
     search_form = BookingSearchForm(request.GET)
-    
-    if search_form.is_valid():
-        booking_id = search_form.cleaned_data.get('booking_id')
-        status = search_form.cleaned_data.get('status')
-        date_from = search_form.cleaned_data.get('date_from')
-        date_to = search_form.cleaned_data.get('date_to')
-        
-        if booking_id:
-            bookings_list = bookings_list.filter(booking_id__icontains=booking_id)
-        if status:
-            bookings_list = bookings_list.filter(status=status)
-        if date_from:
-            bookings_list = bookings_list.filter(created_at__date__gte=date_from)
-        if date_to:
-            bookings_list = bookings_list.filter(created_at__date__lte=date_to)
-    
-    paginator = Paginator(bookings_list, 10)
-    page_number = request.GET.get('page')
-    bookings = paginator.get_page(page_number)
+    paginator = booking_list(request.user, search_form.cleaned_data if search_form.is_valid() else {})
+    bookings = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'bookings': bookings,
@@ -123,43 +140,76 @@ def cancel_booking(request, booking_id):
     return redirect('cab_booking:booking_detail', booking_id=booking_id)
 
 def calculate_fare_ajax(request):
-    """AJAX endpoint for fare calculation"""
+    """AJAX endpoint for fare calculation; without a service and type it quotes every combination"""
     if request.method == 'GET':
         pickup = request.GET.get('pickup')
         drop = request.GET.get('drop')
         service_id = request.GET.get('service_id')
         type_id = request.GET.get('type_id')
         
+        # Tariffs and routes are both in memory: a quote runs no queries
+        table = tariffs.table()
         try:
-            service = CabService.objects.get(id=service_id)
-            cab_type = CabType.objects.get(id=type_id)
-            
-            # Calculate distance (mock calculation)
-            distance = calculate_distance(pickup, drop)
-            fare = calculate_fare(service, cab_type, distance)
-            
+            route = distance_engine.route(pickup or '', drop or '')
+        except RouteError as e:
+            return JsonResponse({'success': False, 'error': str(e), 'field': e.field})
+        
+        if not service_id and not type_id:
             return JsonResponse({
                 'success': True,
-                'distance': float(distance),
-                'fare': float(fare),
-                'service': service.name,
-                'type': cab_type.get_name_display()
+                'distance': float(route.distance_km),
+                'distance_method': route.method,
+                'quotes': [
+                    {
+                        'service_id': quote.service.pk,
+                        'service': quote.service.name,
+                        'type_id': quote.cab_type.pk,
+                        'type': quote.cab_type.get_name_display(),
+                        'fare': float(quote.fare),
+                    }
+                    for quote in table.quotes(route.distance_km)
+                ],
             })
-        except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)})
+        
+        try:
+            quote = table.quote(service_id, type_id, route.distance_km)
+        except (KeyError, TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'Unknown cab service or type'})
+        
+        return JsonResponse({
+            'success': True,
+            'distance': float(route.distance_km),
+            'distance_method': route.method,
+            'fare': float(quote.fare),
+            'service': quote.service.name,
+            'type': quote.cab_type.get_name_display()
+        })
     
     return JsonResponse({'success': False, 'error': 'Invalid request'})
 
 def fare_calculator(request):
-    """Standalone fare calculator page"""
-    form = FareCalculatorForm()
-    context = {'form': form}
+    """Standalone fare calculator comparing every service and cab type for one trip"""
+    form = FareCalculatorForm(request.GET or None)
+    table = tariffs.table()
+    context = {
+        'form': form,
+        'cab_types': table.cab_types,
+        'locations': distance_engine.gazetteer.labels(),
+    }
+    if form.is_valid():
+        try:
+            route = distance_engine.route(form.cleaned_data['pickup_location'], form.cleaned_data['drop_location'])
+        except RouteError as error:
+            form.add_error(error.field, str(error))
+        else:
+            context['route'] = route
+            context['grid'] = table.grid(route.distance_km)
     return render(request, 'cab_booking/fare_calculator.html', context)
 
 @login_required
 def track_booking(request, booking_id):
     """Real-time booking tracking"""
-    booking = get_object_or_404(CabBooking, booking_id=booking_id, user=request.user)
+    booking = get_object_or_404(user_bookings(request.user), booking_id=booking_id)
     
     # Simulate real-time updates (in real app, this would connect to actual tracking)
     tracking_data = {
@@ -175,25 +225,16 @@ def track_booking(request, booking_id):
 
 # Utility functions
 def calculate_distance(pickup, drop):
-    """Calculate distance between two locations (mock implementation)"""
-    # In real implementation, use Google Maps API or similar
-    # For now, return a random distance between 5-50 km
-    return Decimal(str(random.uniform(5, 50)))
+    """Trip distance in km between two locations, from the offline gazetteer and road graph"""
+    # Raises RouteError for locations the gazetteer cannot place
+    return distance_engine.route(pickup, drop).distance_km
 
 def calculate_fare(cab_service, cab_type, distance_km):
     """Calculate fare based on service, type and distance"""
-    base_fare = cab_service.base_fare
-    per_km_rate = cab_service.per_km_rate
-    type_multiplier = cab_type.price_multiplier
-    
-    # Basic calculation: base fare + (distance * per km rate * type multiplier)
-    fare = base_fare + (distance_km * per_km_rate * type_multiplier)
-    
-    # Add some surge pricing simulation (random between 1.0 to 1.5)
-    surge_multiplier = Decimal(str(random.uniform(1.0, 1.5)))
-    final_fare = fare * surge_multiplier
-    
-    return round(final_fare, 2)
+    # Base fare + distance * per km rate * type multiplier, in the tariff
+    # table's integer arithmetic so a booking's fare matches its quote
+    rate = hundredths(cab_service.per_km_rate) * hundredths(cab_type.price_multiplier)
+    return rupees(fare_paise(hundredths(cab_service.base_fare), rate, hundredths(distance_km)))
 
 def get_available_drivers(cab_service, cab_type):
     """Get available drivers for given service and type"""
@@ -205,6 +246,7 @@ def get_available_drivers(cab_service, cab_type):
 
 # API endpoints for mobile/frontend integration
 @login_required
+@conditional_page(lambda request, booking_id: CabBooking.objects.filter(booking_id=booking_id, user=request.user))
 def api_booking_status(request, booking_id):
     """API endpoint for booking status"""
     try:
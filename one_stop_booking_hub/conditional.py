@@ -0,0 +1,95 @@
+# one_stop_booking_hub/conditional.py
+import hashlib
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.db.models import Count, IntegerField, Max, Model, Value
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .reference_cache import reference_cache
+
+
+def latest_changes(querysets):
+    """``[(max updated_at, row count)]`` for each queryset, from one query.
+
+    Each queryset becomes a single ungrouped aggregate row tagged with its
+    position, and the rows are combined with UNION ALL. The count is what
+    notices deletions, which leave the maximum untouched.
+    """
+    rows = [
+        queryset.order_by()
+        .annotate(source=Value(position, output_field=IntegerField()))
+        .values('source')
+        .annotate(latest=Max('updated_at'), count=Count('pk'))
+        .values_list('source', 'latest', 'count')
+        for position, queryset in enumerate(querysets)
+    ]
+    if not rows:
+        return []
+    combined = rows[0].union(*rows[1:], all=True) if len(rows) > 1 else rows[0]
+    found = {source: (latest, count) for source, latest, count in combined}
+    return [found.get(position, (None, 0)) for position in range(len(querysets))]
+
+
+def has_pending_messages(request):
+    # A 304 would show the browser's copy without them; len() leaves them queued
+    return bool(len(get_messages(request)))
+
+
+def conditional_page(*sources):
+    """Answer conditional GETs with 304 from the ``updated_at`` of what a view shows.
+
+    Each source is a model with ``updated_at`` (the whole table), or a
+    callable taking the view's arguments and returning a queryset of such
+    a model; models without ``updated_at`` are reference tables and
+    contribute their ReferenceCache version instead. The latest change and
+    row count of every source come from a single aggregate query, and when
+    the request's If-None-Match or If-Modified-Since still holds the view
+    is never called. The ETag also covers the path and the signed-in user,
+    since pages differ per user. Responses are marked ``no-cache`` so
+    browsers revalidate instead of guessing a freshness lifetime from
+    Last-Modified. Put it inside ``cache_anonymous_page``, which answers
+    from the validators it stored without any query.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or has_pending_messages(request):
+                return view(request, *args, **kwargs)
+
+            querysets, references = [], []
+            for source in sources:
+                if not (isinstance(source, type) and issubclass(source, Model)):
+                    querysets.append(source(request, *args, **kwargs))
+                elif any(field.name == 'updated_at' for field in source._meta.concrete_fields):
+                    querysets.append(source._default_manager.all())
+                else:
+                    references.append(source)
+            changes = latest_changes(querysets)
+
+            stamps = [latest for latest, count in changes if latest is not None]
+            last_modified = int(max(stamps).timestamp()) if stamps else None
+            user = request.user.pk if request.user.is_authenticated else ''
+            state = '|'.join([
+                request.get_full_path(), str(user), reference_cache.version_tag(*references),
+                *(f'{latest.isoformat() if latest else ""}/{count}' for latest, count in changes),
+            ])
+            etag = quote_etag(hashlib.md5(state.encode(), usedforsecurity=False).hexdigest())
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                response.headers.setdefault('ETag', etag)
+                if last_modified is not None:
+                    response.headers.setdefault('Last-Modified', http_date(last_modified))
+            if user:
+                patch_cache_control(response, no_cache=True, private=True)
+            else:
+                patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
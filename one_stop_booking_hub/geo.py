@@ -0,0 +1,88 @@
+# one_stop_booking_hub/geo.py
+import heapq
+import math
+from collections import defaultdict
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Grid cells of 0.1 degree are about 11 km tall: a city spans a few dozen
+CELL_DEGREES = 0.1
+
+# Searches give up past this distance
+MAX_DISTANCE_KM = 50
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class GridIndex:
+    """Points bucketed into a latitude/longitude grid for k-nearest queries.
+
+    A query scans rings of cells outward from the query cell and stops as
+    soon as the k-th best distance is closer than anything the next ring
+    could hold, so it touches a handful of cells instead of every point.
+    """
+
+    def __init__(self, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.cells = defaultdict(dict)
+        self.points = {}
+
+    def __len__(self):
+        return len(self.points)
+
+    def cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees))
+
+    def add(self, key, lat, lon):
+        self.remove(key)
+        cell = self.cell(lat, lon)
+        self.cells[cell][key] = (lat, lon)
+        self.points[key] = cell
+
+    def remove(self, key):
+        cell = self.points.pop(key, None)
+        if cell is not None:
+            del self.cells[cell][key]
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def ring(self, center, radius):
+        row, col = center
+        if radius == 0:
+            yield center
+            return
+        for c in range(col - radius, col + radius + 1):
+            yield row - radius, c
+            yield row + radius, c
+        for r in range(row - radius + 1, row + radius):
+            yield r, col - radius
+            yield r, col + radius
+
+    def nearest(self, lat, lon, k, max_km=MAX_DISTANCE_KM):
+        """Up to ``k`` ``(distance_km, key)`` pairs within ``max_km``, closest first"""
+        center = self.cell(lat, lon)
+        best = []  # max-heap of (-distance, key)
+        # A point r rings out is at least this far away; longitude degrees
+        # shrink towards the poles, so use the narrowest the search can reach
+        cell_km = self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(min(abs(lat) + max_km / KM_PER_DEGREE, 89)))
+        radius = 0
+        while True:
+            for cell in self.ring(center, radius):
+                for key, (point_lat, point_lon) in self.cells.get(cell, {}).items():
+                    distance = haversine_km(lat, lon, point_lat, point_lon)
+                    if distance > max_km:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, key))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, key))
+            reach = radius * cell_km
+            if (len(best) == k and -best[0][0] <= reach) or reach > max_km:
+                break
+            radius += 1
+        return sorted((-distance, key) for distance, key in best)
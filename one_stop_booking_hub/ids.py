@@ -0,0 +1,199 @@
+# one_stop_booking_hub/ids.py
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+# Crockford base32: no I, L, O or U, so ids read back unambiguously
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+# 2024-01-01T00:00:00Z; 42 bits of milliseconds from here last until 2163
+EPOCH_MS = 1704067200000
+
+TIMESTAMP_BITS = 42
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+# 64 bits in base32, zero padded so that string order is time order
+ENCODED_LENGTH = 13
+
+NODE_LEASE_KEY = 'ids:node'
+
+# A lease lapses this long after its holder last renewed it, which frees the
+# nodes of processes that have exited; holders renew at half this age
+LEASE_TIMEOUT = 60 * 60
+
+# Caches private to a process: every process would lease the same nodes
+LOCAL_CACHES = (LocMemCache, DummyCache)
+
+LOCAL_CACHE_MESSAGE = (
+    'Id generator nodes cannot be leased from a process-local cache; set ID_GENERATOR_NODE '
+    'to a distinct value per process or configure a shared cache such as Redis or Memcached'
+)
+
+
+def encode(number):
+    chars = []
+    for _ in range(ENCODED_LENGTH):
+        number, remainder = divmod(number, 32)
+        chars.append(ALPHABET[remainder])
+    return ''.join(reversed(chars))
+
+
+def decode(text):
+    number = 0
+    for char in text.upper():
+        number = number * 32 + ALPHABET.index(char)
+    return number
+
+
+def pinned_node():
+    """``settings.ID_GENERATOR_NODE``, or None when nodes are leased from the cache"""
+    node = getattr(settings, 'ID_GENERATOR_NODE', None)
+    if node is None or node == '':
+        return None
+    try:
+        node = int(node)
+    except (TypeError, ValueError):
+        raise ImproperlyConfigured(f'ID_GENERATOR_NODE must be an integer, not {node!r}') from None
+    if not 0 <= node <= MAX_NODE:
+        raise ImproperlyConfigured(f'ID_GENERATOR_NODE must be between 0 and {MAX_NODE}, not {node}')
+    return node
+
+
+def lease_key(node):
+    return f'{NODE_LEASE_KEY}:{node}'
+
+
+def lease_node(token):
+    """A node number no other running process holds, leased to ``token``.
+
+    Each node is a cache key added only if absent, so the lease is exclusive
+    only when every process shares the cache; with a process-local cache
+    the node must be pinned by ``settings.ID_GENERATOR_NODE`` instead.
+    """
+    cache = caches['default']
+    if isinstance(cache, LOCAL_CACHES):
+        raise ImproperlyConfigured(LOCAL_CACHE_MESSAGE)
+    # Start each search past the last lease so live nodes are rarely probed
+    cache.add(NODE_LEASE_KEY, 0, timeout=None)
+    start = cache.incr(NODE_LEASE_KEY)
+    for offset in range(MAX_NODE + 1):
+        node = (start + offset) & MAX_NODE
+        if cache.add(lease_key(node), token, timeout=LEASE_TIMEOUT):
+            return node
+    raise ImproperlyConfigured(f'All {MAX_NODE + 1} id generator nodes are leased; pin ID_GENERATOR_NODE per process')
+
+
+def renew_node(node, token):
+    """Extend ``token``'s lease on ``node``; False if it lapsed and may have passed to another process"""
+    cache = caches['default']
+    return cache.get(lease_key(node)) == token and cache.touch(lease_key(node), LEASE_TIMEOUT)
+
+
+@checks.register(checks.Tags.caches)
+def check_node_source(app_configs, **kwargs):
+    """Fail startup, not the first order, when this process has no way to get a node"""
+    try:
+        node = pinned_node()
+    except ImproperlyConfigured as error:
+        return [checks.Error(str(error), id='ids.E001')]
+    if node is None and isinstance(caches['default'], LOCAL_CACHES):
+        return [checks.Error(LOCAL_CACHE_MESSAGE, id='ids.E002')]
+    return []
+
+
+class IdGenerator:
+    """Snowflake-style 64-bit ids: milliseconds, node, then a per-millisecond sequence.
+
+    Ids from one generator strictly increase, even if the clock steps back or
+    more than 4096 are drawn in a millisecond (the timestamp then runs ahead
+    of the clock until it catches up). Ids from different processes differ
+    in their node bits, pinned per process or leased from the shared cache
+    and renewed while the process runs. All ids sort by creation time to the
+    millisecond, so they append to the right edge of a B-tree index instead
+    of splitting pages at random.
+    """
+
+    def __init__(self, node=None, clock=time.time):
+        self._node = node
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.token = uuid.uuid4().hex
+        # When the node's lease was last taken or renewed; None for a pinned node
+        self.leased_at = None
+        self.last_ms = -1
+        self.sequence = 0
+
+    @property
+    def node(self):
+        if self._node is None or (self.leased_at is not None and time.monotonic() - self.leased_at > LEASE_TIMEOUT / 2):
+            self._node, self.leased_at = self.acquire()
+        return self._node
+
+    def acquire(self):
+        node = pinned_node()
+        if node is not None:
+            return node, None
+        if self._node is None or not renew_node(self._node, self.token):
+            return lease_node(self.token), time.monotonic()
+        return self._node, time.monotonic()
+
+    def reset(self):
+        """Forget the node and sequence, e.g. in a forked child"""
+        # A fresh lock: the parent's may have been held by a thread that did not fork
+        self.lock = threading.Lock()
+        self._node = None
+        self.token = uuid.uuid4().hex
+        self.leased_at = None
+        self.last_ms = -1
+        self.sequence = 0
+
+    def next_int(self):
+        node = self.node
+        with self.lock:
+            now = int(self.clock() * 1000) - EPOCH_MS
+            if now > self.last_ms:
+                self.last_ms = now
+                self.sequence = 0
+            elif self.sequence < MAX_SEQUENCE:
+                self.sequence += 1
+            else:
+                self.last_ms += 1
+                self.sequence = 0
+            return (self.last_ms << (NODE_BITS + SEQUENCE_BITS)) | (node << SEQUENCE_BITS) | self.sequence
+
+    def next_id(self, prefix=''):
+        return f'{prefix}{encode(self.next_int())}'
+
+
+def parse_id(value, prefix=''):
+    """Split an id back into ``(created_at, node, sequence)``"""
+    number = decode(value[len(prefix):])
+    sequence = number & MAX_SEQUENCE
+    node = (number >> SEQUENCE_BITS) & MAX_NODE
+    ms = (number >> (NODE_BITS + SEQUENCE_BITS)) + EPOCH_MS
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc), node, sequence
+
+
+generator = IdGenerator()
+
+if hasattr(os, 'register_at_fork'):
+    # Pre-forking servers would otherwise hand every worker the parent's node
+    os.register_at_fork(after_in_child=generator.reset)
+
+
+def new_id(prefix=''):
+    """Next id from this process's generator, e.g. ``new_id('ORD')``"""
+    return generator.next_id(prefix)
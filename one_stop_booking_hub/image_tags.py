@@ -0,0 +1,41 @@
+# one_stop_booking_hub/image_tags.py
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from .images import image_pipeline
+
+register = template.Library()
+
+# Derivatives offered at each display size, and the width the layout shows it at
+PRESETS = {
+    'thumb': (['thumb', 'card'], '160px'),
+    'card': (['thumb', 'card', 'detail'], '(max-width: 576px) 100vw, 480px'),
+    'detail': (['card', 'detail'], '(max-width: 1200px) 100vw, 1200px'),
+}
+
+
+def srcset(candidates):
+    return ', '.join(f'{url} {width}w' for width, url in candidates)
+
+
+@register.simple_tag
+def picture(image, preset='card', alt='', default='', **attrs):
+    """``<picture>`` with WebP and JPEG ``srcset``s of an uploaded image's derivatives.
+
+    Usage: ``{% picture product.image 'card' alt=product.name class="card-img-top" %}``.
+    ``default`` is the plain ``src`` used when there is no image; other
+    keyword arguments become attributes of the ``<img>``.
+    """
+    extra = format_html_join('', ' {}="{}"', attrs.items())
+    if not image:
+        return format_html('<img src="{}" alt="{}" loading="lazy"{}>', default, alt, extra)
+
+    sizes, layout = PRESETS[preset]
+    urls = image_pipeline.urls(image.name, sizes)
+    webp, jpeg = urls['webp'], urls['jpeg']
+    fallback = jpeg[sizes.index(preset)][1]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="lazy" decoding="async"{}></picture>',
+        srcset(webp), layout, fallback, srcset(jpeg), layout, alt, extra,
+    )
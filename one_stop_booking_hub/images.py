@@ -0,0 +1,220 @@
+# one_stop_booking_hub/images.py
+import hashlib
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'images'
+
+# Longest edge in pixels of each derivative
+SIZES = {'thumb': 160, 'card': 480, 'detail': 1200}
+
+# Format name to (Pillow format, file extension, content type)
+FORMATS = {
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+}
+
+QUALITY = 80
+
+DERIVATIVE_ROOT = 'derivatives'
+
+# Derivatives are immutable (a new upload gets a new name), so the flag only
+# expires to bound the cache, never for freshness
+READY_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def derivative_name(source, size, fmt):
+    """Storage name of ``source``'s ``size`` derivative in ``fmt``"""
+    stem = posixpath.splitext(source)[0]
+    return f'{DERIVATIVE_ROOT}/{stem}.{size}.{FORMATS[fmt][1]}'
+
+
+def is_safe_source(name):
+    """A relative storage name with no way out of MEDIA_ROOT"""
+    parts = name.split('/')
+    return bool(name) and not name.startswith('/') and '..' not in parts and parts[0] != DERIVATIVE_ROOT
+
+
+def render(image, size, fmt):
+    """Encoded bytes of ``image`` scaled to fit ``SIZES[size]``"""
+    copy = image.copy()
+    copy.thumbnail((SIZES[size], SIZES[size]), Image.LANCZOS)
+    if copy.mode not in ('RGB', 'RGBA'):
+        transparent = 'A' in copy.getbands() or 'transparency' in copy.info
+        copy = copy.convert('RGBA' if transparent else 'RGB')
+
+    pillow_format = FORMATS[fmt][0]
+    options = {'quality': QUALITY}
+    if pillow_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+        if copy.mode == 'RGBA':
+            # JPEG has no alpha: flatten onto white rather than black
+            background = Image.new('RGB', copy.size, 'white')
+            background.paste(copy, mask=copy.getchannel('A'))
+            copy = background
+    buffer = io.BytesIO()
+    copy.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+class ImagePipeline:
+    """Resized WebP and JPEG derivatives of uploaded images, made off the request path.
+
+    Saving a registered model queues its images on a small thread pool once
+    the transaction commits. Whether a source's derivatives exist is
+    remembered in the shared cache, so templates can link them directly;
+    until then they link ``image_derivative``, which builds them on first
+    request and redirects. Derivatives of an image are built together from
+    one decode, and concurrent requests for the same image share that work.
+    """
+
+    def __init__(self, alias='default', storage=None, max_workers=2):
+        self.alias = alias
+        # Plain file storage: derivative names are derived from the source's,
+        # so they must be written exactly as given, not renamed or hashed
+        self.storage = storage or FileSystemStorage()
+        self.max_workers = max_workers
+        self.executor = None
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.registered = {}
+        self.reset_stats()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def reset_stats(self):
+        self.generated = 0
+        self.lazy = 0
+        self.failures = 0
+
+    def stats(self):
+        return {
+            'generated': self.generated,
+            'lazy': self.lazy,
+            'failures': self.failures,
+            'pending': len(self.pending),
+        }
+
+    def register(self, model, *fields):
+        """Queue derivatives of ``fields`` whenever a ``model`` row is saved"""
+        label = model._meta.label_lower
+        if label in self.registered:
+            return
+        uid = f'{KEY_PREFIX}:{id(self)}:{label}'
+
+        def on_save(sender, instance, **kwargs):
+            names = [getattr(instance, field).name for field in fields]
+            names = [name for name in names if name]
+            if names:
+                transaction.on_commit(lambda: [self.schedule(name) for name in names])
+
+        post_save.connect(on_save, sender=model, weak=False, dispatch_uid=uid)
+        self.registered[label] = (model, fields)
+
+    def ready_key(self, source):
+        digest = hashlib.md5(source.encode(), usedforsecurity=False).hexdigest()
+        return f'{KEY_PREFIX}:ready:{digest}'
+
+    def is_ready(self, source):
+        return bool(self.cache.get(self.ready_key(source)))
+
+    def urls(self, source, sizes):
+        """``{fmt: [(width, url)]}`` for ``sizes`` of ``source``, from one cache lookup.
+
+        Ready derivatives are linked in storage; others go through the
+        ``image_derivative`` view, which builds them on first request.
+        """
+        ready = self.is_ready(source)
+
+        def link(size, fmt):
+            if ready:
+                return self.storage.url(derivative_name(source, size, fmt))
+            return reverse('image_derivative', args=[size, fmt, source])
+
+        return {fmt: [(SIZES[size], link(size, fmt)) for size in sizes] for fmt in FORMATS}
+
+    def schedule(self, source):
+        """Build ``source``'s derivatives on the pool; the returned future is shared by all callers"""
+        if self.is_ready(source):
+            return None
+        with self.lock:
+            future = self.pending.get(source)
+            if future is None:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='images')
+                future = self.executor.submit(self._run, source)
+                self.pending[source] = future
+        return future
+
+    def _run(self, source):
+        try:
+            return self.generate(source)
+        except Exception:
+            self.failures += 1
+            logger.exception('Could not build derivatives of %s', source)
+            raise
+        finally:
+            with self.lock:
+                self.pending.pop(source, None)
+
+    def ensure(self, source):
+        """Block until ``source``'s derivatives exist, building them if needed"""
+        if self.is_ready(source):
+            return
+        self.lazy += 1
+        future = self.schedule(source)
+        if future is not None:
+            future.result()
+
+    def generate(self, source):
+        """Write every missing derivative of ``source``; returns the names written"""
+        written = []
+        missing = [
+            (size, fmt) for size in SIZES for fmt in FORMATS
+            if not self.storage.exists(derivative_name(source, size, fmt))
+        ]
+        if missing:
+            with self.storage.open(source, 'rb') as handle:
+                image = Image.open(handle)
+                # JPEG can decode at a fraction of full size, which is all the largest derivative needs
+                largest = max(SIZES.values())
+                image.draft('RGB', (largest, largest))
+                image = ImageOps.exif_transpose(image)
+                image.load()
+            for size, fmt in missing:
+                name = derivative_name(source, size, fmt)
+                written.append(self.storage.save(name, ContentFile(render(image, size, fmt))))
+            self.generated += 1
+        self.cache.set(self.ready_key(source), True, READY_TIMEOUT)
+        return written
+
+    def drain(self):
+        """Wait for every queued image, e.g. at the end of a backfill"""
+        while True:
+            with self.lock:
+                futures = list(self.pending.values())
+            if not futures:
+                return
+            for future in futures:
+                try:
+                    future.result()
+                except Exception:
+                    pass
+
+
+image_pipeline = ImagePipeline()
@@ -0,0 +1,110 @@
+# one_stop_booking_hub/page_cache.py
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+
+from .reference_cache import reference_cache
+
+KEY_PREFIX = 'page'
+
+# Upper bound on staleness from writes that bypass model signals
+PAGE_TIMEOUT = 10 * 60
+
+
+class PageCache:
+    """Whole-response cache for pages that look the same to every anonymous visitor.
+
+    Only cookieless GET/HEAD requests without a query string are served or
+    stored, so sessions, messages and CSRF tokens never leak between
+    visitors. Entries are keyed by the versions of the models the page
+    renders (see ReferenceCache), so saving or deleting any of their rows
+    retires the cached page at once.
+    """
+
+    def __init__(self, alias='default', timeout=PAGE_TIMEOUT):
+        self.alias = alias
+        self.timeout = timeout
+        self.reset_stats()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypasses': self.bypasses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def is_cacheable_request(self, request):
+        if request.method not in ('GET', 'HEAD') or request.GET:
+            return False
+        if settings.SESSION_COOKIE_NAME in request.COOKIES or CookieStorage.cookie_name in request.COOKIES:
+            return False
+        user = getattr(request, 'user', None)
+        return user is None or not user.is_authenticated
+
+    def is_cacheable_response(self, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'private' not in response.get('Cache-Control', '')
+        )
+
+    def key(self, path, models):
+        digest = hashlib.md5(path.encode(), usedforsecurity=False).hexdigest()
+        return f'{KEY_PREFIX}:{digest}:{reference_cache.version_tag(*models)}'
+
+    def page(self, *models, timeout=None):
+        """Decorate a view whose output depends only on rows of ``models``"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if not self.is_cacheable_request(request):
+                    self.bypasses += 1
+                    return view(request, *args, **kwargs)
+
+                key = self.key(request.path, models)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.hits += 1
+                    content, headers = cached
+                    response = HttpResponse(content)
+                    for header, value in headers:
+                        response[header] = value
+                    # Validators stored by conditional_page still answer If-None-Match without a query
+                    return get_conditional_response(
+                        request, etag=response.get('ETag'),
+                        last_modified=parse_http_date_safe(response.get('Last-Modified', '')), response=response,
+                    )
+
+                self.misses += 1
+                response = view(request, *args, **kwargs)
+                patch_vary_headers(response, ('Cookie',))
+                if self.is_cacheable_response(response):
+                    if hasattr(response, 'render'):
+                        response.render()
+                    self.cache.set(key, (response.content, list(response.items())), timeout or self.timeout)
+                return response
+            return wrapper
+        return decorator
+
+
+page_cache = PageCache()
+
+cache_anonymous_page = page_cache.page
@@ -0,0 +1,127 @@
+# one_stop_booking_hub/pagination.py
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'one_stop_booking_hub.pagination.cursor'
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class CursorPage:
+    """One page of a CursorPaginator, iterable like a Paginator page"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next:
+            return self.paginator.encode_cursor(self.object_list[-1], 'next')
+        return ''
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous:
+            return self.paginator.encode_cursor(self.object_list[0], 'previous')
+        return ''
+
+
+class CursorPaginator:
+    """Keyset pagination over a totally ordered queryset.
+
+    Pages are fetched with a WHERE on the ordering keys of the last row seen
+    instead of an OFFSET, and without the COUNT(*) Django's Paginator needs,
+    so page N costs the same as page 1. ``ordering`` must end in a unique
+    field; each key may be a model field or an annotation and may carry a
+    leading '-'. Cursors are signed, opaque strings.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+
+    def encode_cursor(self, obj, direction):
+        values = [_encode(getattr(obj, field.lstrip('-'))) for field in self.ordering]
+        return signing.Signer(salt=CURSOR_SALT).sign_object({'v': values, 'd': direction}, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            data = signing.Signer(salt=CURSOR_SALT).unsign_object(cursor)
+            values, direction = data['v'], data['d']
+        except (signing.BadSignature, ValueError, TypeError, KeyError):
+            return None, 'next'
+        if len(values) != len(self.ordering) or direction not in ('next', 'previous'):
+            return None, 'next'
+        return values, direction
+
+    def keyset_filter(self, values, backwards):
+        """Rows strictly after ``values`` in ordering (before, if ``backwards``)"""
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        # Repeat the leading key as a plain range so the planner can seek an index on it
+        first = self.ordering[0]
+        lookup = 'lte' if first.startswith('-') != backwards else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': values[0]}) & condition
+
+    def page_queryset(self, values=None, backwards=False):
+        """The unevaluated query for the page after ``values``: one row more than fits"""
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(values, backwards))
+        if backwards:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+        else:
+            ordering = self.ordering
+        return queryset.order_by(*ordering)[:self.per_page + 1]
+
+    def get_page(self, cursor=None):
+        values, direction = self.decode_cursor(cursor) if cursor else (None, 'next')
+        backwards = direction == 'previous'
+        rows = list(self.page_queryset(values, backwards))
+
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            return CursorPage(rows, self, has_next=True, has_previous=has_more)
+        return CursorPage(rows, self, has_next=has_more, has_previous=values is not None)
@@ -0,0 +1,189 @@
+# one_stop_booking_hub/reference_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete, post_save
+from django.forms import ModelChoiceField
+from django.forms.models import ModelChoiceIterator
+
+KEY_PREFIX = 'reference'
+
+# Entries kept per process; reference querysets are tiny, so this is generous
+DEFAULT_MAXSIZE = 256
+
+# Shared-cache lifetime of a list; versioning, not expiry, keeps it fresh
+SHARED_TIMEOUT = 24 * 60 * 60
+
+MISSING = object()
+
+
+class ReferenceCache:
+    """Process-local LRU in front of the cache framework for small, rarely-changing tables.
+
+    Every cached queryset is keyed by its model's version number, which lives
+    in the shared cache and is bumped by save/delete signals. A write in any
+    process therefore invalidates every process's copy on its next lookup,
+    and a steady-state lookup costs one shared-cache read and no queries.
+    Apps register their cached models when they load, so a process that
+    only writes them (the admin, a management command) still bumps versions.
+    Writes through ``QuerySet.update()`` or ``bulk_create()`` send no signals
+    and must call ``bump()`` themselves.
+    """
+
+    def __init__(self, alias='default', maxsize=DEFAULT_MAXSIZE):
+        self.alias = alias
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.registered = set()
+        self.reset_stats()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def reset_stats(self):
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hit_ratio': round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear(self):
+        """Drop local entries and start every model on a fresh version"""
+        with self.lock:
+            self.entries.clear()
+        for label in list(self.registered):
+            self.shared.delete(self.version_key(label))
+
+    def register(self, model):
+        """Bump ``model``'s version whenever one of its rows is saved or deleted"""
+        label = model._meta.label_lower
+        if label in self.registered:
+            return
+        with self.lock:
+            if label in self.registered:
+                return
+            uid = f'{KEY_PREFIX}:{id(self)}:{label}'
+            post_save.connect(self._on_change, sender=model, weak=False, dispatch_uid=uid)
+            post_delete.connect(self._on_change, sender=model, weak=False, dispatch_uid=uid)
+            self.registered.add(label)
+
+    def _on_change(self, sender, **kwargs):
+        self.bump(sender)
+
+    def version_key(self, label):
+        return f'{KEY_PREFIX}:version:{label}'
+
+    def get_version(self, model):
+        key = self.version_key(model._meta.label_lower)
+        version = self.shared.get(key)
+        if version is None:
+            # Start from the clock, not 1, so an evicted counter never reuses an old version
+            self.shared.add(key, time.time_ns(), timeout=None)
+            version = self.shared.get(key)
+        return version
+
+    def version_tag(self, *models):
+        """Combined version of ``models``, for keys of anything rendered from them"""
+        for model in models:
+            self.register(model)
+        return '.'.join(str(self.get_version(model)) for model in models)
+
+    def bump(self, model):
+        label = model._meta.label_lower
+        try:
+            self.shared.incr(self.version_key(label))
+        except ValueError:
+            self.shared.set(self.version_key(label), time.time_ns(), timeout=None)
+        prefix = f'{KEY_PREFIX}:{label}:'
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+    def get_list(self, queryset):
+        """Rows of ``queryset`` as a tuple, from the nearest cache that has them"""
+        model = queryset.model
+        self.register(model)
+        digest = hashlib.md5(str(queryset.query).encode(), usedforsecurity=False).hexdigest()
+        key = f'{KEY_PREFIX}:{model._meta.label_lower}:{digest}:{self.get_version(model)}'
+
+        with self.lock:
+            value = self.entries.get(key, MISSING)
+            if value is not MISSING:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self.shared.get(key, MISSING)
+        if value is MISSING:
+            value = tuple(queryset.all())
+            self.shared.set(key, value, SHARED_TIMEOUT)
+            self.misses += 1
+        else:
+            self.shared_hits += 1
+
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+
+reference_cache = ReferenceCache()
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in self.field.cached_choices():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.cached_choices()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.cached_choices())
+
+
+class CachedModelChoiceField(ModelChoiceField):
+    """ModelChoiceField whose choices and validation come from the reference cache"""
+
+    iterator = CachedModelChoiceIterator
+
+    def cached_choices(self):
+        return reference_cache.get_list(self.queryset)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        self.validate_no_null_characters(value)
+        key = self.to_field_name or 'pk'
+        if isinstance(value, self.queryset.model):
+            value = getattr(value, key)
+        for obj in self.cached_choices():
+            if str(getattr(obj, key)) == str(value):
+                return obj
+        raise ValidationError(
+            self.error_messages['invalid_choice'],
+            code='invalid_choice',
+            params={'value': value},
+        )
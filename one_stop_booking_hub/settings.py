@@ -52,6 +52,9 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'libraries': {
+                'images': 'one_stop_booking_hub.image_tags',
+            },
         },
     },
 ]
@@ -70,6 +73,29 @@ DATABASES = {
     }
 }
 
+# Product/shop search: 'database' (MySQL FULLTEXT / SQLite FTS5) or 'python'
+# (in-process inverted index kept in sync by model signals)
+SABJI_MARKET_SEARCH_BACKEND = 'database'
+
+# Cache for reference data, anonymous pages and template fragments. Run more
+# than one worker process against a shared backend (Memcached or Redis) so
+# that version bumps and warm_page_cache reach every process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'one-stop-booking-hub',
+    }
+}
+
+# Node bits of order, payment and booking ids (one_stop_booking_hub.ids).
+# Every process that creates ids needs its own node: pin one per worker
+# through the environment, or switch CACHES to a shared backend (Redis,
+# Memcached) and leave this unset so workers lease nodes from it. The
+# local-memory cache above cannot lease, so only the single-process
+# development server falls back to node 0; otherwise the ids.E002 system
+# check stops manage.py (check, migrate, runserver) before any order fails.
+ID_GENERATOR_NODE = os.environ.get('ID_GENERATOR_NODE', 0 if DEBUG else None)
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
@@ -108,4 +134,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Media files
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Uploads are stored once per distinct content under media/cas/ and never
+# change; the web server should send that prefix with
+# "Cache-Control: public, max-age=31536000, immutable"
+STORAGES = {
+    'default': {'BACKEND': 'one_stop_booking_hub.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
\ No newline at end of file
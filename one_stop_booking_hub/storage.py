@@ -0,0 +1,76 @@
+# one_stop_booking_hub/storage.py
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+
+# Hashed uploads live under MEDIA_ROOT/cas/; their URLs never change meaning,
+# so the web server can send them with an immutable, year-long Cache-Control
+CONTENT_ROOT = 'cas'
+
+# Longest extension kept from the uploaded name
+MAX_EXTENSION = 10
+
+
+def is_content_name(name):
+    return bool(name) and name.startswith(f'{CONTENT_ROOT}/')
+
+
+def content_name(digest, original_name):
+    """``cas/ab/cd/<sha256>.<ext>`` for content with ``digest``"""
+    extension = posixpath.splitext(original_name)[1].lower()
+    if len(extension) > MAX_EXTENSION or not extension[1:].isalnum():
+        extension = ''
+    return f'{CONTENT_ROOT}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage that names every saved file after the SHA-256 of its content.
+
+    Saving bytes that are already stored writes nothing and returns the
+    existing name, so identical uploads share one file. Whether a stored
+    file is still referenced is tracked outside the storage (see
+    sabji_market.media); saving an existing file refreshes its mtime so a
+    concurrent garbage collection pass leaves it alone.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save; collisions are identical bytes
+        return name
+
+    def _save(self, name, content):
+        validate_file_name(name, allow_relative_path=True)
+        directory = self.path(CONTENT_ROOT)
+        os.makedirs(directory, exist_ok=True)
+
+        # Hash and spool in one pass, then move into place under the hashed name
+        digest = hashlib.sha256()
+        handle = tempfile.NamedTemporaryFile(dir=directory, prefix='.upload-', delete=False)
+        try:
+            with handle:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    handle.write(chunk)
+
+            final_name = content_name(digest.hexdigest(), name)
+            full_path = self.path(final_name)
+            if os.path.exists(full_path):
+                os.utime(full_path)
+                return final_name
+
+            if self.directory_permissions_mode is not None:
+                os.makedirs(os.path.dirname(full_path), self.directory_permissions_mode, exist_ok=True)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.chmod(handle.name, self.file_permissions_mode or 0o644)
+            # Atomic, so a concurrent save of the same bytes just replaces it with itself
+            os.replace(handle.name, full_path)
+            return final_name
+        finally:
+            if os.path.exists(handle.name):
+                os.remove(handle.name)
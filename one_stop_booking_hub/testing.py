@@ -0,0 +1,21 @@
+# one_stop_booking_hub/testing.py
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def assert_max_queries(limit, using=DEFAULT_DB_ALIAS):
+    """Fail if the block runs more than ``limit`` queries, listing the SQL that ran.
+
+    Unlike ``assertNumQueries`` this is a budget rather than an exact count, so
+    tests can pin a view at a constant ceiling and check it against seeded
+    data of several sizes to catch N+1 lookups.
+    """
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    executed = len(context)
+    if executed > limit:
+        queries = '\n'.join(f'{number}. {query["sql"]}' for number, query in enumerate(context.captured_queries, 1))
+        raise AssertionError(f'{executed} queries executed, {limit} allowed:\n{queries}')
@@ -1,10 +1,14 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from . import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('internal/cache-stats/', views.cache_stats, name='cache_stats'),  # Cache counters for monitoring
+    path('images/<str:size>/<str:fmt>/<path:name>', views.image_derivative, name='image_derivative'),  # Lazy image derivatives
     path('', include('accounts.urls')),  # Root URL goes to accounts
     path('accounts/', include('accounts.urls')),  # Also accessible via /accounts/
     path('cab-booking/', include('cab_booking.urls')),  # Cab booking URLs
@@ -13,4 +17,7 @@ urlpatterns = [
 
 # Serve media files during development
 if settings.DEBUG:
+    urlpatterns += [
+        re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>cas/.*)$', views.serve_immutable, {'document_root': settings.MEDIA_ROOT}),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
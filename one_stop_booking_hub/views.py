@@ -0,0 +1,45 @@
+# one_stop_booking_hub/views.py
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponseRedirect, JsonResponse
+from django.views.decorators.http import require_safe
+from django.views.static import serve
+
+from .images import FORMATS, SIZES, derivative_name, image_pipeline, is_safe_source
+from .page_cache import page_cache
+from .reference_cache import reference_cache
+
+
+@staff_member_required
+def cache_stats(request):
+    """Hit/miss counters of this process's caches, for monitoring"""
+    return JsonResponse({
+        'reference': reference_cache.stats(),
+        'page': page_cache.stats(),
+        'images': image_pipeline.stats(),
+    })
+
+
+@require_safe
+def image_derivative(request, size, fmt, name):
+    """Build a missing image derivative on first request, then redirect to it"""
+    if size not in SIZES or fmt not in FORMATS or not is_safe_source(name):
+        raise Http404
+    if not image_pipeline.is_ready(name):
+        if not image_pipeline.storage.exists(name):
+            raise Http404
+        try:
+            image_pipeline.ensure(name)
+        except Exception:
+            raise Http404
+    response = HttpResponseRedirect(image_pipeline.storage.url(derivative_name(name, size, fmt)))
+    # The target never changes for a given source name
+    response['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+
+def serve_immutable(request, path, document_root=None):
+    """Development server for content-addressed media, with the caching headers production sends"""
+    response = serve(request, path, document_root=document_root)
+    if response.status_code == 200:
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -2,8 +2,10 @@
 from django.contrib import admin
 from .models import (
     ShopCategory, ProductCategory, Shop, Product, Cart, CartItem,
-    Order, OrderItem, ShopReview, ShopRegistrationPayment
+    Order, OrderItem, ShopReview, ShopRegistrationPayment,
+    ShopDailySales, ProductDailySales, StoredFile
 )
+from .cart import annotate_cart_totals, line_total_expression
 
 @admin.register(ShopCategory)
 class ShopCategoryAdmin(admin.ModelAdmin):
@@ -24,7 +26,10 @@ class ShopAdmin(admin.ModelAdmin):
     list_display = ['name', 'owner', 'city', 'status', 'is_open', 'registration_fee_paid', 'created_at']
     list_filter = ['status', 'is_open', 'registration_fee_paid', 'is_delivery_available', 'city', 'created_at']
     search_fields = ['name', 'owner__username', 'owner__email', 'phone_number', 'city']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = [
+        'rating_sum', 'review_count', 'rating_1_count', 'rating_2_count',
+        'rating_3_count', 'rating_4_count', 'rating_5_count', 'created_at', 'updated_at'
+    ]
     fieldsets = (
         ('Basic Information', {
             'fields': ('owner', 'name', 'owner_name', 'category')
@@ -38,6 +43,11 @@ class ShopAdmin(admin.ModelAdmin):
         ('Status & Settings', {
             'fields': ('status', 'is_open', 'is_delivery_available', 'delivery_charge', 'registration_fee_paid')
         }),
+        ('Ratings', {
+            'fields': ('rating_sum', 'review_count', 'rating_1_count', 'rating_2_count',
+                       'rating_3_count', 'rating_4_count', 'rating_5_count'),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -46,16 +56,16 @@ class ShopAdmin(admin.ModelAdmin):
 
 @admin.register(Product)  
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'shop', 'category', 'price', 'get_discounted_price', 'stock_quantity', 'is_available', 'created_at']
+    list_display = ['name', 'shop', 'category', 'price', 'effective_price', 'stock_quantity', 'is_available', 'created_at']
     list_filter = ['is_available', 'is_organic', 'category', 'shop__city', 'created_at']
     search_fields = ['name', 'shop__name', 'description']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['effective_price', 'created_at', 'updated_at']
     fieldsets = (
         ('Basic Information', {
             'fields': ('shop', 'name', 'category', 'description')
         }),
         ('Pricing & Stock', {
-            'fields': ('price', 'discount_percentage', 'unit', 'stock_quantity')
+            'fields': ('price', 'discount_percentage', 'effective_price', 'unit', 'stock_quantity')
         }),
         ('Settings', {
             'fields': ('image', 'is_available', 'is_organic')
@@ -70,13 +80,34 @@ class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
     readonly_fields = ['get_total_price']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product__shop').annotate(
+            line_total=line_total_expression()
+        )
+    
+    @admin.display(description='Total price')
+    def get_total_price(self, obj):
+        return getattr(obj, 'line_total', None)
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ['user', 'get_total_items', 'get_total_price', 'created_at']
+    list_select_related = ['user']
     search_fields = ['user__username', 'user__email']
     readonly_fields = ['created_at', 'updated_at']
     inlines = [CartItemInline]
+    
+    def get_queryset(self, request):
+        return annotate_cart_totals(super().get_queryset(request))
+    
+    @admin.display(description='Total items', ordering='total_items')
+    def get_total_items(self, obj):
+        return obj.total_items
+    
+    @admin.display(description='Total price', ordering='total_price')
+    def get_total_price(self, obj):
+        return obj.total_price
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -121,4 +152,44 @@ class ShopRegistrationPaymentAdmin(admin.ModelAdmin):
     list_display = ['shop', 'amount', 'status', 'payment_method', 'transaction_id', 'created_at']
     list_filter = ['status', 'payment_method', 'created_at']
     search_fields = ['shop__name', 'transaction_id']
-    readonly_fields = ['created_at', 'updated_at']
\ No newline at end of file
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(ShopDailySales)
+class ShopDailySalesAdmin(admin.ModelAdmin):
+    list_display = ['shop', 'date', 'revenue', 'order_count', 'units_sold', 'cancelled_count']
+    list_filter = ['date']
+    search_fields = ['shop__name']
+    list_select_related = ['shop']
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ProductDailySales)
+class ProductDailySalesAdmin(admin.ModelAdmin):
+    list_display = ['product', 'shop', 'date', 'revenue', 'order_count', 'units_sold']
+    list_filter = ['date']
+    search_fields = ['product__name', 'shop__name']
+    list_select_related = ['product', 'shop']
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(StoredFile)
+class StoredFileAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'refcount', 'created_at', 'updated_at']
+    list_filter = ['created_at']
+    search_fields = ['name']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
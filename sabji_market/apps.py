@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class SabjiMarketConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sabji_market'
-    verbose_name = 'Sabji Market'
\ No newline at end of file
+    verbose_name = 'Sabji Market'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,180 @@
+# sabji_market/cart.py
+from decimal import Decimal
+
+from django.db import connections, router
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Cart, CartItem, Product
+
+PRICE_FIELD = DecimalField(max_digits=10, decimal_places=2)
+ZERO = Decimal('0.00')
+
+
+def discounted_price_expression(prefix=''):
+    """Product.get_discounted_price() (the stored effective_price) for a product lookup path"""
+    return F(f'{prefix}effective_price')
+
+
+def line_total_expression(prefix=''):
+    """Discounted unit price times quantity for a cart item lookup path"""
+    unit_price = discounted_price_expression(f'{prefix}product__')
+    return ExpressionWrapper(unit_price * F(f'{prefix}quantity'), output_field=PRICE_FIELD)
+
+
+def annotate_cart_totals(queryset):
+    """Annotate a Cart queryset with total_items and total_price in the same query"""
+    return queryset.annotate(
+        total_items=Coalesce(Sum('items__quantity'), 0),
+        total_price=Coalesce(Sum(line_total_expression('items__')), ZERO, output_field=PRICE_FIELD),
+    )
+
+
+def bump_version(cart):
+    """Record a change to ``cart``'s lines so other tabs' batch updates see a conflict"""
+    Cart.objects.filter(pk=cart.pk).update(version=F('version') + 1, updated_at=timezone.now())
+    cart.version += 1
+
+
+def upsert_items(items):
+    """Insert ``items`` or update the quantity of existing (cart, product) lines, in one statement"""
+    # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target and Django
+    # refuses unique_fields there; it upserts on the unique_together index
+    features = connections[router.db_for_write(CartItem)].features
+    CartItem.objects.bulk_create(
+        items, update_conflicts=True,
+        unique_fields=['cart', 'product'] if features.supports_update_conflicts_with_target else None,
+        update_fields=['quantity', 'updated_at'],
+    )
+
+
+def cart_lines(cart):
+    """``cart``'s items with their product and shop, priced, grouped by shop"""
+    return (
+        CartItem.objects.filter(cart=cart)
+        .select_related('product__shop')
+        .annotate(
+            unit_price=discounted_price_expression('product__'),
+            line_total=line_total_expression(),
+        )
+        .order_by('product__shop_id', 'id')
+    )
+
+
+class CartSummary:
+    """Priced snapshot of a cart, loaded with a single query.
+
+    Every line carries ``unit_price`` and ``line_total`` annotations, and the
+    lines are grouped per shop with subtotal and delivery charge, so templates
+    never have to touch the database while rendering the cart.
+    """
+
+    is_guest = False
+
+    def __init__(self, cart):
+        self.cart = cart
+        self.items = []
+        self.shops = {}
+        self.total_items = 0
+        self.total_price = ZERO
+        if cart is None or cart.pk is None:
+            return
+
+        for item in cart_lines(cart):
+            self.add(item)
+
+    def add(self, item):
+        self.items.append(item)
+        self.total_items += item.quantity
+        self.total_price += item.line_total
+
+        shop = item.product.shop
+        if shop not in self.shops:
+            self.shops[shop] = {
+                'items': [],
+                'subtotal': ZERO,
+                'delivery_charge': shop.delivery_charge if shop.is_delivery_available else ZERO,
+            }
+        self.shops[shop]['items'].append(item)
+        self.shops[shop]['subtotal'] += item.line_total
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @property
+    def line_count(self):
+        return len(self.items)
+
+    @property
+    def delivery_charge(self):
+        return sum((data['delivery_charge'] for data in self.shops.values()), ZERO)
+
+    @property
+    def total_amount(self):
+        """Grand total including every shop's delivery charge"""
+        return self.total_price + self.delivery_charge
+
+    def as_dict(self):
+        """JSON-ready lines, per-shop subtotals and totals"""
+        return {
+            'version': self.cart.version if self.cart is not None else 0,
+            'item_count': self.total_items,
+            'line_count': self.line_count,
+            'total_price': self.total_price,
+            'delivery_charge': self.delivery_charge,
+            'total_amount': self.total_amount,
+            'shops': [
+                {
+                    'id': shop.pk,
+                    'name': shop.name,
+                    'subtotal': data['subtotal'],
+                    'delivery_charge': data['delivery_charge'],
+                    'items': [
+                        {
+                            'product': item.product_id,
+                            'name': item.product.name,
+                            'quantity': item.quantity,
+                            # SQLite hands back annotations without their scale
+                            'unit_price': item.unit_price.quantize(ZERO),
+                            'line_total': item.line_total.quantize(ZERO),
+                        }
+                        for item in data['items']
+                    ],
+                }
+                for shop, data in self.shops.items()
+            ],
+        }
+
+
+class GuestCartSummary(CartSummary):
+    """CartSummary of a signed-out visitor's ``{product_id: quantity}`` lines.
+
+    Lines are unsaved CartItems priced by the same query annotations, so
+    the cart template renders either kind; products no longer available
+    drop out.
+    """
+
+    is_guest = True
+
+    def __init__(self, lines):
+        super().__init__(None)
+        if not lines:
+            return
+        products = (
+            Product.objects.filter(pk__in=lines, is_available=True)
+            .select_related('shop')
+            .annotate(unit_price=discounted_price_expression())
+            .order_by('shop_id', 'id')
+        )
+        for product in products:
+            item = CartItem(product=product, quantity=lines[product.pk])
+            item.unit_price = product.unit_price
+            item.line_total = (product.unit_price * item.quantity).quantize(ZERO)
+            self.add(item)
@@ -0,0 +1,134 @@
+# sabji_market/cart_operations.py
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.utils import ErrorList
+from django.utils import timezone
+
+from .cart import bump_version, upsert_items
+from .forms import CartOperationForm
+from .models import Cart, CartItem, Product
+
+# Bounds one request's lock set and upsert
+MAX_OPERATIONS = 200
+
+
+class OperationError(Exception):
+    """A batch of cart operations that was rejected as a whole"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f'{len(errors)} invalid operation(s)')
+
+
+class VersionConflict(Exception):
+    """The cart changed since the client last read it"""
+
+    def __init__(self, cart):
+        self.cart = cart
+        super().__init__(f'Cart is at version {cart.version}')
+
+
+def clean_operation(operation):
+    """Cleaned ``{'op', 'product', 'quantity'}`` for one operation, or ``(None, errors)``.
+
+    Runs CartOperationForm's fields directly, as pricing.clean_patch does.
+    """
+    cleaned, errors = {}, {}
+    for name, field in CartOperationForm.base_fields.items():
+        try:
+            cleaned[name] = field.clean(operation.get(name))
+        except ValidationError as e:
+            errors[name] = ErrorList(e.error_list).get_json_data()
+    unknown = set(operation) - set(CartOperationForm.base_fields)
+    for name in sorted(unknown):
+        errors[name] = [{'message': 'Unknown field', 'code': 'unknown'}]
+    if not errors and cleaned['op'] != 'remove' and cleaned['quantity'] is None:
+        errors['quantity'] = [{'message': 'This field is required.', 'code': 'required'}]
+    if not errors and cleaned['op'] == 'add' and cleaned['quantity'] < 1:
+        errors['quantity'] = [{'message': 'Add at least one.', 'code': 'min_value'}]
+    if errors:
+        return None, errors
+    return cleaned, None
+
+
+def clean_operations(operations):
+    """Cleaned operations in order, or OperationError listing every bad entry"""
+    if not isinstance(operations, list) or not operations:
+        raise OperationError([{'index': None, 'errors': {'__all__': ['Send a non-empty list of operations']}}])
+    if len(operations) > MAX_OPERATIONS:
+        raise OperationError([{'index': None, 'errors': {'__all__': [f'At most {MAX_OPERATIONS} operations per request']}}])
+
+    cleaned, errors = [], []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            errors.append({'index': index, 'errors': {'__all__': ['Not a JSON object']}})
+            continue
+        result, operation_errors = clean_operation(operation)
+        if result is None:
+            errors.append({'index': index, 'errors': operation_errors})
+        else:
+            cleaned.append(result)
+    if errors:
+        raise OperationError(errors)
+    return cleaned
+
+
+def apply_operations(user, version, operations):
+    """Apply add/update/remove operations to ``user``'s cart in one transaction.
+
+    The cart row is locked and its ``version`` must equal ``version``, or
+    VersionConflict is raised and nothing changes; a client that read the
+    cart in another tab has to re-read before it can write. The lines and
+    products touched are each loaded with one query, operations are applied
+    in order in memory and the result is written with one DELETE and one
+    upsert. Either every operation applies or none does. Returns the cart.
+    """
+    operations = clean_operations(operations)
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user=user)
+        cart = Cart.objects.select_for_update().get(pk=cart.pk)
+        if version != cart.version:
+            raise VersionConflict(cart)
+
+        product_ids = {operation['product'] for operation in operations}
+        stored = dict(
+            CartItem.objects.filter(cart=cart, product_id__in=product_ids).values_list('product_id', 'quantity')
+        )
+        stock = dict(
+            Product.objects.filter(pk__in=product_ids, is_available=True).values_list('pk', 'stock_quantity')
+        )
+
+        lines, errors = dict(stored), []
+        for index, operation in enumerate(operations):
+            product_id = operation['product']
+            if operation['op'] == 'remove':
+                lines.pop(product_id, None)
+                continue
+            quantity = operation['quantity']
+            if operation['op'] == 'add':
+                quantity += lines.get(product_id, 0)
+            if quantity == 0:
+                lines.pop(product_id, None)
+            elif product_id not in stock:
+                errors.append({'index': index, 'errors': {'product': [f'Product {product_id} is not available']}})
+            elif quantity > stock[product_id]:
+                errors.append({'index': index, 'errors': {'quantity': [f'Only {stock[product_id]} in stock']}})
+            else:
+                lines[product_id] = quantity
+        if errors:
+            raise OperationError(errors)
+
+        removed = [product_id for product_id in stored if product_id not in lines]
+        now = timezone.now()
+        changed = [
+            CartItem(cart=cart, product_id=product_id, quantity=quantity, created_at=now, updated_at=now)
+            for product_id, quantity in lines.items()
+            if stored.get(product_id) != quantity
+        ]
+        if removed:
+            CartItem.objects.filter(cart=cart, product_id__in=removed).delete()
+        if changed:
+            upsert_items(changed)
+        if removed or changed:
+            bump_version(cart)
+    return cart
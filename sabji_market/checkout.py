@@ -0,0 +1,105 @@
+# sabji_market/checkout.py
+import logging
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+from one_stop_booking_hub.ids import new_id
+
+from .cart import bump_version
+from .inventory import reserve_stock
+from .models import CartItem, Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+
+class CheckoutTimings:
+    """Wall-clock duration of each checkout stage, in milliseconds"""
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, (time.perf_counter() - start) * 1000))
+
+    @property
+    def total(self):
+        return sum(duration for name, duration in self.stages)
+
+    def as_dict(self):
+        return dict(self.stages)
+
+    def as_server_timing(self):
+        """Value for a ``Server-Timing`` response header"""
+        return ', '.join(f'{name};dur={duration:.2f}' for name, duration in self.stages)
+
+
+def generate_order_id():
+    return new_id('ORD')
+
+
+def place_orders(user, summary, customer_name, customer_phone, delivery_type, delivery_address=''):
+    """Turn a priced cart into one order per shop and empty the cart.
+
+    Orders, order items, the stock reservation and the cart clean-up share
+    one transaction, so a failure at any stage (including OutOfStock) leaves
+    neither half-written orders, lost stock nor a lost cart. Stock is
+    reserved after the inserts to hold product row locks as briefly as
+    possible. Returns the created orders and the per-stage timings.
+    """
+    timings = CheckoutTimings()
+
+    with transaction.atomic():
+        with timings.stage('orders'):
+            orders = []
+            for shop, data in summary.shops.items():
+                delivery_charge = data['delivery_charge'] if delivery_type == 'delivery' else 0
+                orders.append(Order(
+                    order_id=generate_order_id(),
+                    customer=user,
+                    shop=shop,
+                    customer_name=customer_name,
+                    customer_phone=customer_phone,
+                    delivery_address=delivery_address,
+                    delivery_type=delivery_type,
+                    subtotal=data['subtotal'],
+                    delivery_charge=delivery_charge,
+                    total_amount=data['subtotal'] + delivery_charge,
+                ))
+            Order.objects.bulk_create(orders)
+
+            # Backends without INSERT ... RETURNING (MySQL) leave pk unset
+            if orders and orders[0].pk is None:
+                saved = Order.objects.in_bulk([order.order_id for order in orders], field_name='order_id')
+                for order in orders:
+                    order.pk = saved[order.order_id].pk
+
+        with timings.stage('order_items'):
+            order_items = []
+            for order in orders:
+                for item in summary.shops[order.shop]['items']:
+                    order_items.append(OrderItem(
+                        order=order,
+                        product=item.product,
+                        quantity=item.quantity,
+                        price=item.unit_price,
+                    ))
+            OrderItem.objects.bulk_create(order_items)
+
+        with timings.stage('stock'):
+            reserve_stock({item.product_id: item.quantity for item in summary})
+
+        with timings.stage('clear_cart'):
+            CartItem.objects.filter(cart=summary.cart).delete()
+            bump_version(summary.cart)
+
+    logger.info(
+        'Checkout for user %s created %d orders with %d items in %.2f ms (%s)',
+        user.pk, len(orders), len(order_items), timings.total, timings.as_server_timing(),
+    )
+    return orders, timings
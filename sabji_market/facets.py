@@ -0,0 +1,168 @@
+# sabji_market/facets.py
+import hashlib
+from collections import Counter
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+
+from one_stop_booking_hub.reference_cache import reference_cache
+
+from .models import Product, ProductCategory, Shop
+
+KEY_PREFIX = 'facets'
+
+# Price buckets on what the customer pays: (key, label, lower, upper), upper exclusive
+PRICE_BUCKETS = (
+    ('0-50', 'Under ₹50', None, Decimal('50')),
+    ('50-100', '₹50 – ₹100', Decimal('50'), Decimal('100')),
+    ('100-200', '₹100 – ₹200', Decimal('100'), Decimal('200')),
+    ('200-500', '₹200 – ₹500', Decimal('200'), Decimal('500')),
+    ('500-', '₹500 and above', Decimal('500'), None),
+)
+
+ORGANIC_CHOICES = (('yes', 'Organic'), ('no', 'Non-organic'))
+
+FACETS = ('category', 'organic', 'price', 'city')
+
+# Versions keep entries fresh; the timeout only bounds how long one-off searches linger
+CACHE_TIMEOUT = 15 * 60
+
+
+def price_bucket_expression():
+    """Index into PRICE_BUCKETS of a product's effective price, as SQL"""
+    whens = [
+        When(effective_price__lt=upper, then=Value(position))
+        for position, (key, label, lower, upper) in enumerate(PRICE_BUCKETS)
+        if upper is not None
+    ]
+    return Case(*whens, default=Value(len(PRICE_BUCKETS) - 1), output_field=IntegerField())
+
+
+def price_bucket_filter(keys):
+    condition = Q()
+    for key, label, lower, upper in PRICE_BUCKETS:
+        if key in keys:
+            bounds = {}
+            if lower is not None:
+                bounds['effective_price__gte'] = lower
+            if upper is not None:
+                bounds['effective_price__lt'] = upper
+            condition |= Q(**bounds)
+    return condition
+
+
+def facet_rows(queryset):
+    """``[(category_id, organic, price_bucket, city, count)]`` from one grouped query"""
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=price_bucket_expression())
+        .values('category_id', 'is_organic', 'price_bucket', 'shop__city')
+        .annotate(count=Count('pk'))
+        .values_list('category_id', 'is_organic', 'price_bucket', 'shop__city', 'count')
+    )
+    return [
+        (category_id, 'yes' if is_organic else 'no', PRICE_BUCKETS[bucket][0], city, count)
+        for category_id, is_organic, bucket, city, count in rows
+    ]
+
+
+def cached_facet_rows(queryset):
+    """``facet_rows`` of ``queryset`` through the shared cache.
+
+    Entries are keyed by the queryset's SQL and the versions of the tables
+    the counts come from, so a write to any Product, Shop or ProductCategory
+    starts every query on a fresh entry. One entry serves every combination
+    of facet selections, which are applied to the rows in Python.
+    """
+    cache = caches[reference_cache.alias]
+    digest = hashlib.md5(str(queryset.query).encode(), usedforsecurity=False).hexdigest()
+    key = f'{KEY_PREFIX}:{digest}:{reference_cache.version_tag(Product, Shop, ProductCategory)}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = facet_rows(queryset)
+        cache.set(key, rows, CACHE_TIMEOUT)
+    return rows
+
+
+def invalidate():
+    """Start every query on fresh counts once the current transaction commits.
+
+    Product saves and deletes bump the version through their signals; writes
+    through ``update()`` or the bulk methods must call this themselves.
+    """
+    transaction.on_commit(lambda: reference_cache.bump(Product))
+
+
+def filter_products(queryset, selected):
+    """Narrow ``queryset`` to the selections: any value within a facet, every facet"""
+    if selected.get('category'):
+        queryset = queryset.filter(category_id__in=selected['category'])
+    if selected.get('organic'):
+        queryset = queryset.filter(is_organic__in=[value == 'yes' for value in selected['organic']])
+    if selected.get('price'):
+        queryset = queryset.filter(price_bucket_filter(selected['price']))
+    if selected.get('city'):
+        queryset = queryset.filter(shop__city__in=selected['city'])
+    return queryset
+
+
+def count_facets(rows, selected):
+    """``{facet: Counter(value -> results)}`` for the grouped ``rows``.
+
+    A facet's counts apply every other facet's selections but not its own,
+    so each count is the number of results picking that value would give
+    alongside the values already picked in the same facet.
+    """
+    selected = {facet: set(selected.get(facet) or ()) for facet in FACETS}
+    counts = {facet: Counter() for facet in FACETS}
+    for row in rows:
+        values, count = row[:-1], row[-1]
+        misses = [facet for facet, value in zip(FACETS, values) if selected[facet] and value not in selected[facet]]
+        if len(misses) > 1:
+            continue
+        for facet, value in zip(FACETS, values):
+            if not misses or misses == [facet]:
+                counts[facet][value] += count
+    return counts
+
+
+def facet_options(counts, selected):
+    """Counts as ``{facet: [{'value', 'label', 'count', 'selected'}]}`` for the response"""
+    selected = {facet: set(selected.get(facet) or ()) for facet in FACETS}
+    categories = {category.pk: category.name for category in reference_cache.get_list(ProductCategory.objects.all())}
+    choices = {
+        'category': sorted(categories.items(), key=lambda item: item[1].lower()),
+        'organic': ORGANIC_CHOICES,
+        'price': [(key, label) for key, label, lower, upper in PRICE_BUCKETS],
+        'city': [(city, city) for city in sorted(set(counts['city']) | selected['city'], key=str.lower)],
+    }
+    return {
+        facet: [
+            {'value': value, 'label': label, 'count': counts[facet][value], 'selected': value in selected[facet]}
+            for value, label in choices[facet]
+            if counts[facet][value] or value in selected[facet]
+        ]
+        for facet in FACETS
+    }
+
+
+def faceted_search(queryset, selected):
+    """The filtered products and facet options for ``selected`` within ``queryset``"""
+    rows = cached_facet_rows(queryset)
+    return filter_products(queryset, selected), facet_options(count_facets(rows, selected), selected)
+
+
+def product_result(product):
+    return {
+        'id': product.pk,
+        'name': product.name,
+        'shop': {'id': product.shop_id, 'name': product.shop.name, 'city': product.shop.city},
+        'category': product.category_id,
+        'price': product.price,
+        'discount_percentage': product.discount_percentage,
+        'effective_price': product.get_discounted_price(),
+        'unit': product.unit,
+        'is_organic': product.is_organic,
+    }
@@ -1,6 +1,8 @@
 # sabji_market/forms.py
 from django import forms
 from django.contrib.auth.models import User
+from one_stop_booking_hub.reference_cache import CachedModelChoiceField, reference_cache
+from .facets import ORGANIC_CHOICES, PRICE_BUCKETS
 from .models import (
     Shop, Product, Cart, CartItem, Order, ShopReview, 
     ShopCategory, ProductCategory
@@ -10,6 +12,7 @@ class ShopRegistrationForm(forms.ModelForm):
     class Meta:
         model = Shop
         fields = ['name', 'owner_name', 'phone_number', 'email', 'address', 'city', 'pincode', 'shop_image', 'description', 'category']
+        field_classes = {'category': CachedModelChoiceField}
         
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -77,6 +80,7 @@ class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
         fields = ['name', 'description', 'category', 'image', 'price', 'discount_percentage', 'unit', 'stock_quantity', 'is_organic']
+        field_classes = {'category': CachedModelChoiceField}
         
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -201,7 +205,7 @@ class ShopSearchForm(forms.Form):
         })
     )
     
-    category = forms.ModelChoiceField(
+    category = CachedModelChoiceField(
         queryset=ShopCategory.objects.filter(is_active=True),
         required=False,
         empty_label="All Categories",
@@ -212,6 +216,12 @@ class ShopSearchForm(forms.Form):
         required=False,
         widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
     )
+    
+    sort = forms.ChoiceField(
+        choices=[('', 'Default'), ('rating', 'Top Rated'), ('reviews', 'Most Reviewed')],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
 
 class ProductSearchForm(forms.Form):
     search = forms.CharField(
@@ -222,7 +232,7 @@ class ProductSearchForm(forms.Form):
         })
     )
     
-    category = forms.ModelChoiceField(
+    category = CachedModelChoiceField(
         queryset=ProductCategory.objects.filter(is_active=True),
         required=False,
         empty_label="All Categories",
@@ -248,6 +258,39 @@ class ProductSearchForm(forms.Form):
             'step': '0.01'
         })
     )
+    
+    sort = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Best match'), ('price', 'Price: low to high'), ('-price', 'Price: high to low')],
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+class ProductFacetForm(forms.Form):
+    """Query of the faceted product search; each facet takes any number of values"""
+    search = forms.CharField(required=False, max_length=100)
+    shop = forms.IntegerField(required=False, min_value=1)
+    category = forms.TypedMultipleChoiceField(required=False, coerce=int)
+    organic = forms.MultipleChoiceField(required=False, choices=ORGANIC_CHOICES)
+    price = forms.MultipleChoiceField(
+        required=False,
+        choices=[(key, label) for key, label, lower, upper in PRICE_BUCKETS]
+    )
+    city = forms.Field(required=False, widget=forms.MultipleHiddenInput)
+    sort = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Best match'), ('price', 'Price: low to high'), ('-price', 'Price: high to low')]
+    )
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['category'].choices = [
+            (category.pk, category.name)
+            for category in reference_cache.get_list(ProductCategory.objects.all())
+        ]
+    
+    def clean_city(self):
+        cities = [city.strip() for city in self.cleaned_data['city'] or []]
+        return list(dict.fromkeys(city for city in cities if city))
 
 class OrderStatusUpdateForm(forms.ModelForm):
     class Meta:
@@ -265,4 +308,32 @@ class OrderStatusUpdateForm(forms.ModelForm):
             'class': 'form-control',
             'rows': 3,
             'placeholder': 'Add any notes about the order status...'
-        })
\ No newline at end of file
+        })
+
+class ProductPatchForm(forms.Form):
+    """One entry of a batch price/stock update; fields left out are unchanged"""
+    id = forms.IntegerField(min_value=1)
+    price = forms.DecimalField(required=False, max_digits=8, decimal_places=2, min_value=0)
+    discount_percentage = forms.DecimalField(required=False, max_digits=5, decimal_places=2, min_value=0, max_value=100)
+    stock_quantity = forms.IntegerField(required=False, min_value=0)
+    is_available = forms.NullBooleanField(required=False)
+
+
+class CartOperationForm(forms.Form):
+    """One entry of a batch cart update"""
+    op = forms.ChoiceField(choices=[('add', 'Add'), ('update', 'Update'), ('remove', 'Remove')])
+    product = forms.IntegerField(min_value=1)
+    # ``add`` adds to the line, ``update`` sets it (0 removes), ``remove`` ignores it
+    quantity = forms.IntegerField(required=False, min_value=0, max_value=99)
+
+
+class NearbyShopsForm(forms.Form):
+    pincode = forms.RegexField(
+        regex=r'^\d{6}$',
+        error_messages={'invalid': 'Enter a 6-digit pincode.'},
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Your pincode',
+            'inputmode': 'numeric',
+        })
+    )
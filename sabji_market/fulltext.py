@@ -0,0 +1,76 @@
+# sabji_market/fulltext.py
+"""DDL for the database full-text indexes used by search.DatabaseSearchBackend.
+
+Kept free of model imports so migrations can use it. On SQLite the FTS5
+tables are external-content tables fed by triggers; Django drops those
+triggers whenever a migration remakes the underlying table, so
+ensure_sqlite_triggers() runs after every migrate to put them back.
+"""
+
+SEARCH_TABLES = {
+    'sabji_market_product': ('name', 'description'),
+    'sabji_market_shop': ('name', 'description'),
+}
+
+TRIGGER_SUFFIXES = ('ai', 'ad', 'au')
+
+
+def sqlite_trigger_sql(table, columns):
+    fts = f'{table}_fts'
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    insert_new = f'INSERT INTO "{fts}"(rowid, {column_list}) VALUES (new.id, {new_values});'
+    delete_old = f'INSERT INTO "{fts}"("{fts}", rowid, {column_list}) VALUES (\'delete\', old.id, {old_values});'
+    return {
+        'ai': f'CREATE TRIGGER IF NOT EXISTS "{fts}_ai" AFTER INSERT ON "{table}" BEGIN {insert_new} END',
+        'ad': f'CREATE TRIGGER IF NOT EXISTS "{fts}_ad" AFTER DELETE ON "{table}" BEGIN {delete_old} END',
+        'au': f'CREATE TRIGGER IF NOT EXISTS "{fts}_au" AFTER UPDATE OF {column_list} ON "{table}" BEGIN {delete_old} {insert_new} END',
+    }
+
+
+def create_search_indexes(connection):
+    with connection.cursor() as cursor:
+        for table, columns in SEARCH_TABLES.items():
+            if connection.vendor == 'mysql':
+                cursor.execute(f'CREATE FULLTEXT INDEX `{table}_search` ON `{table}` ({", ".join(columns)})')
+            elif connection.vendor == 'sqlite':
+                fts = f'{table}_fts'
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS "{fts}" '
+                    f'USING fts5({", ".join(columns)}, content="{table}", content_rowid="id")'
+                )
+                for sql in sqlite_trigger_sql(table, columns).values():
+                    cursor.execute(sql)
+                cursor.execute(f'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')')
+
+
+def drop_search_indexes(connection):
+    with connection.cursor() as cursor:
+        for table in SEARCH_TABLES:
+            if connection.vendor == 'mysql':
+                cursor.execute(f'DROP INDEX `{table}_search` ON `{table}`')
+            elif connection.vendor == 'sqlite':
+                fts = f'{table}_fts'
+                for suffix in TRIGGER_SUFFIXES:
+                    cursor.execute(f'DROP TRIGGER IF EXISTS "{fts}_{suffix}"')
+                cursor.execute(f'DROP TABLE IF EXISTS "{fts}"')
+
+
+def ensure_sqlite_triggers(connection):
+    """Recreate FTS5 triggers lost to a table remake and resync the index"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        for table, columns in SEARCH_TABLES.items():
+            fts = f'{table}_fts'
+            if fts not in existing:
+                continue
+            triggers = sqlite_trigger_sql(table, columns)
+            missing = [suffix for suffix in TRIGGER_SUFFIXES if f'{fts}_{suffix}' not in existing]
+            for suffix in missing:
+                cursor.execute(triggers[suffix])
+            if missing:
+                cursor.execute(f'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')')
@@ -0,0 +1,154 @@
+# sabji_market/geo.py
+import csv
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+from one_stop_booking_hub.geo import MAX_DISTANCE_KM, GridIndex
+
+from .models import Shop
+
+# Bundled table of approximate centroids for head post offices of major
+# cities; point settings.PINCODE_CENTROIDS_FILE at the full India Post
+# directory (same columns) to cover every pincode
+BUNDLED_CENTROIDS = Path(__file__).resolve().parent / 'data' / 'pincode_centroids.csv'
+
+# Other processes' shop changes reach this one's index by rebuilding it
+REBUILD_INTERVAL = 5 * 60
+
+
+class PincodeTable:
+    """Pincode to ``(latitude, longitude)``, loaded once from a CSV.
+
+    Pincodes missing from the table fall back to the mean of the known
+    pincodes that share their first three digits (the sorting district).
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.centroids = None
+        self.districts = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        path = self.path or getattr(settings, 'PINCODE_CENTROIDS_FILE', None) or BUNDLED_CENTROIDS
+        centroids = {}
+        with open(path, newline='', encoding='utf-8') as handle:
+            for row in csv.DictReader(handle):
+                try:
+                    centroids[row['pincode'].strip()] = (float(row['latitude']), float(row['longitude']))
+                except (KeyError, ValueError):
+                    continue
+        districts = defaultdict(list)
+        for pincode, point in centroids.items():
+            districts[pincode[:3]].append(point)
+        self.districts = {
+            prefix: (sum(lat for lat, lon in points) / len(points), sum(lon for lat, lon in points) / len(points))
+            for prefix, points in districts.items()
+        }
+        self.centroids = centroids
+
+    def lookup(self, pincode):
+        """Centroid of ``pincode``, its district's, or None"""
+        if self.centroids is None:
+            with self.lock:
+                if self.centroids is None:
+                    self.load()
+        pincode = (pincode or '').strip()
+        return self.centroids.get(pincode) or self.districts.get(pincode[:3])
+
+
+class ShopLocator:
+    """In-process grid index of the shops that are active, open and deliver.
+
+    Built lazily, kept current by Shop signals in this process and rebuilt
+    every REBUILD_INTERVAL to pick up changes made by other processes.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.built_at = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def is_listed(shop):
+        return (
+            shop.status == 'active' and shop.is_open and shop.is_delivery_available
+            and shop.latitude is not None and shop.longitude is not None
+        )
+
+    def build(self):
+        index = GridIndex()
+        rows = Shop.objects.filter(
+            status='active', is_open=True, is_delivery_available=True,
+            latitude__isnull=False, longitude__isnull=False,
+        ).values_list('pk', 'latitude', 'longitude').iterator(chunk_size=5000)
+        for pk, lat, lon in rows:
+            index.add(pk, lat, lon)
+        return index
+
+    def get_index(self):
+        if self.index is None or time.monotonic() - self.built_at > REBUILD_INTERVAL:
+            with self.lock:
+                if self.index is None or time.monotonic() - self.built_at > REBUILD_INTERVAL:
+                    self.index = self.build()
+                    self.built_at = time.monotonic()
+        return self.index
+
+    def update(self, shop):
+        if self.index is None:
+            return
+        with self.lock:
+            if self.is_listed(shop):
+                self.index.add(shop.pk, shop.latitude, shop.longitude)
+            else:
+                self.index.remove(shop.pk)
+
+    def remove(self, shop):
+        if self.index is not None:
+            with self.lock:
+                self.index.remove(shop.pk)
+
+    def reset(self):
+        with self.lock:
+            self.index = None
+
+    def nearest(self, lat, lon, k=10, max_km=MAX_DISTANCE_KM):
+        index = self.get_index()
+        with self.lock:
+            return index.nearest(lat, lon, k, max_km)
+
+
+pincodes = PincodeTable()
+shop_locator = ShopLocator()
+
+
+def locate(shop):
+    """Set ``shop``'s coordinates from its pincode; False if the pincode is unknown.
+
+    An unknown pincode clears the coordinates, so a shop that moved to one
+    leaves the locator instead of staying listed at its old place.
+    """
+    point = pincodes.lookup(shop.pincode)
+    if point is None:
+        shop.latitude = shop.longitude = None
+        return False
+    shop.latitude, shop.longitude = point
+    return True
+
+
+def nearby_shops(lat, lon, k=10, max_km=MAX_DISTANCE_KM):
+    """The ``k`` closest open, delivering shops as a list, each with ``distance_km`` set"""
+    nearest = shop_locator.nearest(lat, lon, k, max_km)
+    shops = Shop.objects.select_related('category').in_bulk([pk for distance, pk in nearest])
+    result = []
+    for distance, pk in nearest:
+        shop = shops.get(pk)
+        # Skip rows deleted or delisted by another process since the last rebuild
+        if shop is not None and ShopLocator.is_listed(shop):
+            shop.distance_km = round(distance, 2)
+            result.append(shop)
+    return result
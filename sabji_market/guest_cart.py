@@ -0,0 +1,117 @@
+# sabji_market/guest_cart.py
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cart import bump_version, upsert_items
+from .models import Cart, CartItem, Product
+
+COOKIE_NAME = 'guest_cart'
+SALT = 'sabji_market.guest_cart'
+MAX_AGE = 30 * 24 * 60 * 60
+
+# Keeps the signed cookie well under the 4 KB browsers allow
+MAX_LINES = 50
+MAX_QUANTITY = 99
+
+
+def parse(value):
+    """``{product_id: quantity}`` from the cookie's ``id:qty,id:qty`` form"""
+    lines = {}
+    for pair in (value or '').split(','):
+        product_id, _, quantity = pair.partition(':')
+        if product_id.isdigit() and quantity.isdigit() and int(quantity) > 0:
+            lines[int(product_id)] = min(int(quantity), MAX_QUANTITY)
+    return lines
+
+
+def read(request):
+    """The visitor's guest cart lines; tampered or expired cookies read as empty"""
+    if not hasattr(request, '_guest_cart'):
+        value = request.get_signed_cookie(COOKIE_NAME, default=None, salt=SALT, max_age=MAX_AGE)
+        request._guest_cart = parse(value)
+    return request._guest_cart
+
+
+def write(request, response):
+    """Store the request's guest cart lines on ``response``"""
+    lines = read(request)
+    if not lines:
+        clear(response)
+        return response
+    response.set_signed_cookie(
+        COOKIE_NAME,
+        ','.join(f'{product_id}:{quantity}' for product_id, quantity in lines.items()),
+        salt=SALT,
+        max_age=MAX_AGE,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite='Lax',
+    )
+    return response
+
+
+def clear(response):
+    response.delete_cookie(COOKIE_NAME, samesite='Lax')
+    return response
+
+
+def add(request, product, quantity):
+    """Add ``quantity`` of ``product``; False if stock or the cart size would be exceeded"""
+    lines = read(request)
+    total = lines.get(product.pk, 0) + quantity
+    if total > min(product.stock_quantity, MAX_QUANTITY):
+        return False
+    if product.pk not in lines and len(lines) >= MAX_LINES:
+        return False
+    lines[product.pk] = total
+    return True
+
+
+def set_quantity(request, product_id, quantity):
+    lines = read(request)
+    if quantity > 0:
+        lines[product_id] = min(quantity, MAX_QUANTITY)
+    else:
+        lines.pop(product_id, None)
+
+
+def merge(request, user):
+    """Fold the guest cart into ``user``'s Cart in one transaction; returns the lines merged.
+
+    Quantities add to what the user's cart already holds, capped at the
+    product's stock, and every line is written by a single upsert.
+    The caller should ``clear`` the cookie on its response.
+    """
+    lines = read(request)
+    if not lines:
+        return 0
+    stock = dict(
+        Product.objects.filter(pk__in=lines, is_available=True).values_list('pk', 'stock_quantity')
+    )
+    if not stock:
+        request._guest_cart = {}
+        return 0
+
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user=user)
+        existing = dict(
+            CartItem.objects.select_for_update()
+            .filter(cart=cart, product_id__in=stock)
+            .values_list('product_id', 'quantity')
+        )
+        now = timezone.now()
+        items = [
+            CartItem(
+                cart=cart, product_id=product_id,
+                quantity=min(existing.get(product_id, 0) + lines[product_id], available),
+                created_at=now, updated_at=now,
+            )
+            for product_id, available in stock.items()
+            if available > 0
+        ]
+        upsert_items(items)
+        if items:
+            bump_version(cart)
+    request._guest_cart = {}
+    return len(items)
@@ -0,0 +1,82 @@
+# sabji_market/inventory.py
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+
+from . import facets
+from .models import Product
+
+
+class OutOfStock(Exception):
+    """Raised when a product cannot cover the requested quantity"""
+
+    def __init__(self, product_id, requested):
+        self.product_id = product_id
+        self.requested = requested
+        super().__init__(f'Product {product_id} does not have {requested} units in stock')
+
+
+def reserve_stock(quantities):
+    """Take stock for ``{product_id: quantity}`` or raise OutOfStock.
+
+    Each product is decremented by a single conditional UPDATE, so the check
+    and the write happen in one statement and concurrent checkouts can never
+    drive stock below zero. Products are touched in primary key order to keep
+    lock acquisition consistent between transactions. Must run inside a
+    transaction so that a failure part-way releases what was already taken.
+    """
+    quantities = Counter(quantities)
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        updated = Product.objects.filter(
+            pk=product_id,
+            is_available=True,
+            stock_quantity__gte=quantity,
+        ).update(stock_quantity=F('stock_quantity') - quantity, updated_at=timezone.now())
+        if not updated:
+            raise OutOfStock(product_id, quantity)
+
+    sold_out = Product.objects.filter(pk__in=list(quantities), stock_quantity=0).update(
+        is_available=False, sold_out=True, updated_at=timezone.now(),
+    )
+    if sold_out:
+        facets.invalidate()
+
+
+def release_stock(quantities):
+    """Return ``{product_id: quantity}`` to stock.
+
+    Products that reserve_stock unlisted when they sold out become available
+    again, while products their owner disabled stay unlisted; the restock is
+    an atomic increment, never a read-modify-write.
+    """
+    for product_id, quantity in sorted(Counter(quantities).items()):
+        # is_available comes before sold_out: MySQL evaluates SET clauses left to right
+        Product.objects.filter(pk=product_id).update(
+            is_available=Case(When(sold_out=True, then=True), default=F('is_available')),
+            sold_out=False,
+            stock_quantity=F('stock_quantity') + quantity,
+            updated_at=timezone.now(),
+        )
+    # Sold-out products may be listed again
+    facets.invalidate()
+
+
+def order_quantities(order):
+    quantities = Counter()
+    for product_id, quantity in order.items.values_list('product_id', 'quantity'):
+        quantities[product_id] += quantity
+    return quantities
+
+
+def sync_order_stock(order, previous_status):
+    """Reserve or release an order's stock when it enters or leaves 'cancelled'"""
+    if previous_status == order.status:
+        return
+    with transaction.atomic():
+        if order.status == 'cancelled':
+            release_stock(order_quantities(order))
+        elif previous_status == 'cancelled':
+            reserve_stock(order_quantities(order))
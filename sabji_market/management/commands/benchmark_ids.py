@@ -0,0 +1,73 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from one_stop_booking_hub.ids import IdGenerator
+
+SCHEMES = {
+    'random': lambda generator: f'ORD{uuid.uuid4().hex[:8].upper()}',
+    'time-ordered': lambda generator: generator.next_id('ORD'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare insert rate, index size and collisions of random and time-ordered order ids'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('mysql', 'sqlite'):
+            raise CommandError(f'Index sizes are only measured on MySQL and SQLite, not {connection.vendor}')
+        for name, make_id in SCHEMES.items():
+            table = f'benchmark_ids_{name.replace("-", "_")}'
+            self.create_table(table)
+            try:
+                generator = IdGenerator(node=1)
+                start = time.perf_counter()
+                inserted = self.insert(table, lambda: make_id(generator), options['rows'], options['batch_size'])
+                elapsed = time.perf_counter() - start
+                size = self.index_size(table)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {table}')
+            self.stdout.write(self.style.SUCCESS(
+                f'{name:>12}: {inserted / elapsed:10.0f} rows/s  '
+                f'index {size / 1024 / 1024:8.2f} MiB  collisions {options["rows"] - inserted}'
+            ))
+
+    def create_table(self, table):
+        primary_key = 'BIGINT AUTO_INCREMENT PRIMARY KEY' if connection.vendor == 'mysql' else 'INTEGER PRIMARY KEY'
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+            cursor.execute(f'CREATE TABLE {table} (id {primary_key}, order_id VARCHAR(20) NOT NULL)')
+            cursor.execute(f'CREATE UNIQUE INDEX {table}_order_id ON {table} (order_id)')
+
+    def insert(self, table, make_id, rows, batch_size):
+        ignore = 'INSERT IGNORE' if connection.vendor == 'mysql' else 'INSERT OR IGNORE'
+        sql = f'{ignore} INTO {table} (order_id) VALUES (%s)'
+        for offset in range(0, rows, batch_size):
+            batch = [(make_id(),) for _ in range(min(batch_size, rows - offset))]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {table}')
+            return cursor.fetchone()[0]
+
+    def index_size(self, table):
+        index = f'{table}_order_id'
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s', [index])
+            else:
+                cursor.execute(f'ANALYZE TABLE {table}')
+                cursor.fetchall()
+                cursor.execute(
+                    "SELECT stat_value * @@innodb_page_size FROM mysql.innodb_index_stats "
+                    "WHERE database_name = DATABASE() AND table_name = %s AND index_name = %s AND stat_name = 'size'",
+                    [table, index],
+                )
+            return cursor.fetchone()[0] or 0
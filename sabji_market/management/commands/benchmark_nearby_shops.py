@@ -0,0 +1,62 @@
+import heapq
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from one_stop_booking_hub.geo import GridIndex, haversine_km
+from sabji_market.geo import pincodes
+
+
+class Command(BaseCommand):
+    help = 'Compare k-nearest shop queries on the grid index against a full scan over synthetic shops'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--spread-km', type=float, default=15, help='Spread of shops around each city centroid')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        pincodes.lookup('')
+        centres = list(pincodes.centroids.values())
+        spread = options['spread_km'] / 111
+
+        points = [
+            (shop_id, *self.scatter(rng, rng.choice(centres), spread))
+            for shop_id in range(options['shops'])
+        ]
+        start = time.perf_counter()
+        index = GridIndex()
+        for shop_id, lat, lon in points:
+            index.add(shop_id, lat, lon)
+        self.stdout.write(f'Indexed {len(points)} shops in {time.perf_counter() - start:.2f} s')
+
+        queries = [self.scatter(rng, rng.choice(centres), spread) for _ in range(options['queries'])]
+        k = options['k']
+        grid_ms, scan_ms = [], []
+        for lat, lon in queries:
+            start = time.perf_counter()
+            nearest = index.nearest(lat, lon, k)
+            grid_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            scanned = heapq.nsmallest(k, ((haversine_km(lat, lon, p_lat, p_lon), key) for key, p_lat, p_lon in points))
+            scan_ms.append((time.perf_counter() - start) * 1000)
+            assert [key for distance, key in nearest] == [key for distance, key in scanned if distance <= 50]
+
+        for name, timings in (('grid index', grid_ms), ('full scan', scan_ms)):
+            timings.sort()
+            self.stdout.write(
+                f'{name:>10}: median {statistics.median(timings):8.3f} ms  '
+                f'p95 {timings[int(len(timings) * 0.95) - 1]:8.3f} ms'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Grid index is {statistics.median(scan_ms) / statistics.median(grid_ms):.0f}x faster at k={k}'
+        ))
+
+    def scatter(self, rng, centre, spread):
+        return centre[0] + rng.gauss(0, spread), centre[1] + rng.gauss(0, spread)
@@ -0,0 +1,80 @@
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from one_stop_booking_hub.pagination import CursorPaginator
+from sabji_market.models import Order, Shop
+
+
+class Command(BaseCommand):
+    help = "Compare page-N latency of Django's Paginator and the keyset CursorPaginator on a shop's orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100_000, help='Synthetic orders to create')
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed fetches per page')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic orders afterwards')
+
+    def handle(self, *args, **options):
+        customer, _ = get_user_model().objects.get_or_create(username='pagination-benchmark')
+        shop = Shop.objects.create(
+            owner=customer, name='Pagination Benchmark', owner_name='Benchmark', phone_number='0000000000',
+            address='-', city='-', pincode='000000', status='active',
+        )
+        try:
+            self.seed(shop, customer, options['orders'], options['batch_size'])
+            orders = Order.objects.filter(shop=shop).order_by('-created_at', '-id')
+            per_page = options['per_page']
+            last_page = max(1, -(-options['orders'] // per_page))
+
+            number = 1
+            while number <= last_page:
+                self.report(orders, number, per_page, options['repeat'])
+                number *= 10
+        finally:
+            if not options['keep']:
+                shop.delete()
+
+    def seed(self, shop, customer, count, batch_size):
+        start = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            batch = [
+                Order(
+                    order_id=f'BEN{uuid.uuid4().hex[:12].upper()}', customer=customer, shop=shop,
+                    customer_name='Benchmark', customer_phone='0000000000',
+                    subtotal=Decimal('100.00'), total_amount=Decimal('100.00'),
+                )
+                for _ in range(offset, min(offset + batch_size, count))
+            ]
+            with transaction.atomic():
+                Order.objects.bulk_create(batch)
+        self.stdout.write(f'Seeded {count} orders in {time.perf_counter() - start:.2f} s')
+
+    def report(self, orders, number, per_page, repeat):
+        cursor_paginator = CursorPaginator(orders, per_page)
+        # The cursor a reader would hold after walking to page ``number``
+        cursor = None
+        if number > 1:
+            boundary = orders[(number - 1) * per_page - 1]
+            cursor = cursor_paginator.encode_cursor(boundary, 'next')
+
+        offset_ms = self.time(repeat, lambda: list(Paginator(orders, per_page).page(number)))
+        cursor_ms = self.time(repeat, lambda: list(cursor_paginator.get_page(cursor)))
+        self.stdout.write(self.style.SUCCESS(
+            f'page {number:>8}: offset {offset_ms:8.2f} ms  cursor {cursor_ms:8.2f} ms'
+        ))
+
+    def time(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
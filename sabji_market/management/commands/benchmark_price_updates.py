@@ -0,0 +1,82 @@
+import json
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import reverse
+
+from sabji_market import views
+from sabji_market.models import Product, Shop
+
+
+class Command(BaseCommand):
+    help = "Compare a morning price change through edit_product, one form post per product, with the batch JSON endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500, help='Synthetic products to reprice')
+        parser.add_argument('--rounds', type=int, default=3, help='Timed repricings per path')
+        parser.add_argument('--batch-size', type=int, default=500, help='Patches per batch request')
+
+    def handle(self, *args, **options):
+        owner, _ = get_user_model().objects.get_or_create(username='price-benchmark')
+        shop = Shop.objects.create(
+            owner=owner, name='Price Benchmark', owner_name='Benchmark', phone_number='0000000000',
+            address='-', city='-', pincode='000000', status='active',
+        )
+        try:
+            products = Product.objects.bulk_create(
+                Product(shop=shop, name=f'Benchmark {i}', price=Decimal('40.00'), stock_quantity=50)
+                for i in range(options['products'])
+            )
+            products = list(Product.objects.filter(shop=shop).order_by('pk'))
+            self.factory = RequestFactory()
+            self.owner = owner
+
+            form_rates, batch_rates = [], []
+            for round_number in range(options['rounds']):
+                price = Decimal('41.00') + round_number
+                form_rates.append(self.time(products, lambda: self.per_form(products, price)))
+                batch_rates.append(self.time(products, lambda: self.batch(shop, products, price + Decimal('0.50'), options['batch_size'])))
+
+            form_rate = statistics.median(form_rates)
+            batch_rate = statistics.median(batch_rates)
+            self.stdout.write(f'per-form edit_product: {form_rate:10.0f} products/s')
+            self.stdout.write(f'batch endpoint:        {batch_rate:10.0f} products/s')
+            self.stdout.write(self.style.SUCCESS(f'batch is {batch_rate / form_rate:.1f}x faster'))
+        finally:
+            shop.delete()
+
+    def time(self, products, run):
+        start = time.perf_counter()
+        run()
+        return len(products) / (time.perf_counter() - start)
+
+    def request(self, request):
+        request.user = self.owner
+        request._messages = CookieStorage(request)
+        return request
+
+    def per_form(self, products, price):
+        for product in products:
+            data = {
+                'name': product.name, 'description': '', 'category': '', 'price': str(price),
+                'discount_percentage': '0', 'unit': product.unit, 'stock_quantity': '40',
+            }
+            path = reverse('sabji_market:edit_product', args=[product.pk])
+            response = views.edit_product(self.request(self.factory.post(path, data)), product_id=product.pk)
+            assert response.status_code == 302, response.status_code
+
+    def batch(self, shop, products, price, batch_size):
+        path = reverse('sabji_market:batch_update_products', args=[shop.pk])
+        for start in range(0, len(products), batch_size):
+            patches = [
+                {'id': product.pk, 'price': str(price), 'stock_quantity': 40}
+                for product in products[start:start + batch_size]
+            ]
+            request = self.factory.post(path, json.dumps(patches), content_type='application/json')
+            response = views.batch_update_products(self.request(request), shop_id=shop.pk)
+            assert response.status_code == 200, response.content
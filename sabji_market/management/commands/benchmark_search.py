@@ -0,0 +1,94 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from sabji_market.models import Product, Shop
+from sabji_market.search import database_backend, icontains_search, python_backend
+
+ADJECTIVES = ['fresh', 'organic', 'green', 'red', 'baby', 'local', 'hybrid', 'desi', 'premium', 'farm']
+VEGETABLES = [
+    'tomato', 'potato', 'onion', 'spinach', 'carrot', 'cabbage', 'cauliflower', 'brinjal', 'okra',
+    'capsicum', 'cucumber', 'pumpkin', 'radish', 'beetroot', 'garlic', 'ginger', 'coriander',
+    'methi', 'peas', 'beans', 'lemon', 'chilli', 'mushroom', 'corn', 'gourd',
+]
+PHRASES = ['picked this morning', 'from nearby farms', 'great for curry', 'rich in fibre', 'best for salads']
+
+
+class Command(BaseCommand):
+    help = 'Compare icontains, database full-text and in-process index search on a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1_000_000, help='Synthetic products to create')
+        parser.add_argument('--queries', type=int, default=200, help='Search queries per backend')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic catalog afterwards')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        owner, _ = get_user_model().objects.get_or_create(username='search-benchmark')
+        shop = Shop.objects.create(
+            owner=owner, name='Search Benchmark', owner_name='Benchmark', phone_number='0000000000',
+            address='-', city='-', pincode='000000', status='active',
+        )
+        try:
+            self.seed(shop, rng, options['products'], options['batch_size'])
+            queries = [self.random_query(rng, options['products']) for _ in range(options['queries'])]
+
+            start = time.perf_counter()
+            python_backend.reset()
+            python_backend.get_index(Product)
+            self.stdout.write(f'In-process index built in {time.perf_counter() - start:.2f} s')
+
+            products = Product.objects.filter(shop=shop)
+            self.report('icontains', queries, lambda q: icontains_search(products, q))
+            self.report('database', queries, lambda q: database_backend.search(products, q))
+            self.report('python', queries, lambda q: python_backend.search(products, q))
+        finally:
+            python_backend.reset()
+            if not options['keep']:
+                shop.delete()
+
+    def seed(self, shop, rng, count, batch_size):
+        start = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            batch = [
+                Product(
+                    shop=shop,
+                    name=f'{rng.choice(ADJECTIVES)} {rng.choice(VEGETABLES)} {number}',
+                    description=f'{rng.choice(VEGETABLES)} {rng.choice(PHRASES)}',
+                    price=rng.randint(10, 200),
+                    stock_quantity=rng.randint(0, 100),
+                )
+                for number in range(offset, min(offset + batch_size, count))
+            ]
+            with transaction.atomic():
+                Product.objects.bulk_create(batch)
+        self.stdout.write(f'Seeded {count} products in {time.perf_counter() - start:.2f} s')
+
+    def random_query(self, rng, count):
+        """A mix of broad, narrowing, selective and empty searches"""
+        kind = rng.randrange(4)
+        if kind == 0:
+            return rng.choice(VEGETABLES)
+        if kind == 1:
+            return f'{rng.choice(ADJECTIVES)} {rng.choice(VEGETABLES)[:4]}'
+        if kind == 2:
+            return f'{rng.choice(VEGETABLES)} {rng.randrange(count)}'
+        return rng.choice(['dragonfruit', 'avocado', 'asparagus'])
+
+    def report(self, label, queries, run):
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            list(run(query)[:20])
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+        self.stdout.write(self.style.SUCCESS(
+            f'{label:>10}: mean {statistics.mean(timings):8.2f} ms  p95 {p95:8.2f} ms'
+        ))
@@ -0,0 +1,73 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from sabji_market.typeahead import PrefixIndex
+
+WORDS = (
+    'fresh organic green red baby cherry desi farm country wild golden sweet '
+    'tomato onion potato spinach okra brinjal carrot cabbage cauliflower mango '
+    'banana apple papaya guava coriander mint ginger garlic chilli capsicum '
+    'cucumber radish beetroot pumpkin gourd lemon orange grapes pomegranate '
+    'bhaji mandi store traders vegetables fruits kirana mart'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Time typeahead lookups and incremental updates on a prefix index over synthetic names'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--names', type=int, default=500_000)
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument('--updates', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        count = options['names']
+        # Distinct names, as for shops; products sharing a name would only shrink the array
+        rows = [('shop', pk, f'{self.name(rng)} {pk}', False) for pk in range(count)]
+
+        start = time.perf_counter()
+        index = PrefixIndex()
+        index.load(rows)
+        stats = index.stats()
+        self.stdout.write(
+            f'Indexed {stats["rows"]} names as {stats["suffixes"]} suffixes in '
+            f'{time.perf_counter() - start:.2f} s, about {stats["bytes"] / 2**20:.1f} MiB'
+        )
+
+        queries = [self.query(rng) for _ in range(options['queries'])]
+        lookup_ms = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query)
+            lookup_ms.append((time.perf_counter() - start) * 1000)
+        self.report('lookup', lookup_ms)
+
+        update_ms = []
+        for pk in rng.sample(range(count), min(options['updates'], count)):
+            start = time.perf_counter()
+            index.add('shop', pk, f'{self.name(rng)} {pk}')
+            update_ms.append((time.perf_counter() - start) * 1000)
+        self.report('update', update_ms)
+
+        if statistics.median(lookup_ms) < 1 and statistics.median(update_ms) < 1:
+            self.stdout.write(self.style.SUCCESS('Median lookup and update are under a millisecond'))
+
+    def report(self, name, timings):
+        timings.sort()
+        self.stdout.write(
+            f'{name:>8}: median {statistics.median(timings):7.3f} ms  '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:7.3f} ms  '
+            f'p99 {timings[int(len(timings) * 0.99) - 1]:7.3f} ms'
+        )
+
+    def name(self, rng):
+        return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+
+    def query(self, rng):
+        word = rng.choice(WORDS)
+        return word[:rng.randint(1, len(word))]
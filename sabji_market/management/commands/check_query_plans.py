@@ -0,0 +1,66 @@
+import json
+import re
+from importlib import import_module
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def full_scan_tables(plan, vendor):
+    """Tables the plan reads without using any index"""
+    if vendor == 'sqlite':
+        # "SCAN t" is a table scan; "SCAN t USING [COVERING] INDEX i" walks an index
+        return {
+            match.group(1)
+            for match in re.finditer(r'SCAN (\w+)\b(?! USING (?:COVERING )?INDEX)', plan)
+        }
+    if vendor == 'mysql':
+        # EXPLAIN FORMAT=JSON: every table access, however deeply nested in
+        # nested_loop, subqueries or materializations, carries its access_type
+        tables = set()
+        nodes = [json.loads(plan)]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, list):
+                nodes.extend(node)
+            elif isinstance(node, dict):
+                if node.get('access_type') == 'ALL' and 'table_name' in node:
+                    tables.add(node['table_name'])
+                nodes.extend(node.values())
+        return tables
+    return set()
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN each view's main query and fail if any of them falls back to a full table scan"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--show-plans', action='store_true', help='Print every query plan')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        failures = []
+
+        for app_config in apps.get_app_configs():
+            try:
+                module = import_module(f'{app_config.name}.query_plans')
+            except ModuleNotFoundError:
+                continue
+            for label, build in module.QUERY_PLANS:
+                queryset = build().using(options['database'])
+                # MySQL's default TREE format names no access type; JSON does
+                plan = queryset.explain(format='JSON') if connection.vendor == 'mysql' else queryset.explain()
+                scanned = full_scan_tables(plan, connection.vendor)
+                if queryset.model._meta.db_table in scanned:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(f'FULL SCAN  {app_config.label}: {label}'))
+                else:
+                    self.stdout.write(f'ok         {app_config.label}: {label}')
+                if options['show_plans'] or label in failures:
+                    self.stdout.write(f'    {plan}'.replace('\n', '\n    '))
+
+        if failures:
+            raise CommandError(f'{len(failures)} view queries fall back to a full table scan')
+        self.stdout.write(self.style.SUCCESS('All view queries use an index'))
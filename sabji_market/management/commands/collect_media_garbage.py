@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from sabji_market.media import collect_garbage, rebuild_refcounts
+
+
+class Command(BaseCommand):
+    help = 'Delete content-addressed media files that no Shop, Product, category or user references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true', help='Recompute reference counts from the model fields first')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            drifted = rebuild_refcounts(fix=not options['dry_run'])
+            for name, stored, expected in drifted:
+                self.stdout.write(f'{name}: refcount {stored} -> {expected}')
+            self.stdout.write(f'{len(drifted)} reference count(s) corrected')
+
+        removed, freed = collect_garbage(dry_run=options['dry_run'])
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {removed} unreferenced file(s), {freed / 1024:.1f} KiB'))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from one_stop_booking_hub.images import FORMATS, SIZES, derivative_name, image_pipeline
+
+
+class Command(BaseCommand):
+    help = 'Build missing WebP/JPEG derivatives of every uploaded image and report their sizes against the originals'
+
+    def handle(self, *args, **options):
+        sources = []
+        for model, fields in image_pipeline.registered.values():
+            for field in fields:
+                names = model._default_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                sources.extend(names.values_list(field, flat=True).iterator(chunk_size=2000))
+
+        start = time.perf_counter()
+        storage = image_pipeline.storage
+        present = [name for name in sources if storage.exists(name)]
+        for name in present:
+            image_pipeline.schedule(name)
+        image_pipeline.drain()
+        self.stdout.write(f'{len(present)} images ({len(sources) - len(present)} missing files) in {time.perf_counter() - start:.2f} s')
+        if not present:
+            return
+
+        original = sum(storage.size(name) for name in present)
+        self.stdout.write(f'{"original":>14}: {original / 1024:10.1f} KiB')
+        for size in SIZES:
+            for fmt in FORMATS:
+                names = [derivative_name(name, size, fmt) for name in present]
+                total = sum(storage.size(name) for name in names if storage.exists(name))
+                self.stdout.write(f'{size + " " + fmt:>14}: {total / 1024:10.1f} KiB  {total / original:6.1%} of original')
+        self.stdout.write(self.style.SUCCESS(f'Failures: {image_pipeline.failures}'))
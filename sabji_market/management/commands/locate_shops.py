@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from sabji_market.geo import locate, shop_locator
+from sabji_market.models import Shop
+
+
+class Command(BaseCommand):
+    help = "Fill in every shop's coordinates from its pincode, e.g. after loading a fuller pincode table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        located = unknown = 0
+        batch = []
+        for shop in Shop.objects.only('pk', 'pincode', 'latitude', 'longitude').iterator(chunk_size=options['batch_size']):
+            had_point = shop.latitude is not None
+            if locate(shop):
+                located += 1
+                batch.append(shop)
+            else:
+                unknown += 1
+                if had_point:
+                    batch.append(shop)
+            if len(batch) >= options['batch_size']:
+                Shop.objects.bulk_update(batch, ['latitude', 'longitude'])
+                batch = []
+        if batch:
+            Shop.objects.bulk_update(batch, ['latitude', 'longitude'])
+        # bulk_update sends no signals
+        shop_locator.reset()
+        self.stdout.write(self.style.SUCCESS(f'Located {located} shop(s); {unknown} have a pincode missing from the table'))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from sabji_market.models import Shop
+from sabji_market.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily shop and product sales rollups from orders, a batch of shops at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', type=int, action='append', dest='shops', help='Only rebuild this shop (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Shops per transaction')
+
+    def handle(self, *args, **options):
+        shops = Shop.objects.order_by('pk')
+        if options['shops']:
+            shops = shops.filter(pk__in=options['shops'])
+        shop_ids = list(shops.values_list('pk', flat=True))
+
+        start = time.perf_counter()
+        shop_rows, product_rows = rebuild_rollups(shop_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {shop_rows} shop-day and {product_rows} product-day rows '
+            f'for {len(shop_ids)} shop(s) in {time.perf_counter() - start:.2f} s'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sabji_market.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized shop rating aggregates from ShopReview and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report drift; fail if any is found')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        drifted = rebuild_ratings(batch_size=options['batch_size'], fix=not options['check'])
+
+        for shop_id, stored, expected in drifted:
+            changes = ', '.join(
+                f'{field} {stored[field]} -> {expected[field]}'
+                for field in stored if stored[field] != expected[field]
+            )
+            self.stdout.write(f'Shop {shop_id}: {changes}')
+
+        if options['check'] and drifted:
+            raise CommandError(f'{len(drifted)} shop(s) have drifted rating aggregates')
+        if drifted:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {len(drifted)} shop(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All shop rating aggregates are consistent'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from sabji_market.typeahead import typeahead
+
+
+class Command(BaseCommand):
+    help = 'Build the typeahead prefix index from the database and report its size'
+
+    def handle(self, *args, **options):
+        stats = typeahead.stats()
+        self.stdout.write(
+            f'{stats["rows"]} rows as {stats["suggestions"]} suggestions, '
+            f'{stats["suffixes"]} suffixes in {stats["chunks"]} chunks'
+        )
+        self.stdout.write(self.style.SUCCESS(f'About {stats["bytes"] / 2**20:.1f} MiB in this process'))
@@ -0,0 +1,40 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+# Pages served from the anonymous page cache, with fragments for signed-in users
+PAGES = [
+    'accounts:home',
+    'sabji_market:home',
+    'sabji_market:product_categories',
+    'sabji_market:shop_list',
+]
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the cached public pages and template fragments, e.g. after a deploy'
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        # An unsaved user renders the signed-in variants of the fragments;
+        # the page cache never stores responses for authenticated users
+        visitors = [AnonymousUser(), get_user_model()(username='cache-warmer')]
+        for name in PAGES:
+            path = reverse(name)
+            view = resolve(path).func
+            for user in visitors:
+                request = factory.get(path)
+                request.user = user
+                start = time.perf_counter()
+                response = view(request)
+                elapsed = (time.perf_counter() - start) * 1000
+                label = 'signed in' if user.is_authenticated else 'anonymous'
+                if response.status_code != 200:
+                    self.stderr.write(f'{path} ({label}): HTTP {response.status_code}')
+                    continue
+                self.stdout.write(f'{path} ({label}): {elapsed:.1f} ms')
+        self.stdout.write(self.style.SUCCESS(f'Warmed {len(PAGES)} pages'))
@@ -0,0 +1,188 @@
+# sabji_market/media.py
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+
+from one_stop_booking_hub.images import FORMATS, SIZES, derivative_name, image_pipeline
+from one_stop_booking_hub.storage import CONTENT_ROOT, is_content_name
+
+from .models import StoredFile
+
+# An unreferenced file younger than this may belong to an upload whose row
+# is still being saved, or to a re-upload of bytes that were about to go
+GRACE_PERIOD = timedelta(hours=1)
+
+UNKNOWN = object()
+
+# Model label to (model, file field names) for every tracked field
+FILE_FIELDS = {}
+
+
+def file_name(value):
+    if isinstance(value, FieldFile):
+        return value.name or None
+    return value or None
+
+
+def snapshot(instance, fields):
+    """Remember the stored names of ``fields``; deferred fields are unknown"""
+    instance._stored_files = {
+        field: file_name(instance.__dict__[field]) if field in instance.__dict__ else UNKNOWN
+        for field in fields
+    }
+
+
+def adjust(name, delta, storage=default_storage):
+    """Add ``delta`` to the reference count of a content-addressed file"""
+    if not is_content_name(name):
+        return
+    changes = {'refcount': F('refcount') + delta, 'updated_at': timezone.now()}
+    if StoredFile.objects.filter(name=name).update(**changes) or delta < 0:
+        return
+    try:
+        size = storage.size(name)
+    except OSError:
+        size = 0
+    try:
+        with transaction.atomic():
+            StoredFile.objects.create(name=name, size=size, refcount=delta)
+    except IntegrityError:
+        # Another transaction created the row first
+        StoredFile.objects.filter(name=name).update(**changes)
+
+
+def register(model, *fields):
+    """Count references from ``model``'s ``fields`` as rows are saved and deleted"""
+    label = model._meta.label_lower
+    if label in FILE_FIELDS:
+        return
+    uid = f'media:{label}'
+
+    def on_init(sender, instance, **kwargs):
+        snapshot(instance, fields)
+
+    def on_save(sender, instance, created, **kwargs):
+        previous = getattr(instance, '_stored_files', {})
+        for field in fields:
+            old = None if created else previous.get(field, UNKNOWN)
+            new = file_name(getattr(instance, field))
+            if old is UNKNOWN or old == new:
+                continue
+            adjust(new, 1)
+            adjust(old, -1)
+        snapshot(instance, fields)
+
+    def on_delete(sender, instance, **kwargs):
+        for field in fields:
+            adjust(file_name(getattr(instance, field)), -1)
+
+    post_init.connect(on_init, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(on_save, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=uid)
+    FILE_FIELDS[label] = (model, fields)
+
+
+def computed_refcounts():
+    """``Counter`` of content-addressed names over every tracked field"""
+    counts = Counter()
+    for model, fields in FILE_FIELDS.values():
+        for field in fields:
+            names = model._default_manager.filter(**{f'{field}__startswith': f'{CONTENT_ROOT}/'})
+            counts.update(names.values_list(field, flat=True).iterator(chunk_size=2000))
+    return counts
+
+
+def rebuild_refcounts(fix=True):
+    """Recount references from the tracked fields; returns ``[(name, stored, expected)]`` that differed"""
+    expected = computed_refcounts()
+    drifted = []
+    for stored in StoredFile.objects.order_by('pk').iterator(chunk_size=2000):
+        count = expected.pop(stored.name, 0)
+        if stored.refcount != count:
+            drifted.append((stored.name, stored.refcount, count))
+            if fix:
+                StoredFile.objects.filter(pk=stored.pk).update(refcount=count, updated_at=timezone.now())
+    for name, count in sorted(expected.items()):
+        drifted.append((name, 0, count))
+        if fix:
+            adjust(name, count)
+    return drifted
+
+
+def delete_file(name, storage=default_storage):
+    """Remove a stored file and any image derivatives made from it; returns bytes freed"""
+    freed = 0
+    try:
+        freed = storage.size(name)
+        storage.delete(name)
+    except OSError:
+        pass
+    for size in SIZES:
+        for fmt in FORMATS:
+            image_pipeline.storage.delete(derivative_name(name, size, fmt))
+    image_pipeline.cache.delete(image_pipeline.ready_key(name))
+    return freed
+
+
+def is_stale(name, cutoff, storage=default_storage):
+    try:
+        return storage.get_modified_time(name) < cutoff
+    except OSError:
+        return True
+
+
+def content_files(storage=default_storage):
+    """Every name under the content root, including interrupted ``.upload-`` spools"""
+    pending = [CONTENT_ROOT]
+    while pending:
+        directory = pending.pop()
+        try:
+            directories, files = storage.listdir(directory)
+        except FileNotFoundError:
+            continue
+        pending.extend(f'{directory}/{name}' for name in directories)
+        yield from (f'{directory}/{name}' for name in files)
+
+
+def collect_garbage(dry_run=False, now=None, storage=default_storage):
+    """Delete content-addressed files nothing references; returns ``(files, bytes)`` removed.
+
+    A file goes once its count has been zero, and the file itself untouched,
+    for GRACE_PERIOD. Files on disk that nothing tracks or references
+    (uploads whose row never saved) are swept after the same grace period.
+    """
+    cutoff = (now or timezone.now()) - GRACE_PERIOD
+    removed = freed = 0
+
+    orphans = StoredFile.objects.filter(refcount__lte=0, updated_at__lt=cutoff)
+    for stored in orphans.iterator(chunk_size=500):
+        if not is_stale(stored.name, cutoff, storage):
+            continue
+        if dry_run:
+            removed, freed = removed + 1, freed + stored.size
+            continue
+        # Conditional, so a reference taken since the query keeps the file
+        if StoredFile.objects.filter(pk=stored.pk, refcount__lte=0).delete()[0]:
+            removed, freed = removed + 1, freed + delete_file(stored.name, storage)
+
+    # Referenced names count too, in case a row is missing while the field still points at the file
+    keep = set(StoredFile.objects.values_list('name', flat=True).iterator(chunk_size=2000))
+    keep.update(computed_refcounts())
+    for name in content_files(storage):
+        if name in keep or not is_stale(name, cutoff, storage):
+            continue
+        if os.path.basename(name).startswith('.upload-'):
+            # An interrupted save; never referenced by anything
+            if not dry_run:
+                storage.delete(name)
+            continue
+        removed += 1
+        freed += storage.size(name) if dry_run else delete_file(name, storage)
+    return removed, freed
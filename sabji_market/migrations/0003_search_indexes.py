@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from sabji_market.fulltext import create_search_indexes, drop_search_indexes
+
+
+def forwards(apps, schema_editor):
+    create_search_indexes(schema_editor.connection)
+
+
+def backwards(apps, schema_editor):
+    drop_search_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sabji_market', '0002_alter_order_options_alter_product_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:01
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    Shop = apps.get_model('sabji_market', 'Shop')
+    ShopReview = apps.get_model('sabji_market', 'ShopReview')
+    histogram = {
+        f'rating_{stars}_count': Count('id', filter=Q(rating=stars))
+        for stars in range(1, 6)
+    }
+    rows = ShopReview.objects.values('shop_id').annotate(
+        rating_sum=Sum('rating'), review_count=Count('id'), **histogram
+    )
+    for row in rows:
+        Shop.objects.filter(pk=row.pop('shop_id')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sabji_market', '0003_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:12
+
+import django.db.models.expressions
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sabji_market', '0009_cart_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('price'), '*', django.db.models.expressions.CombinedExpression(models.Value(100), '-', models.F('discount_percentage'))), '/', models.Value(100.0), output_field=models.DecimalField(decimal_places=2, max_digits=8)), 2), output_field=models.DecimalField(decimal_places=2, max_digits=8)),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['shop', 'is_available', 'effective_price'], name='product_shop_price_idx'),
+        ),
+    ]
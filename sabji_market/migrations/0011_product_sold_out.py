@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:50
+
+from django.db import migrations, models
+
+
+def mark_sold_out(apps, schema_editor):
+    # Checkout unlisted products as their stock ran out; before this field
+    # every unlisted product without stock was re-listed by a cancellation
+    Product = apps.get_model('sabji_market', 'Product')
+    Product.objects.filter(is_available=False, stock_quantity=0).update(sold_out=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sabji_market', '0010_product_effective_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sold_out',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_sold_out, migrations.RunPython.noop),
+    ]
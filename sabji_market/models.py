@@ -1,4 +1,9 @@
+from decimal import ROUND_HALF_UP, Decimal
+
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.expressions import CombinedExpression
+from django.db.models.functions import Round
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
 
@@ -46,6 +51,9 @@ class Shop(models.Model):
     address = models.TextField()
     city = models.CharField(max_length=100)
     pincode = models.CharField(max_length=10)
+    # Centroid of the pincode, filled in by sabji_market.geo when the shop is saved
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     shop_image = models.ImageField(upload_to='shop_images/', blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     category = models.ForeignKey(ShopCategory, on_delete=models.SET_NULL, null=True, blank=True)
@@ -54,15 +62,71 @@ class Shop(models.Model):
     is_delivery_available = models.BooleanField(default=True)
     delivery_charge = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
     registration_fee_paid = models.BooleanField(default=False)
+    
+    # Denormalized review aggregates, maintained by sabji_market.ratings
+    rating_sum = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    
+    AGGREGATE_FIELDS = (
+        'rating_sum', 'review_count',
+        'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        # Reviews move the aggregates with F() updates; a full save of a copy
+        # loaded before one of them (the admin, a status toggle) must not
+        # write the old counts back
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+                and field.name not in self.AGGREGATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return 0
+        return round(self.rating_sum / self.review_count, 1)
+    
+    @property
+    def rating_histogram(self):
+        """Review count per star, from 1 to 5"""
+        return [getattr(self, f'rating_{stars}_count') for stars in range(1, 6)]
+    
     class Meta:
         verbose_name = "Shop"
         verbose_name_plural = "Shops"
+        indexes = [
+            models.Index(fields=['status', 'is_open'], name='shop_status_open_idx'),
+        ]
+
+class ProductQuerySet(models.QuerySet):
+    def priced_between(self, min_price=None, max_price=None):
+        """Products whose effective (discounted) price lies in the range"""
+        queryset = self
+        if min_price is not None:
+            queryset = queryset.filter(effective_price__gte=min_price)
+        if max_price is not None:
+            queryset = queryset.filter(effective_price__lte=max_price)
+        return queryset
+
+    def order_by_price(self, descending=False):
+        return self.order_by('-effective_price' if descending else 'effective_price', 'id')
+
 
 class Product(models.Model):
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='products')
@@ -72,39 +136,87 @@ class Product(models.Model):
     image = models.ImageField(upload_to='product_images/', blank=True, null=True)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     discount_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    # What the customer pays, rounded to the paisa. The database computes it on
+    # every write (save, update(), bulk writes), so SQL can filter and sort by it
+    effective_price = models.GeneratedField(
+        # A float divisor: SQLite casts decimal operands to NUMERIC, which would make this integer division
+        expression=Round(
+            CombinedExpression(
+                F('price') * (Value(100) - F('discount_percentage')), '/', Value(100.0),
+                output_field=models.DecimalField(max_digits=8, decimal_places=2),
+            ),
+            2,
+        ),
+        output_field=models.DecimalField(max_digits=8, decimal_places=2),
+        db_persist=True,
+    )
     unit = models.CharField(max_length=20, default='kg')
     stock_quantity = models.PositiveIntegerField(default=0)
     is_available = models.BooleanField(default=True)
+    # Set when checkout (or an import) took the stock to zero and unlisted the
+    # product, so that a restock re-lists only those and never one its owner disabled
+    sold_out = models.BooleanField(default=False)
     is_organic = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.name} - {self.shop.name}"
     
+    def save(self, *args, **kwargs):
+        # A full save (the owner's form, the admin) sets the listing deliberately
+        if kwargs.get('update_fields') is None:
+            self.sold_out = False
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'price', 'discount_percentage'} & set(update_fields):
+            # The database recomputed effective_price; only an insert that
+            # returns it (not on MySQL) has already put the new value here
+            if not adding or self.effective_price is None:
+                self.refresh_from_db(fields=['effective_price'])
+    
+    @staticmethod
+    def calculate_effective_price(price, discount_percentage):
+        """Python twin of the effective_price column"""
+        return (price * (100 - discount_percentage) / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    
     def get_discounted_price(self):
-        if self.discount_percentage > 0:
-            discount_amount = self.price * (self.discount_percentage / 100)
-            return self.price - discount_amount
-        return self.price
+        # The stored column, unless the row has not been written yet
+        if self.effective_price is not None:
+            return self.effective_price
+        return self.calculate_effective_price(self.price, self.discount_percentage)
     
     class Meta:
         verbose_name = "Product"
         verbose_name_plural = "Products"
+        indexes = [
+            models.Index(fields=['shop', 'is_available'], name='product_shop_avail_idx'),
+            models.Index(fields=['category', 'is_available'], name='product_category_avail_idx'),
+            models.Index(fields=['shop', 'is_available', 'effective_price'], name='product_shop_price_idx'),
+        ]
 
 class Cart(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Bumped by every change to the cart's lines, for optimistic concurrency between tabs
+    version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Cart - {self.user.username}"
     
+    def get_summary(self):
+        from .cart import CartSummary
+        return CartSummary(self)
+    
     def get_total_price(self):
-        return sum(item.get_total_price() for item in self.items.all())
+        return self.get_summary().total_price
     
     def get_total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.get_summary().total_items
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
@@ -160,6 +272,10 @@ class Order(models.Model):
         verbose_name = "Order"
         verbose_name_plural = "Orders"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', '-created_at'], name='order_customer_created_idx'),
+            models.Index(fields=['shop', '-created_at'], name='order_shop_created_idx'),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -219,3 +335,62 @@ class ShopRegistrationPayment(models.Model):
     class Meta:
         verbose_name = "Shop Registration Payment"
         verbose_name_plural = "Shop Registration Payments"
+
+class ShopDailySales(models.Model):
+    """Delivered-order totals per shop per order date, kept by sabji_market.rollups"""
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='daily_sales')
+    date = models.DateField()
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.shop.name} - {self.date}"
+    
+    class Meta:
+        verbose_name = "Shop Daily Sales"
+        verbose_name_plural = "Shop Daily Sales"
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'date'], name='shop_daily_sales_unique'),
+        ]
+
+class ProductDailySales(models.Model):
+    """Delivered-order totals per product per order date, kept by sabji_market.rollups"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='product_daily_sales')
+    date = models.DateField()
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.date}"
+    
+    class Meta:
+        verbose_name = "Product Daily Sales"
+        verbose_name_plural = "Product Daily Sales"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='product_daily_sales_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['shop', 'date'], name='product_sales_shop_date_idx'),
+        ]
+
+class StoredFile(models.Model):
+    """A content-addressed media file and how many model fields point at it, kept by sabji_market.media"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+    
+    class Meta:
+        verbose_name = "Stored File"
+        verbose_name_plural = "Stored Files"
+        indexes = [
+            models.Index(fields=['refcount', 'updated_at'], name='stored_file_orphan_idx'),
+        ]
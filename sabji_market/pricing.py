@@ -0,0 +1,124 @@
+# sabji_market/pricing.py
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.utils import ErrorList
+from django.utils import timezone
+
+from . import facets
+from .forms import ProductPatchForm
+from .models import Product
+
+PATCH_FIELDS = ['price', 'discount_percentage', 'stock_quantity', 'is_available']
+
+# Bounds one request's lock set and bulk UPDATE
+MAX_PATCHES = 1000
+
+class PatchError(Exception):
+    """A batch of patches that was rejected as a whole"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f'{len(errors)} invalid patch(es)')
+
+
+def clean_patch(patch):
+    """``(product_id, changes)`` for one patch, or ``(None, errors)``.
+
+    Runs ProductPatchForm's fields directly: a form instance per patch
+    deep-copies every field and costs more than the rest of the request.
+    """
+    fields = ProductPatchForm.base_fields
+    cleaned, errors = {}, {}
+    for name in ['id', *(key for key in patch if key != 'id')]:
+        field = fields.get(name)
+        if field is None:
+            errors[name] = [{'message': 'Unknown field', 'code': 'unknown'}]
+            continue
+        try:
+            cleaned[name] = field.clean(patch.get(name))
+        except ValidationError as e:
+            errors[name] = ErrorList(e.error_list).get_json_data()
+    if errors:
+        return None, errors
+    product_id = cleaned.pop('id')
+    return product_id, {name: value for name, value in cleaned.items() if value is not None}
+
+
+def clean_patches(patches):
+    """``{product_id: changes}`` for a list of patch dicts, or PatchError listing every bad entry"""
+    if not isinstance(patches, list) or not patches:
+        raise PatchError([{'index': None, 'errors': {'__all__': ['Send a non-empty list of patches']}}])
+    if len(patches) > MAX_PATCHES:
+        raise PatchError([{'index': None, 'errors': {'__all__': [f'At most {MAX_PATCHES} patches per request']}}])
+
+    changes, errors = {}, []
+    for index, patch in enumerate(patches):
+        if not isinstance(patch, dict):
+            errors.append({'index': index, 'errors': {'__all__': ['Not a JSON object']}})
+            continue
+        product_id, cleaned = clean_patch(patch)
+        if product_id is None:
+            errors.append({'index': index, 'errors': cleaned})
+            continue
+        # A later patch for the same product wins field by field
+        changes.setdefault(product_id, {}).update(cleaned)
+    if errors:
+        raise PatchError(errors)
+    return changes
+
+
+def apply_patches(shop, patches):
+    """Apply price/stock patches to ``shop``'s products in one transaction.
+
+    The products are locked and loaded with one query and written back with
+    bulk_update covering just the patched columns, so the cost per request
+    barely grows with the number of patches. When stock is set without an
+    explicit availability, the product becomes available exactly when it has
+    stock, as checkout does. Returns the updated products in id order, with
+    effective_price as the database computed it.
+    """
+    changes = clean_patches(patches)
+    with transaction.atomic():
+        products = {
+            product.pk: product
+            for product in Product.objects.select_for_update().filter(shop=shop, pk__in=list(changes))
+        }
+        missing = sorted(set(changes) - set(products))
+        if missing:
+            raise PatchError([
+                {'index': None, 'errors': {'id': [f'No product {product_id} in this shop']}}
+                for product_id in missing
+            ])
+
+        now = timezone.now()
+        patched = {'updated_at'}
+        for product_id, fields in changes.items():
+            product = products[product_id]
+            for field, value in fields.items():
+                setattr(product, field, value)
+            if 'stock_quantity' in fields and 'is_available' not in fields:
+                product.is_available = product.stock_quantity > 0
+                patched.add('is_available')
+            patched.update(fields)
+            product.updated_at = now
+        Product.objects.bulk_update(
+            products.values(),
+            [field for field in [*PATCH_FIELDS, 'updated_at'] if field in patched],
+            batch_size=MAX_PATCHES,
+        )
+        # Read the generated column back: its rounding is the database's, not Decimal's
+        for product_id, effective_price in Product.objects.filter(pk__in=list(products)).values_list('pk', 'effective_price'):
+            products[product_id].effective_price = effective_price
+        facets.invalidate()
+    return [products[product_id] for product_id in sorted(products)]
+
+
+def patch_result(product):
+    return {
+        'id': product.pk,
+        'price': product.price,
+        'discount_percentage': product.discount_percentage,
+        'effective_price': product.get_discounted_price(),
+        'stock_quantity': product.stock_quantity,
+        'is_available': product.is_available,
+    }
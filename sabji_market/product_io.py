@@ -0,0 +1,245 @@
+# sabji_market/product_io.py
+import codecs
+import copy
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.forms.models import model_to_dict
+from django.utils import timezone
+
+from one_stop_booking_hub.reference_cache import reference_cache
+
+from . import facets
+from .forms import ProductForm
+from .models import Product
+from .search import python_backend
+from .typeahead import typeahead
+
+# Columns read on import; ``id`` (optional) picks the product to update,
+# otherwise rows match existing products of the shop by exact name
+IMPORT_FIELDS = ['name', 'description', 'category', 'price', 'discount_percentage', 'unit', 'stock_quantity', 'is_organic']
+EXPORT_FIELDS = ['id', *IMPORT_FIELDS, 'is_available']
+
+IMPORT_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+
+# Enough to fix a file by; the total is always reported
+MAX_REPORTED_ERRORS = 500
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'on'}
+
+
+class ImportFormatError(ValueError):
+    """The upload is not a CSV or NDJSON product file"""
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+
+def csv_rows(upload):
+    """``(line, row)`` pairs from a CSV upload, decoded as it is read"""
+    reader = csv.DictReader(codecs.iterdecode(upload, 'utf-8-sig'))
+    if not reader.fieldnames or 'name' not in reader.fieldnames:
+        raise ImportFormatError('The CSV header must include a "name" column')
+    for row in reader:
+        yield reader.line_num, {key: value for key, value in row.items() if key is not None}
+
+
+def ndjson_rows(upload):
+    """``(line, row)`` pairs from a file of one JSON object per line"""
+    for line, text in enumerate(codecs.iterdecode(upload, 'utf-8-sig'), start=1):
+        text = text.strip()
+        if not text:
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            row = None
+        yield line, row if isinstance(row, dict) else None
+
+
+def read_rows(upload, format=None):
+    if format is None:
+        format = 'ndjson' if upload.name.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+    if format == 'csv':
+        return csv_rows(upload)
+    if format == 'ndjson':
+        return ndjson_rows(upload)
+    raise ImportFormatError(f'Unsupported format "{format}"; use csv or ndjson')
+
+
+def category_ids():
+    """Lower-cased category name to pk, for the categories ProductForm accepts"""
+    queryset = ProductForm.base_fields['category'].queryset
+    return {category.name.lower(): category.pk for category in reference_cache.get_list(queryset)}
+
+
+def form_data(row, product, categories):
+    """ProductForm data for ``row``; columns it leaves out keep ``product``'s values"""
+    data = model_to_dict(product, fields=IMPORT_FIELDS) if product else {}
+    for field in IMPORT_FIELDS:
+        if field not in row:
+            continue
+        value = row[field]
+        if isinstance(value, str):
+            value = value.strip()
+        if field == 'category' and value not in (None, ''):
+            value = categories.get(str(value).lower(), value)
+        elif field == 'is_organic' and isinstance(value, str):
+            value = value.lower() in TRUE_VALUES
+        data[field] = value
+    return data
+
+
+def match_existing(shop, rows):
+    """Existing products of ``shop`` for a batch of rows, keyed by id and by name"""
+    ids = {str(row['id']) for line, row in rows if row and row.get('id') not in (None, '')}
+    names = {str(row.get('name', '')).strip() for line, row in rows if row}
+    by_id, by_name = {}, {}
+    lookup = Q(name__in=names)
+    numeric_ids = [value for value in ids if value.isdigit()]
+    if numeric_ids:
+        lookup |= Q(pk__in=numeric_ids)
+    for product in Product.objects.filter(lookup, shop=shop).order_by('pk'):
+        by_id[str(product.pk)] = product
+        by_name.setdefault(product.name, product)
+    return by_id, by_name
+
+
+def import_batch(shop, rows, categories, result):
+    by_id, by_name = match_existing(shop, rows)
+    created, updated = {}, {}
+    for line, row in rows:
+        if row is None:
+            result.add_error(line, {'__all__': ['Not a JSON object']})
+            continue
+        row_id = str(row.get('id') or '').strip()
+        if row_id:
+            product = by_id.get(row_id)
+            if product is None:
+                result.add_error(line, {'id': [f'No product {row_id} in this shop']})
+                continue
+        else:
+            name = str(row.get('name', '')).strip()
+            product = by_name.get(name) or created.get(name)
+        if product is not None and product.pk in updated:
+            product = updated[product.pk]
+
+        # The form writes into its instance even when invalid; keep the batch's copy clean
+        instance = copy.copy(product) if product is not None else None
+        form = ProductForm(data=form_data(row, product, categories), instance=instance)
+        if not form.is_valid():
+            result.add_error(line, form.errors.get_json_data())
+            continue
+        product = form.save(commit=False)
+        product.shop = shop
+        if product.pk is None:
+            product.is_available = product.stock_quantity > 0
+            product.sold_out = not product.is_available
+        elif product.stock_quantity == 0 and product.is_available:
+            product.is_available, product.sold_out = False, True
+        elif product.stock_quantity > 0 and product.sold_out:
+            # Re-list only what running out unlisted, never what the owner did
+            product.is_available, product.sold_out = True, False
+        if product.pk:
+            updated[product.pk] = product
+        else:
+            created[product.name] = product
+
+    now = timezone.now()
+    for product in updated.values():
+        product.updated_at = now
+    with transaction.atomic():
+        Product.objects.bulk_create(created.values())
+        Product.objects.bulk_update(updated.values(), [*IMPORT_FIELDS, 'is_available', 'sold_out', 'updated_at'])
+        facets.invalidate()
+    result.created += len(created)
+    result.updated += len(updated)
+
+    # Bulk writes skip the post_save signals that keep the search and typeahead indexes current
+    for product in [*created.values(), *updated.values()]:
+        if product.pk is None:
+            python_backend.forget(Product)
+            typeahead.reset()
+            break
+        python_backend.update(product)
+        typeahead.update(product)
+
+
+def import_products(shop, upload, format=None, batch_size=IMPORT_BATCH_SIZE):
+    """Create or update ``shop``'s products from a CSV or NDJSON upload.
+
+    Rows are read as the file is decoded and written a batch at a time, so
+    memory stays flat however long the file is. Every row goes through
+    ProductForm; rows that fail are reported by line and skipped.
+    """
+    result = ImportResult()
+    categories = category_ids()
+    batch = []
+    for line, row in read_rows(upload, format):
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            import_batch(shop, batch, categories, result)
+            batch = []
+    if batch:
+        import_batch(shop, batch, categories, result)
+    return result
+
+
+def export_rows(shop, chunk_size=EXPORT_CHUNK_SIZE):
+    """``shop``'s products as tuples in EXPORT_FIELDS order, a keyset chunk at a time.
+
+    Each chunk is its own bounded query, so memory stays constant even on
+    drivers that buffer a whole result set client side.
+    """
+    columns = ['id', *['category__name' if field == 'category' else field for field in EXPORT_FIELDS[1:]]]
+    products = Product.objects.filter(shop=shop).order_by('pk').values_list(*columns)
+    last_pk = 0
+    while True:
+        count = 0
+        for row in products.filter(pk__gt=last_pk)[:chunk_size].iterator(chunk_size=chunk_size):
+            count += 1
+            last_pk = row[0]
+            yield row
+        if count < chunk_size:
+            return
+
+
+class Echo:
+    """File-like object that hands back what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(shop):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in export_rows(shop):
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def export_ndjson(shop):
+    for row in export_rows(shop):
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), cls=DjangoJSONEncoder) + '\n'
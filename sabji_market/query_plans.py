@@ -0,0 +1,31 @@
+# sabji_market/query_plans.py
+"""Main query of each sabji market view, checked by the check_query_plans command.
+
+Each entry is (label, callable returning an unevaluated queryset), built by
+the same helper the view calls, so a change to a view's filters or ordering
+is checked too. Sample ids are fine: EXPLAIN only needs the query shape.
+"""
+from one_stop_booking_hub.pagination import CursorPaginator
+
+from .cart import cart_lines
+from .views import (
+    ORDERS_PER_PAGE, category_catalog, customer_orders, featured_shops, listed_shops, owner_shops,
+    recent_shop_orders, shop_catalog, shop_inventory, shop_order_list,
+)
+
+QUERY_PLANS = [
+    ('sabji_home: featured shops', featured_shops),
+    ('shop_list', lambda: listed_shops({}).page_queryset()),
+    ('shop_list: category, delivering', lambda: listed_shops({'category': 1, 'delivery_available': True}).page_queryset()),
+    ('shop_list: by rating', lambda: listed_shops({'sort': 'rating'}).page_queryset()),
+    ('shop_dashboard', lambda: owner_shops(1)),
+    ('shop_detail: products', lambda: shop_inventory(1)),
+    ('shop_detail: recent orders', lambda: recent_shop_orders(1)),
+    ('shop_products', lambda: shop_catalog(1, {})),
+    ('shop_products: price range, by price', lambda: shop_catalog(1, {'min_price': 10, 'max_price': 50, 'sort': 'price'})),
+    ('products_by_category', lambda: category_catalog(1).page_queryset()),
+    ('cart', lambda: cart_lines(1)),
+    ('my_orders', lambda: CursorPaginator(customer_orders(1), ORDERS_PER_PAGE).page_queryset()),
+    ('order_detail', lambda: customer_orders(1).filter(order_id='ORD00000000')),
+    ('shop_orders', lambda: CursorPaginator(shop_order_list(1), ORDERS_PER_PAGE).page_queryset()),
+]
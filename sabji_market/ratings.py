@@ -0,0 +1,93 @@
+# sabji_market/ratings.py
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from one_stop_booking_hub.reference_cache import reference_cache
+
+from .models import Shop, ShopReview
+
+RATING_COUNT_FIELDS = {stars: f'rating_{stars}_count' for stars in range(1, 6)}
+AGGREGATE_FIELDS = list(Shop.AGGREGATE_FIELDS)
+
+
+def record_review(shop, rating, previous_rating=None):
+    """Fold a new or edited review into the shop's rating aggregates.
+
+    ``previous_rating`` is the rating the review had before an edit, or None
+    for a new review. Uses F() increments so concurrent reviews don't race.
+    """
+    if previous_rating == rating:
+        return
+    changes = {
+        'rating_sum': F('rating_sum') + (rating - (previous_rating or 0)),
+        RATING_COUNT_FIELDS[rating]: F(RATING_COUNT_FIELDS[rating]) + 1,
+        'updated_at': timezone.now(),
+    }
+    if previous_rating is None:
+        changes['review_count'] = F('review_count') + 1
+    else:
+        changes[RATING_COUNT_FIELDS[previous_rating]] = F(RATING_COUNT_FIELDS[previous_rating]) - 1
+    Shop.objects.filter(pk=shop.pk).update(**changes)
+    # update() sends no signals; retire pages that show ratings
+    reference_cache.bump(Shop)
+
+
+def forget_review(shop_id, rating):
+    """Remove a deleted review from its shop's rating aggregates"""
+    Shop.objects.filter(pk=shop_id, review_count__gt=0).update(**{
+        'rating_sum': F('rating_sum') - rating,
+        'review_count': F('review_count') - 1,
+        RATING_COUNT_FIELDS[rating]: F(RATING_COUNT_FIELDS[rating]) - 1,
+        'updated_at': timezone.now(),
+    })
+    reference_cache.bump(Shop)
+
+
+def computed_ratings(shop_ids=None):
+    """Aggregates recomputed from ShopReview, keyed by shop id"""
+    reviews = ShopReview.objects.all()
+    if shop_ids is not None:
+        reviews = reviews.filter(shop_id__in=shop_ids)
+    histogram = {
+        field: Count('id', filter=Q(rating=stars))
+        for stars, field in RATING_COUNT_FIELDS.items()
+    }
+    rows = reviews.values('shop_id').annotate(
+        rating_sum=Sum('rating'),
+        review_count=Count('id'),
+        **histogram,
+    )
+    return {row.pop('shop_id'): row for row in rows}
+
+
+def rebuild_ratings(batch_size=500, fix=True):
+    """Compare every shop's stored aggregates against its reviews.
+
+    Returns ``[(shop_id, stored, expected), ...]`` for shops that drifted,
+    and writes the expected values back when ``fix`` is true.
+    """
+    empty = dict.fromkeys(AGGREGATE_FIELDS, 0)
+    drifted = []
+    shop_ids = list(Shop.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(shop_ids), batch_size):
+        batch = shop_ids[start:start + batch_size]
+        expected = computed_ratings(batch)
+        stale = []
+        for stored in Shop.objects.filter(pk__in=batch).values('pk', *AGGREGATE_FIELDS):
+            shop_id = stored.pop('pk')
+            wanted = expected.get(shop_id, empty)
+            if stored != wanted:
+                drifted.append((shop_id, stored, wanted))
+                stale.append(Shop(pk=shop_id, updated_at=timezone.now(), **wanted))
+        if fix and stale:
+            with transaction.atomic():
+                Shop.objects.bulk_update(stale, [*AGGREGATE_FIELDS, 'updated_at'])
+    return drifted
+
+
+def with_average_rating(queryset):
+    """Annotate shops with avg_rating computed from their own columns, no join"""
+    average = Cast('rating_sum', FloatField()) / NullIf(Cast('review_count', FloatField()), Value(0.0))
+    return queryset.annotate(avg_rating=Coalesce(average, Value(0.0)))
@@ -0,0 +1,174 @@
+# sabji_market/rollups.py
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Order, OrderItem, ProductDailySales, ShopDailySales
+
+# Orders that count as sales
+SOLD = 'delivered'
+CANCELLED = 'cancelled'
+
+LINE_REVENUE = ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def sales_date(order):
+    """Rollup day of an order: its creation date in the current time zone"""
+    return timezone.localdate(order.created_at)
+
+
+def bump(model, keys, changes, defaults=None):
+    """Add ``changes`` to the rollup row at ``keys``, creating it (with ``defaults``) if needed"""
+    increments = {field: F(field) + delta for field, delta in changes.items()}
+    if model.objects.filter(**keys).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **changes, **(defaults or {}))
+    except IntegrityError:
+        # Another transaction created the row first
+        model.objects.filter(**keys).update(**increments)
+
+
+def order_lines(order):
+    """``{product_id: (units, revenue)}`` for an order"""
+    rows = (
+        OrderItem.objects.filter(order=order)
+        .values('product_id')
+        .annotate(units=Sum('quantity'), revenue=Sum(LINE_REVENUE))
+    )
+    return {row['product_id']: (row['units'], row['revenue']) for row in rows}
+
+
+def apply_order(order, sign):
+    """Add (sign=1) or remove (sign=-1) a delivered order from the rollups"""
+    day = sales_date(order)
+    lines = order_lines(order)
+    bump(ShopDailySales, {'shop_id': order.shop_id, 'date': day}, {
+        'revenue': sign * order.total_amount,
+        'order_count': sign,
+        'units_sold': sign * sum(units for units, revenue in lines.values()),
+    })
+    for product_id, (units, revenue) in sorted(lines.items()):
+        bump(ProductDailySales, {'product_id': product_id, 'date': day}, {
+            'revenue': sign * revenue,
+            'order_count': sign,
+            'units_sold': sign * units,
+        }, defaults={'shop_id': order.shop_id})
+
+
+def record_order_status(order, previous_status):
+    """Fold a status change into the rollups; call in the transaction that saved it"""
+    if previous_status == order.status:
+        return
+    if order.status == SOLD:
+        apply_order(order, 1)
+    elif previous_status == SOLD:
+        apply_order(order, -1)
+
+    if CANCELLED in (order.status, previous_status):
+        sign = 1 if order.status == CANCELLED else -1
+        bump(ShopDailySales, {'shop_id': order.shop_id, 'date': sales_date(order)}, {'cancelled_count': sign})
+
+
+def computed_shop_sales(shop_ids):
+    """Rollup rows for ``shop_ids`` recomputed from orders"""
+    orders = Order.objects.filter(shop_id__in=shop_ids).annotate(date=TruncDate('created_at'))
+    rows = {}
+    sold = orders.filter(status=SOLD).values('shop_id', 'date').annotate(
+        revenue=Sum('total_amount'), order_count=Count('id'),
+    )
+    for row in sold:
+        rows[row['shop_id'], row['date']] = {
+            'revenue': row['revenue'], 'order_count': row['order_count'], 'units_sold': 0, 'cancelled_count': 0,
+        }
+    units = (
+        OrderItem.objects.filter(order__shop_id__in=shop_ids, order__status=SOLD)
+        .annotate(date=TruncDate('order__created_at'))
+        .values('order__shop_id', 'date').annotate(units=Sum('quantity'))
+    )
+    for row in units:
+        rows[row['order__shop_id'], row['date']]['units_sold'] = row['units']
+    cancelled = orders.filter(status=CANCELLED).values('shop_id', 'date').annotate(count=Count('id'))
+    for row in cancelled:
+        entry = rows.setdefault((row['shop_id'], row['date']), {
+            'revenue': Decimal('0'), 'order_count': 0, 'units_sold': 0, 'cancelled_count': 0,
+        })
+        entry['cancelled_count'] = row['count']
+    return [ShopDailySales(shop_id=shop_id, date=day, **values) for (shop_id, day), values in rows.items()]
+
+
+def computed_product_sales(shop_ids):
+    """Product rollup rows for ``shop_ids`` recomputed from order lines"""
+    rows = (
+        OrderItem.objects.filter(order__shop_id__in=shop_ids, order__status=SOLD)
+        .annotate(date=TruncDate('order__created_at'))
+        .values('product_id', 'order__shop_id', 'date')
+        .annotate(revenue=Sum(LINE_REVENUE), units=Sum('quantity'), orders=Count('order_id', distinct=True))
+    )
+    return [
+        ProductDailySales(
+            product_id=row['product_id'], shop_id=row['order__shop_id'], date=row['date'],
+            revenue=row['revenue'], units_sold=row['units'], order_count=row['orders'],
+        )
+        for row in rows
+    ]
+
+
+def rebuild_rollups(shop_ids, batch_size=200):
+    """Replace the rollups of ``shop_ids`` with values recomputed from orders, a batch of shops at a time.
+
+    Returns the number of shop and product rows written.
+    """
+    shop_rows = product_rows = 0
+    for start in range(0, len(shop_ids), batch_size):
+        batch = shop_ids[start:start + batch_size]
+        shops = computed_shop_sales(batch)
+        products = computed_product_sales(batch)
+        with transaction.atomic():
+            ShopDailySales.objects.filter(shop_id__in=batch).delete()
+            ProductDailySales.objects.filter(shop_id__in=batch).delete()
+            ShopDailySales.objects.bulk_create(shops, batch_size=1000)
+            ProductDailySales.objects.bulk_create(products, batch_size=1000)
+        shop_rows += len(shops)
+        product_rows += len(products)
+    return shop_rows, product_rows
+
+
+def sales_series(shop, days=90):
+    """Daily revenue, orders and units for the last ``days`` days, zero-filled"""
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    rows = {
+        row['date']: row
+        for row in ShopDailySales.objects.filter(shop=shop, date__range=(start, end)).values(
+            'date', 'revenue', 'order_count', 'units_sold', 'cancelled_count',
+        )
+    }
+    series = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = rows.get(day, {})
+        series.append({
+            'date': day.isoformat(),
+            'revenue': float(row.get('revenue', 0)),
+            'orders': row.get('order_count', 0),
+            'units': row.get('units_sold', 0),
+            'cancelled': row.get('cancelled_count', 0),
+        })
+    return series
+
+
+def top_products(shop, days=90, limit=10):
+    """Best-selling products by revenue over the last ``days`` days"""
+    start = timezone.localdate() - timedelta(days=days - 1)
+    return list(
+        ProductDailySales.objects.filter(shop=shop, date__gte=start)
+        .values('product_id', 'product__name')
+        .annotate(revenue=Sum('revenue'), units=Sum('units_sold'), orders=Sum('order_count'))
+        .order_by('-revenue', 'product_id')[:limit]
+    )
@@ -0,0 +1,263 @@
+# sabji_market/search.py
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Product, Shop
+
+# Searchable text per model, with the weight each field contributes to relevance
+SEARCH_FIELDS = {
+    Product: {'name': 3.0, 'description': 1.0},
+    Shop: {'name': 3.0, 'description': 1.0},
+}
+
+# Upper bound on ids the in-process index hands back to the database; the
+# CASE that carries their ranks grows with it
+MAX_RESULTS = 200
+
+# Ranked ids checked per query against a filtered queryset; under SQLite's
+# historical limit of 999 bound parameters
+SCOPE_BATCH = 900
+
+# InnoDB ignores words shorter than innodb_ft_min_token_size (3 by default)
+MYSQL_MIN_TOKEN_SIZE = 3
+
+# Ordering of ranked results; a total order, so it can drive keyset pagination
+RANK_ORDERING = ('-search_rank', 'id')
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def fts_table(model):
+    """Name of the SQLite FTS5 shadow table created by migration 0003"""
+    return f'{model._meta.db_table}_fts'
+
+
+def unranked(queryset):
+    """Give a queryset the search_rank every search result carries"""
+    return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def icontains_search(queryset, query):
+    """The original unindexed search, kept as the last-resort fallback"""
+    condition = Q()
+    for field in SEARCH_FIELDS[queryset.model]:
+        condition |= Q(**{f'{field}__icontains': query})
+    return queryset.filter(condition)
+
+
+class InvertedIndex:
+    """Weighted term -> document postings with prefix lookups.
+
+    Every query token matches all indexed terms it is a prefix of, documents
+    must match every token, and documents are ranked by the sum of
+    weighted term frequency times inverse document frequency.
+    """
+
+    def __init__(self, weights):
+        self.weights = weights
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self._sorted_terms = None
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, doc_id, fields):
+        self.remove(doc_id)
+        frequencies = defaultdict(float)
+        for field, weight in self.weights.items():
+            for term in tokenize(fields.get(field)):
+                frequencies[term] += weight
+        for term, frequency in frequencies.items():
+            if term not in self.postings:
+                self._sorted_terms = None
+            self.postings[term][doc_id] = frequency
+        self.documents[doc_id] = tuple(frequencies)
+
+    def remove(self, doc_id):
+        for term in self.documents.pop(doc_id, ()):
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+                self._sorted_terms = None
+
+    def expand(self, prefix):
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        terms = self._sorted_terms
+        position = bisect_left(terms, prefix)
+        while position < len(terms) and terms[position].startswith(prefix):
+            yield terms[position]
+            position += 1
+
+    def search(self, query, limit=None):
+        """Return ``[(doc_id, score), ...]`` best match first"""
+        total = len(self.documents)
+        scores = None
+        for token in set(tokenize(query)):
+            token_scores = defaultdict(float)
+            for term in self.expand(token):
+                postings = self.postings[term]
+                idf = math.log(1 + total / len(postings))
+                for doc_id, frequency in postings.items():
+                    token_scores[doc_id] += frequency * idf
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {doc_id: score + token_scores[doc_id] for doc_id, score in scores.items() if doc_id in token_scores}
+            if not scores:
+                return []
+        if not scores:
+            return []
+        ranked = sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
+        return ranked[:limit] if limit else ranked
+
+
+class PythonSearchBackend:
+    """In-process inverted index, built lazily per model and kept current by signals"""
+
+    def __init__(self):
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def get_index(self, model):
+        index = self.indexes.get(model)
+        if index is None:
+            with self.lock:
+                index = self.indexes.get(model)
+                if index is None:
+                    index = self.build_index(model)
+                    self.indexes[model] = index
+        return index
+
+    def build_index(self, model):
+        weights = SEARCH_FIELDS[model]
+        index = InvertedIndex(weights)
+        rows = model._default_manager.values_list('pk', *weights).iterator(chunk_size=2000)
+        for pk, *values in rows:
+            index.add(pk, dict(zip(weights, values)))
+        return index
+
+    def update(self, instance):
+        index = self.indexes.get(type(instance))
+        if index is not None:
+            with self.lock:
+                index.add(instance.pk, {field: getattr(instance, field) for field in index.weights})
+
+    def remove(self, instance):
+        index = self.indexes.get(type(instance))
+        if index is not None:
+            with self.lock:
+                index.remove(instance.pk)
+
+    def forget(self, model):
+        """Drop ``model``'s index so it is rebuilt on the next search, e.g. after bulk writes"""
+        with self.lock:
+            self.indexes.pop(model, None)
+
+    def reset(self):
+        with self.lock:
+            self.indexes.clear()
+
+    def scope(self, queryset, ranked):
+        """The ``ranked`` matches that ``queryset`` admits, best first, up to MAX_RESULTS"""
+        scoped = []
+        for start in range(0, len(ranked), SCOPE_BATCH):
+            window = ranked[start:start + SCOPE_BATCH]
+            admitted = set(
+                queryset.order_by().filter(pk__in=[pk for pk, value in window]).values_list('pk', flat=True)
+            )
+            scoped.extend(pair for pair in window if pair[0] in admitted)
+            if len(scoped) >= MAX_RESULTS:
+                break
+        return scoped
+
+    def search(self, queryset, query):
+        # The index covers the whole table: apply the queryset's filters (a
+        # shop, a category, availability) before truncating, or matches
+        # outside the catalog-wide top MAX_RESULTS would be lost
+        ranked = self.get_index(queryset.model).search(query)
+        if queryset.query.has_filters():
+            ranked = self.scope(queryset, ranked)
+        ranked = ranked[:MAX_RESULTS]
+        if not ranked:
+            return unranked(queryset.none())
+        score = Case(
+            *[When(pk=pk, then=Value(value)) for pk, value in ranked],
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=[pk for pk, value in ranked]).annotate(search_rank=score).order_by(*RANK_ORDERING)
+
+
+class DatabaseSearchBackend:
+    """Full-text index search: InnoDB FULLTEXT on MySQL, FTS5 on SQLite"""
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return unranked(queryset.none())
+        vendor = connections[queryset.db].vendor
+        if vendor == 'mysql' and all(len(token) >= MYSQL_MIN_TOKEN_SIZE for token in tokens):
+            return self.mysql_search(queryset, tokens)
+        if vendor == 'sqlite':
+            return self.sqlite_search(queryset, tokens)
+        return unranked(icontains_search(queryset, query)).order_by(*RANK_ORDERING)
+
+    def mysql_search(self, queryset, tokens):
+        table = queryset.model._meta.db_table
+        columns = ', '.join(f'`{table}`.`{field}`' for field in SEARCH_FIELDS[queryset.model])
+        boolean_query = ' '.join(f'+{token}*' for token in tokens)
+        match = f'MATCH({columns}) AGAINST (%s IN BOOLEAN MODE)'
+        # MATCH in WHERE, rather than a filter on the annotation, lets InnoDB use the index
+        return (
+            queryset.extra(where=[match], params=[boolean_query])
+            .annotate(search_rank=RawSQL(match, [boolean_query], output_field=FloatField()))
+            .order_by(*RANK_ORDERING)
+        )
+
+    def sqlite_search(self, queryset, tokens):
+        table = queryset.model._meta.db_table
+        fts = fts_table(queryset.model)
+        weights = ', '.join(str(weight) for weight in SEARCH_FIELDS[queryset.model].values())
+        match_query = ' '.join(f'"{token}"*' for token in tokens)
+        # bm25() only works in the query that runs MATCH, so join the FTS table in
+        return (
+            queryset.extra(
+                tables=[fts],
+                where=[f'"{fts}".rowid = "{table}"."id"', f'"{fts}" MATCH %s'],
+                params=[match_query],
+            )
+            .annotate(search_rank=RawSQL(f'-bm25("{fts}", {weights})', [], output_field=FloatField()))
+            .order_by(*RANK_ORDERING)
+        )
+
+
+python_backend = PythonSearchBackend()
+database_backend = DatabaseSearchBackend()
+
+BACKENDS = {
+    'python': python_backend,
+    'database': database_backend,
+}
+
+
+def get_backend():
+    return BACKENDS[getattr(settings, 'SABJI_MARKET_SEARCH_BACKEND', 'database')]
+
+
+def search(queryset, query):
+    """Filter a Product or Shop queryset by ``query``, best match first"""
+    return get_backend().search(queryset, query)
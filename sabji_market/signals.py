@@ -0,0 +1,86 @@
+# sabji_market/signals.py
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from one_stop_booking_hub.images import image_pipeline
+from one_stop_booking_hub.reference_cache import reference_cache
+
+from . import media
+from .fulltext import ensure_sqlite_triggers
+from .geo import locate, shop_locator
+from .models import Product, ProductCategory, Shop, ShopCategory, ShopReview
+from .ratings import forget_review
+from .search import python_backend
+from .typeahead import typeahead
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Shop)
+def update_search_index(sender, instance, **kwargs):
+    python_backend.update(instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Shop)
+def remove_from_search_index(sender, instance, **kwargs):
+    python_backend.remove(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Shop)
+@receiver(post_save, sender=ProductCategory)
+def update_typeahead(sender, instance, **kwargs):
+    typeahead.update(instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Shop)
+@receiver(post_delete, sender=ProductCategory)
+def remove_from_typeahead(sender, instance, **kwargs):
+    typeahead.remove(instance)
+
+
+@receiver(pre_save, sender=Shop)
+def locate_shop(sender, instance, **kwargs):
+    locate(instance)
+
+
+@receiver(post_save, sender=Shop)
+def update_shop_locator(sender, instance, **kwargs):
+    shop_locator.update(instance)
+
+
+@receiver(post_delete, sender=Shop)
+def remove_from_shop_locator(sender, instance, **kwargs):
+    shop_locator.remove(instance)
+
+
+@receiver(post_migrate)
+def restore_fulltext_triggers(sender, using, **kwargs):
+    if sender.name == 'sabji_market':
+        ensure_sqlite_triggers(connections[using])
+
+
+@receiver(post_delete, sender=ShopReview)
+def remove_review_from_ratings(sender, instance, **kwargs):
+    forget_review(instance.shop_id, instance.rating)
+
+
+image_pipeline.register(Shop, 'shop_image')
+image_pipeline.register(Product, 'image')
+image_pipeline.register(ShopCategory, 'image')
+image_pipeline.register(ProductCategory, 'image')
+
+media.register(Shop, 'shop_image')
+media.register(Product, 'image')
+media.register(ShopCategory, 'image')
+media.register(ProductCategory, 'image')
+media.register(get_user_model(), 'profile_photo')
+
+# Bump versions even in processes that never read the cached lists
+reference_cache.register(Shop)
+reference_cache.register(Product)
+reference_cache.register(ShopCategory)
+reference_cache.register(ProductCategory)
@@ -1,3 +1,1832 @@
-from django.test import TestCase
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError, SystemCheckError
+from django.db import connection, connections, transaction
+from django.db.models.constants import OnConflict
+from django.shortcuts import get_object_or_404
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from one_stop_booking_hub.geo import GridIndex, haversine_km
+from one_stop_booking_hub.images import derivative_name, image_pipeline
+from one_stop_booking_hub.ids import LEASE_TIMEOUT, IdGenerator, check_node_source, lease_key, lease_node, parse_id
+from one_stop_booking_hub.page_cache import page_cache
+from one_stop_booking_hub.pagination import CursorPaginator
+from one_stop_booking_hub.reference_cache import ReferenceCache, reference_cache
+from one_stop_booking_hub.testing import assert_max_queries
+
+from .cart import CartSummary
+from .forms import OrderStatusUpdateForm, ShopSearchForm
+from .geo import nearby_shops, pincodes, shop_locator
+from .management.commands.check_query_plans import full_scan_tables
+from .checkout import place_orders
+from .inventory import OutOfStock, release_stock, reserve_stock, sync_order_stock
+from .models import (
+    Cart, CartItem, Order, OrderItem, Product, ProductCategory, ProductDailySales, Shop, ShopCategory,
+    ShopDailySales, ShopReview, StoredFile
+)
+from .media import collect_garbage, rebuild_refcounts
+from .pricing import apply_patches
+from .product_io import export_rows, import_products
+from .ratings import rebuild_ratings, record_review
+from .rollups import rebuild_rollups, record_order_status
+from .search import InvertedIndex, database_backend, python_backend
+from .typeahead import PrefixIndex, typeahead
+
+User = get_user_model()
+
+
+class MarketTestMixin:
+    """Shared fixtures for the sabji market tests"""
+
+    def create_user(self, username='customer'):
+        return User.objects.create_user(username=username, password='pass12345')
+
+    def create_shop(self, owner, name='Green Grocers', **kwargs):
+        defaults = {
+            'owner_name': 'Owner',
+            'phone_number': '9999999999',
+            'address': 'Market Road',
+            'city': 'Bhopal',
+            'pincode': '462001',
+            'status': 'active',
+            'delivery_charge': Decimal('20.00'),
+        }
+        defaults.update(kwargs)
+        return Shop.objects.create(owner=owner, name=name, **defaults)
+
+    def create_product(self, shop, name='Tomato', price='40.00', discount='0.00', **kwargs):
+        defaults = {'stock_quantity': 100}
+        defaults.update(kwargs)
+        return Product.objects.create(
+            shop=shop, name=name, price=Decimal(price),
+            discount_percentage=Decimal(discount), **defaults
+        )
+
+    @contextlib.contextmanager
+    def untargeted_upserts(self):
+        """Make the test database upsert like MySQL: no conflict target, so no unique_fields"""
+        original = connection.ops.on_conflict_suffix_sql
+
+        def on_conflict_suffix_sql(fields, on_conflict, update_fields, unique_fields):
+            if on_conflict != OnConflict.UPDATE:
+                return original(fields, on_conflict, update_fields, unique_fields)
+            # SQLite's untargeted form behaves as ON DUPLICATE KEY UPDATE does
+            assignments = ', '.join(f'{name} = EXCLUDED.{name}' for name in map(connection.ops.quote_name, update_fields))
+            return f'ON CONFLICT DO UPDATE SET {assignments}'
+
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False))
+            stack.enter_context(mock.patch.object(connection.ops, 'on_conflict_suffix_sql', on_conflict_suffix_sql))
+            yield
+
+
+class CartSummaryTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.owner = self.create_user('owner')
+        self.cart = Cart.objects.create(user=self.user)
+
+    def fill_cart(self, count):
+        shops = [self.create_shop(self.owner, name=f'Shop {i}') for i in range(2)]
+        for i in range(count):
+            product = self.create_product(shops[i % 2], name=f'Item {i}', price='50.00', discount='10.00')
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+
+    def test_totals_match_python_pricing(self):
+        shop = self.create_shop(self.owner)
+        onion = self.create_product(shop, 'Onion', price='30.00', discount='5.00')
+        potato = self.create_product(shop, 'Potato', price='25.00', discount='12.50')
+        CartItem.objects.create(cart=self.cart, product=onion, quantity=3)
+        CartItem.objects.create(cart=self.cart, product=potato, quantity=2)
+
+        summary = CartSummary(self.cart)
+
+        # Unit prices are rounded to the paisa before multiplying: 28.50 x 3 + 21.88 x 2
+        self.assertEqual(summary.total_items, 5)
+        self.assertEqual(summary.line_count, 2)
+        self.assertEqual(summary.total_price, Decimal('129.26'))
+        self.assertEqual(summary.shops[shop]['subtotal'], Decimal('129.26'))
+        self.assertEqual(summary.total_amount, Decimal('149.26'))
+        self.assertEqual(self.cart.get_total_price(), Decimal('129.26'))
+        self.assertEqual(sum(item.get_total_price() for item in self.cart.items.all()), Decimal('129.26'))
+        self.assertEqual(self.cart.get_total_items(), 5)
+
+    def test_summary_is_single_query(self):
+        for size in (1, 10):
+            CartItem.objects.filter(cart=self.cart).delete()
+            self.fill_cart(size)
+            with self.assertNumQueries(1):
+                summary = CartSummary(self.cart)
+                for item in summary:
+                    item.product.shop.name
+            self.assertEqual(summary.line_count, size)
+
+    def test_cart_page_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        counts = []
+        for size in (1, 10):
+            CartItem.objects.filter(cart=self.cart).delete()
+            self.fill_cart(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('sabji_market:cart'))
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class CheckoutTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.owner = self.create_user('owner')
+        self.cart = Cart.objects.create(user=self.user)
+        self.shops = [self.create_shop(self.owner, name=f'Shop {i}') for i in range(3)]
+        for i in range(9):
+            product = self.create_product(self.shops[i % 3], name=f'Item {i}', price='20.00', discount='5.00')
+            CartItem.objects.create(cart=self.cart, product=product, quantity=i + 1)
+
+    def checkout(self, **kwargs):
+        data = {
+            'customer_name': 'Customer',
+            'customer_phone': '8888888888',
+            'delivery_type': 'delivery',
+            'delivery_address': 'Lake View',
+        }
+        data.update(kwargs)
+        return place_orders(self.user, CartSummary(self.cart), **data)
+
+    def test_creates_one_order_per_shop_and_clears_cart(self):
+        orders, timings = self.checkout()
+
+        self.assertEqual(len(orders), 3)
+        self.assertEqual(Order.objects.count(), 3)
+        self.assertEqual(OrderItem.objects.count(), 9)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+        order = Order.objects.get(shop=self.shops[0])
+        # Items 0, 3 and 6 with quantities 1 + 4 + 7 at 19.00 each
+        self.assertEqual(order.subtotal, Decimal('228.00'))
+        self.assertEqual(order.total_amount, Decimal('248.00'))
+        self.assertEqual([name for name, duration in timings.stages], ['orders', 'order_items', 'stock', 'clear_cart'])
+
+    def test_pickup_has_no_delivery_charge(self):
+        orders, timings = self.checkout(delivery_type='pickup')
+        self.assertTrue(all(order.delivery_charge == 0 for order in orders))
+
+    def test_insert_count_does_not_grow_with_cart_size(self):
+        summary = CartSummary(self.cart)
+        with CaptureQueriesContext(connection) as queries:
+            place_orders(self.user, summary, 'Customer', '8888888888', 'pickup')
+        inserts = [q for q in queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+
+    def test_failure_rolls_back_everything(self):
+        with mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.checkout()
+
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 9)
+
+    def test_checkout_view_reports_server_timing(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('sabji_market:checkout'), {
+            'customer_name': 'Customer',
+            'customer_phone': '8888888888',
+            'delivery_type': 'pickup',
+        })
+        self.assertRedirects(response, reverse('sabji_market:order_success'), fetch_redirect_response=False)
+        self.assertIn('orders;dur=', response['Server-Timing'])
+        self.assertEqual(Order.objects.filter(customer=self.user).count(), 3)
+
+
+class InventoryTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.owner = self.create_user('owner')
+        self.shop = self.create_shop(self.owner)
+        self.product = self.create_product(self.shop, stock_quantity=5)
+
+    def test_reserve_decrements_and_flips_availability(self):
+        reserve_stock({self.product.pk: 3})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 2)
+        self.assertTrue(self.product.is_available)
+
+        reserve_stock({self.product.pk: 2})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+        self.assertFalse(self.product.is_available)
+
+    def test_oversell_is_rejected_and_rolled_back(self):
+        other = self.create_product(self.shop, 'Onion', stock_quantity=10)
+        with self.assertRaises(OutOfStock):
+            with transaction.atomic():
+                reserve_stock({other.pk: 4, self.product.pk: 6})
+        other.refresh_from_db()
+        self.assertEqual(other.stock_quantity, 10)
+
+    def test_release_restores_sold_out_product(self):
+        reserve_stock({self.product.pk: 5})
+        release_stock({self.product.pk: 2})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 2)
+        self.assertTrue(self.product.is_available)
+
+    def test_cancelling_order_releases_stock(self):
+        customer = self.create_user()
+        cart = Cart.objects.create(user=customer)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=4)
+        orders, timings = place_orders(customer, CartSummary(cart), 'Customer', '8888888888', 'pickup')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 1)
+
+        order = orders[0]
+        order.status = 'cancelled'
+        order.save()
+        sync_order_stock(order, 'pending')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 5)
+
+    def test_release_keeps_disabled_products_unlisted(self):
+        reserve_stock({self.product.pk: 2})
+        self.product.refresh_from_db()
+        self.product.is_available = False
+        self.product.save()
+        release_stock({self.product.pk: 2})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 5)
+        self.assertFalse(self.product.is_available)
+
+    def test_concurrent_cancellations_release_stock_once(self):
+        customer = self.create_user()
+        cart = Cart.objects.create(user=customer)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=4)
+        order = place_orders(customer, CartSummary(cart), 'Customer', '8888888888', 'pickup')[0][0]
+        self.client.force_login(self.owner)
+
+        # Another cancel commits after this request has loaded the order
+        validate = OrderStatusUpdateForm.is_valid
+
+        def cancel_elsewhere_first(form):
+            Order.objects.filter(pk=order.pk).update(status='cancelled')
+            release_stock({self.product.pk: 4})
+            return validate(form)
+
+        with mock.patch.object(OrderStatusUpdateForm, 'is_valid', autospec=True, side_effect=cancel_elsewhere_first):
+            self.client.post(reverse('sabji_market:update_order_status', args=[order.id]), {'status': 'cancelled', 'notes': ''})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 5)
+
+    def test_checkout_of_unavailable_stock_keeps_cart(self):
+        customer = self.create_user()
+        cart = Cart.objects.create(user=customer)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=6)
+        with self.assertRaises(OutOfStock):
+            place_orders(customer, CartSummary(cart), 'Customer', '8888888888', 'pickup')
+        self.assertFalse(Order.objects.exists())
+        self.assertTrue(CartItem.objects.filter(cart=cart).exists())
+
+
+class InventoryConcurrencyTests(MarketTestMixin, TransactionTestCase):
+    threads = 20
+
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_concurrent_reservations_never_oversell(self):
+        owner = self.create_user('owner')
+        product = self.create_product(self.create_shop(owner), stock_quantity=50)
+        barrier = threading.Barrier(self.threads)
+        results = []
+
+        def buy():
+            try:
+                barrier.wait()
+                with transaction.atomic():
+                    reserve_stock({product.pk: 5})
+                results.append(True)
+            except OutOfStock:
+                results.append(False)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=buy) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        product.refresh_from_db()
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(results.count(False), self.threads - 10)
+        self.assertEqual(product.stock_quantity, 0)
+        self.assertFalse(product.is_available)
+
+
+class InvertedIndexTests(TestCase):
+    def setUp(self):
+        self.index = InvertedIndex({'name': 3.0, 'description': 1.0})
+        self.index.add(1, {'name': 'Red Tomato', 'description': 'Fresh from the farm'})
+        self.index.add(2, {'name': 'Potato', 'description': 'Goes well with tomato curry'})
+        self.index.add(3, {'name': 'Onion', 'description': None})
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual([doc for doc, score in self.index.search('tomato')], [1, 2])
+
+    def test_tokens_are_prefixes_and_all_must_match(self):
+        self.assertEqual([doc for doc, score in self.index.search('tom fre')], [1])
+        self.assertEqual(self.index.search('tomato onion'), [])
+
+    def test_remove_and_readd(self):
+        self.index.remove(1)
+        self.assertEqual([doc for doc, score in self.index.search('tomato')], [2])
+        self.index.add(2, {'name': 'Sweet Potato', 'description': ''})
+        self.assertEqual(self.index.search('tomato'), [])
+        self.assertEqual(len(self.index), 2)
+
+
+class CatalogSearchTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.owner = self.create_user('owner')
+        self.shop = self.create_shop(self.owner, description='Organic vegetables')
+        self.create_shop(self.owner, name='Fruit Corner', description='Seasonal fruits')
+        self.tomato = self.create_product(self.shop, 'Cherry Tomato', description='Sweet and red')
+        self.create_product(self.shop, 'Spinach', description='Pairs well with tomato')
+        self.create_product(self.shop, 'Carrot')
+        python_backend.reset()
+
+    def tearDown(self):
+        python_backend.reset()
+
+    def names(self, queryset):
+        return [obj.name for obj in queryset]
+
+    def test_backends_rank_name_matches_first(self):
+        for backend in (database_backend, python_backend):
+            with self.subTest(backend=type(backend).__name__):
+                results = backend.search(Product.objects.filter(shop=self.shop), 'tomato')
+                self.assertEqual(self.names(results), ['Cherry Tomato', 'Spinach'])
+                results = backend.search(Shop.objects.all(), 'veg')
+                self.assertEqual(self.names(results), ['Green Grocers'])
+
+    def test_indexes_follow_writes(self):
+        python_backend.get_index(Product)
+        self.tomato.name = 'Cherry Plum'
+        self.tomato.save()
+        self.create_product(self.shop, 'Roma Tomato')
+        Product.objects.get(name='Spinach').delete()
+        for backend in (database_backend, python_backend):
+            with self.subTest(backend=type(backend).__name__):
+                self.assertEqual(self.names(backend.search(Product.objects.all(), 'tomato')), ['Roma Tomato'])
+                self.assertEqual(self.names(backend.search(Product.objects.all(), 'plum')), ['Cherry Plum'])
+
+    def test_scoped_search_ranks_within_the_scope(self):
+        other = self.create_shop(self.owner, name='Tomato Traders')
+        for i in range(5):
+            self.create_product(other, f'Tomato Tomato {i}', description='Tomato')
+        # The shop's matches rank below every other shop's, past the result cap
+        with mock.patch('sabji_market.search.MAX_RESULTS', 3), mock.patch('sabji_market.search.SCOPE_BATCH', 2):
+            results = python_backend.search(Product.objects.filter(shop=self.shop), 'tomato')
+            self.assertEqual(self.names(results), ['Cherry Tomato', 'Spinach'])
+            results = python_backend.search(Product.objects.all(), 'tomato')
+            self.assertEqual(len(results), 3)
+
+    @override_settings(SABJI_MARKET_SEARCH_BACKEND='python')
+    def test_shop_products_view_uses_configured_backend(self):
+        url = reverse('sabji_market:shop_products', args=[self.shop.id])
+        response = self.client.get(url, {'search': 'carr'})
+        self.assertEqual(self.names(response.context['products']), ['Carrot'])
+
+
+class ShopRatingTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.owner = self.create_user('owner')
+        self.shop = self.create_shop(self.owner)
+        self.customer = self.create_user()
+        Order.objects.create(
+            order_id='ORDREVIEW', customer=self.customer, shop=self.shop, customer_name='Customer',
+            customer_phone='8888888888', status='delivered', subtotal=10, total_amount=10,
+        )
+        self.client.force_login(self.customer)
+
+    def review(self, rating):
+        url = reverse('sabji_market:add_review', args=[self.shop.id])
+        return self.client.post(url, {'rating': rating, 'comment': 'Nice'})
+
+    def test_review_create_and_update_adjust_aggregates(self):
+        self.review(4)
+        self.shop.refresh_from_db()
+        self.assertEqual((self.shop.rating_sum, self.shop.review_count), (4, 1))
+        self.assertEqual(self.shop.rating_histogram, [0, 0, 0, 1, 0])
+
+        self.review(2)
+        self.shop.refresh_from_db()
+        self.assertEqual((self.shop.rating_sum, self.shop.review_count), (2, 1))
+        self.assertEqual(self.shop.rating_histogram, [0, 1, 0, 0, 0])
+        self.assertEqual(rebuild_ratings(fix=False), [])
+
+    def test_deleting_review_updates_aggregates(self):
+        self.review(5)
+        ShopReview.objects.get().delete()
+        self.shop.refresh_from_db()
+        self.assertEqual((self.shop.rating_sum, self.shop.review_count), (0, 0))
+        self.assertEqual(self.shop.rating_histogram, [0] * 5)
+
+    def test_status_toggle_keeps_a_concurrent_review(self):
+        def load_then_review(*args, **kwargs):
+            # The review lands between the toggle's read and its write
+            shop = get_object_or_404(*args, **kwargs)
+            record_review(shop, 5)
+            return shop
+
+        self.client.force_login(self.owner)
+        with mock.patch('sabji_market.views.get_object_or_404', side_effect=load_then_review):
+            self.client.post(reverse('sabji_market:toggle_shop_status', args=[self.shop.id]))
+        self.shop.refresh_from_db()
+        self.assertFalse(self.shop.is_open)
+        self.assertEqual((self.shop.rating_sum, self.shop.review_count), (5, 1))
+        self.assertEqual(self.shop.rating_histogram, [0, 0, 0, 0, 1])
+
+    def test_full_save_leaves_aggregates_alone(self):
+        stale = Shop.objects.get(pk=self.shop.pk)
+        record_review(self.shop, 4)
+        stale.name = 'Greener Grocers'
+        stale.save()
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.name, 'Greener Grocers')
+        self.assertEqual((self.shop.rating_sum, self.shop.review_count), (4, 1))
+
+    def test_rebuild_command_detects_and_fixes_drift(self):
+        self.review(3)
+        Shop.objects.filter(pk=self.shop.pk).update(rating_sum=40, rating_1_count=2)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_shop_ratings', '--check', stdout=StringIO())
+        out = StringIO()
+        call_command('rebuild_shop_ratings', stdout=out)
+        self.assertIn('rating_sum 40 -> 3', out.getvalue())
+        call_command('rebuild_shop_ratings', '--check', stdout=StringIO())
+
+    def test_shop_list_sorts_by_rating_without_review_join(self):
+        other = self.create_shop(self.owner, name='Top Shop', rating_sum=9, review_count=2)
+        Shop.objects.filter(pk=self.shop.pk).update(rating_sum=3, review_count=1)
+        self.create_shop(self.owner, name='Unrated')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('sabji_market:shop_list'), {'sort': 'rating'})
+        shops = list(response.context['shops'])
+        self.assertEqual([shop.name for shop in shops], ['Top Shop', 'Green Grocers', 'Unrated'])
+        self.assertEqual(shops[0], other)
+        shop_queries = [q['sql'] for q in queries if 'FROM "sabji_market_shop"' in q['sql']]
+        self.assertTrue(shop_queries)
+        self.assertFalse(any('sabji_market_shopreview' in sql for sql in shop_queries))
+
+
+class SalesRollupTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.owner = self.create_user('owner')
+        self.shop = self.create_shop(self.owner)
+        self.tomato = self.create_product(self.shop, 'Tomato', price='40.00')
+        self.onion = self.create_product(self.shop, 'Onion', price='30.00')
+        self.customer = self.create_user()
+        self.client.force_login(self.owner)
+
+    def place(self, **quantities):
+        cart = Cart.objects.create(user=self.customer)
+        for name, quantity in quantities.items():
+            CartItem.objects.create(cart=cart, product=getattr(self, name), quantity=quantity)
+        orders, timings = place_orders(self.customer, CartSummary(cart), 'Customer', '8888888888', 'pickup')
+        cart.delete()
+        return orders[0]
+
+    def set_status(self, order, status):
+        url = reverse('sabji_market:update_order_status', args=[order.id])
+        self.client.post(url, {'status': status, 'notes': ''})
+
+    def rollup_snapshot(self):
+        shops = sorted(ShopDailySales.objects.values_list(
+            'shop_id', 'date', 'revenue', 'order_count', 'units_sold', 'cancelled_count'
+        ))
+        products = sorted(ProductDailySales.objects.values_list(
+            'product_id', 'shop_id', 'date', 'revenue', 'order_count', 'units_sold'
+        ))
+        return shops, products
+
+    def test_delivery_and_cancellation_update_rollups(self):
+        first = self.place(tomato=2, onion=1)
+        second = self.place(tomato=1)
+        self.set_status(first, 'delivered')
+        self.set_status(second, 'cancelled')
+
+        day = ShopDailySales.objects.get(shop=self.shop)
+        self.assertEqual(day.revenue, first.total_amount)
+        self.assertEqual((day.order_count, day.units_sold, day.cancelled_count), (1, 3, 1))
+        tomato = ProductDailySales.objects.get(product=self.tomato)
+        self.assertEqual((tomato.revenue, tomato.units_sold, tomato.order_count), (Decimal('80.00'), 2, 1))
+
+        # Moving an order back out of delivered takes it off again
+        self.set_status(first, 'confirmed')
+        day.refresh_from_db()
+        self.assertEqual((day.revenue, day.order_count, day.units_sold), (Decimal('0.00'), 0, 0))
+        self.assertFalse(ProductDailySales.objects.filter(units_sold__gt=0).exists())
+
+    def test_unchanged_status_is_not_counted_twice(self):
+        order = self.place(onion=2)
+        self.set_status(order, 'delivered')
+        self.set_status(order, 'delivered')
+        self.assertEqual(ShopDailySales.objects.get().order_count, 1)
+
+    def test_concurrent_deliveries_are_counted_once(self):
+        order = self.place(onion=2)
+        validate = OrderStatusUpdateForm.is_valid
+
+        # Another request delivers the order after this one has loaded it
+        def deliver_elsewhere_first(form):
+            Order.objects.filter(pk=order.pk).update(status='delivered')
+            record_order_status(Order.objects.get(pk=order.pk), 'pending')
+            return validate(form)
+
+        with mock.patch.object(OrderStatusUpdateForm, 'is_valid', autospec=True, side_effect=deliver_elsewhere_first):
+            self.set_status(order, 'delivered')
+        day = ShopDailySales.objects.get()
+        self.assertEqual((day.order_count, day.units_sold), (1, 2))
+
+    def test_rebuild_matches_incremental_rollups(self):
+        for quantities, status in [({'tomato': 2}, 'delivered'), ({'onion': 3, 'tomato': 1}, 'delivered'),
+                                   ({'onion': 1}, 'cancelled'), ({'tomato': 4}, 'pending')]:
+            order = self.place(**quantities)
+            if status != 'pending':
+                self.set_status(order, status)
+        incremental = self.rollup_snapshot()
+
+        ShopDailySales.objects.update(revenue=0, order_count=99)
+        ProductDailySales.objects.all().delete()
+        self.assertEqual(rebuild_rollups([self.shop.pk], batch_size=1), (1, 2))
+        self.assertEqual(self.rollup_snapshot(), incremental)
+
+        out = StringIO()
+        call_command('rebuild_sales_rollups', '--shop', str(self.shop.pk), stdout=out)
+        self.assertIn('1 shop-day and 2 product-day rows', out.getvalue())
+        self.assertEqual(self.rollup_snapshot(), incremental)
+
+    def test_analytics_reads_rollups_only(self):
+        self.set_status(self.place(tomato=3), 'delivered')
+        url = reverse('sabji_market:shop_analytics', args=[self.shop.id])
+        self.client.get(url)
+        # Session, user, shop, daily series, top products
+        with assert_max_queries(5), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse(any('sabji_market_order' in q['sql'] for q in queries))
+        self.assertEqual(len(response.context['series']), 90)
+        self.assertEqual(response.context['total_units'], 3)
+        self.assertEqual(response.context['top_products'][0]['product__name'], 'Tomato')
+        self.assertContains(response, 'id="sales-series"')
+
+    def test_analytics_is_owner_only(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('sabji_market:shop_analytics', args=[self.shop.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ProductImportExportTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.owner = self.create_user('owner')
+        self.shop = self.create_shop(self.owner)
+        self.category = ProductCategory.objects.create(name='Leafy Greens')
+        self.tomato = self.create_product(self.shop, 'Tomato', price='40.00')
+        self.client.force_login(self.owner)
+        reference_cache.clear()
+
+    def upload(self, name, content, **extra):
+        url = reverse('sabji_market:import_products', args=[self.shop.id])
+        return self.client.post(url, {'file': SimpleUploadedFile(name, content.encode()), **extra})
+
+    def test_csv_import_creates_updates_and_reports_errors(self):
+        content = (
+            'name,category,price,discount_percentage,unit,stock_quantity,is_organic\n'
+            'Spinach,leafy greens,25.50,0,bunch,30,yes\n'
+            'Tomato,,45.00,5,kg,0,false\n'
+            'Okra,,not-a-price,0,kg,10,no\n'
+            'Kale,Fruit,60,0,kg,5,no\n'
+        )
+        data = self.upload('products.csv', content).json()
+        self.assertEqual((data['created'], data['updated'], data['error_count']), (1, 1, 2))
+        self.assertEqual([error['line'] for error in data['errors']], [4, 5])
+        self.assertIn('price', data['errors'][0]['errors'])
+        self.assertIn('category', data['errors'][1]['errors'])
+
+        spinach = Product.objects.get(name='Spinach')
+        self.assertEqual((spinach.shop, spinach.category, spinach.price), (self.shop, self.category, Decimal('25.50')))
+        self.assertTrue(spinach.is_organic)
+        self.tomato.refresh_from_db()
+        self.assertEqual((self.tomato.price, self.tomato.stock_quantity), (Decimal('45.00'), 0))
+        self.assertFalse(self.tomato.is_available)
+
+    def test_ndjson_rows_update_by_id_and_keep_missing_columns(self):
+        content = (
+            f'{{"id": {self.tomato.id}, "stock_quantity": 7}}\n'
+            '\n'
+            '[1, 2]\n'
+            '{"id": 999999, "price": "1.00"}\n'
+        )
+        data = self.upload('stock.ndjson', content).json()
+        self.assertEqual((data['created'], data['updated'], data['error_count']), (0, 1, 2))
+        self.tomato.refresh_from_db()
+        self.assertEqual((self.tomato.stock_quantity, self.tomato.price, self.tomato.name), (7, Decimal('40.00'), 'Tomato'))
+
+    def test_import_keeps_owner_unlisted_products_unlisted(self):
+        self.tomato.stock_quantity = 20
+        self.tomato.is_available = False
+        self.tomato.save()
+        onion = self.create_product(self.shop, 'Onion', stock_quantity=1)
+        reserve_stock({onion.pk: 1})
+
+        content = (
+            f'{{"id": {self.tomato.id}, "price": "42.00", "stock_quantity": 25}}\n'
+            f'{{"id": {onion.id}, "stock_quantity": 10}}\n'
+        )
+        self.assertEqual(self.upload('stock.ndjson', content).json()['updated'], 2)
+        self.tomato.refresh_from_db()
+        onion.refresh_from_db()
+        self.assertEqual((self.tomato.stock_quantity, self.tomato.is_available), (25, False))
+        self.assertEqual((onion.stock_quantity, onion.is_available, onion.sold_out), (10, True, False))
+
+    def test_import_queries_scale_with_batches_not_rows(self):
+        rows = ''.join(f'Item {i},,10.00,0,kg,{i},no\n' for i in range(120))
+        upload = SimpleUploadedFile('bulk.csv', ('name,category,price,discount_percentage,unit,stock_quantity,is_organic\n' + rows).encode())
+        category_lookup = 1
+        # Per batch: match existing, savepoint, insert, savepoint release
+        with assert_max_queries(category_lookup + 3 * 4):
+            result = import_products(self.shop, upload, batch_size=50)
+        self.assertEqual((result.created, result.error_count), (120, 0))
+        self.assertEqual(Product.objects.filter(shop=self.shop).count(), 121)
+
+    def test_export_streams_and_round_trips(self):
+        self.create_product(self.shop, 'Spinach', price='25.50', category=self.category, is_organic=True)
+        url = reverse('sabji_market:export_products', args=[self.shop.id])
+
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith('id,name,description,category,price'))
+        self.assertIn('Leafy Greens,25.50', content)
+
+        Product.objects.filter(shop=self.shop).update(price=1)
+        data = self.upload('export.csv', content).json()
+        self.assertEqual((data['updated'], data['error_count']), (2, 0))
+        self.assertEqual(Product.objects.get(name='Spinach').price, Decimal('25.50'))
+
+        response = self.client.get(url, {'format': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[1])['category'], 'Leafy Greens')
+
+    def test_export_reads_in_bounded_chunks(self):
+        for i in range(4):
+            self.create_product(self.shop, f'Item {i}')
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(export_rows(self.shop, chunk_size=2))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(all('LIMIT 2' in query['sql'] for query in queries))
+
+    def test_other_owners_cannot_import_or_export(self):
+        self.client.force_login(self.create_user('intruder'))
+        self.assertEqual(self.upload('products.csv', 'name\nX\n').status_code, 404)
+        response = self.client.get(reverse('sabji_market:export_products', args=[self.shop.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class BatchProductUpdateTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.owner = self.create_user('owner')
+        self.shop = self.create_shop(self.owner)
+        self.tomato = self.create_product(self.shop, 'Tomato', price='40.00')
+        self.onion = self.create_product(self.shop, 'Onion', price='30.00', stock_quantity=5)
+        self.url = reverse('sabji_market:batch_update_products', args=[self.shop.id])
+        self.client.force_login(self.owner)
+
+    def patch(self, patches):
+        return self.client.post(self.url, json.dumps(patches), content_type='application/json')
+
+    def test_patches_apply_and_return_effective_prices(self):
+        response = self.patch([
+            {'id': self.tomato.id, 'price': '36.00', 'discount_percentage': '12.5'},
+            {'id': self.onion.id, 'stock_quantity': 0},
+            {'id': self.tomato.id, 'stock_quantity': 8},
+        ])
+        self.assertEqual(response.status_code, 200)
+        tomato, onion = response.json()['products']
+        self.assertEqual((tomato['id'], tomato['effective_price'], tomato['stock_quantity']), (self.tomato.id, '31.50', 8))
+        self.assertEqual((onion['price'], onion['is_available']), ('30.00', False))
+
+        self.tomato.refresh_from_db()
+        self.assertEqual((self.tomato.price, self.tomato.discount_percentage), (Decimal('36.00'), Decimal('12.50')))
+        self.onion.refresh_from_db()
+        self.assertEqual((self.onion.stock_quantity, self.onion.is_available), (0, False))
+
+    def test_returned_effective_price_is_the_stored_one(self):
+        rng = random.Random(3)
+        products = [self.create_product(self.shop, f'Item {i}') for i in range(30)]
+        # The column rounds in SQL (floats on some backends); Decimal may land a paisa off
+        with mock.patch.object(Product, 'calculate_effective_price', side_effect=AssertionError('mirrored in Python')):
+            response = self.patch([
+                {'id': product.id, 'price': f'{rng.randint(1, 99999) / 100:.2f}', 'discount_percentage': f'{rng.randint(0, 9999) / 100:.2f}'}
+                for product in products
+            ])
+        returned = {result['id']: Decimal(result['effective_price']) for result in response.json()['products']}
+        stored = dict(Product.objects.filter(pk__in=returned).values_list('pk', 'effective_price'))
+        self.assertEqual(returned, stored)
+
+    def test_any_bad_patch_rejects_the_whole_batch(self):
+        other_shop = self.create_shop(self.create_user('other'), name='Other')
+        foreign = self.create_product(other_shop, 'Foreign')
+
+        response = self.patch([{'id': self.tomato.id, 'price': '1.00'}, {'id': self.onion.id, 'price': '-2'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['index'], 1)
+        self.assertIn('price', response.json()['errors'][0]['errors'])
+
+        response = self.patch([{'id': self.tomato.id, 'price': '1.00'}, {'id': foreign.id, 'price': '1.00'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.patch([{'id': self.tomato.id, 'colour': 'red'}]).status_code, 400)
+        self.assertEqual(self.patch({'patches': []}).status_code, 400)
+
+        self.tomato.refresh_from_db()
+        foreign.refresh_from_db()
+        self.assertEqual((self.tomato.price, foreign.price), (Decimal('40.00'), Decimal('40.00')))
+
+    def test_queries_do_not_grow_with_patches(self):
+        products = [self.create_product(self.shop, f'Item {i}') for i in range(50)]
+        self.patch([{'id': self.tomato.id, 'price': '1.00'}])
+        # Session, user, shop, savepoint, locked load, update, effective prices, release
+        with assert_max_queries(8):
+            response = self.patch([{'id': product.id, 'price': '12.00', 'stock_quantity': 3} for product in products])
+        self.assertEqual(len(response.json()['products']), 50)
+        self.assertEqual(Product.objects.filter(price=Decimal('12.00'), stock_quantity=3).count(), 50)
+
+    def test_other_owners_get_404(self):
+        self.client.force_login(self.create_user('intruder'))
+        self.assertEqual(self.patch([{'id': self.tomato.id, 'price': '1.00'}]).status_code, 404)
+
+    def test_benchmark_command_compares_paths(self):
+        out = StringIO()
+        call_command('benchmark_price_updates', '--products', '5', '--rounds', '1', stdout=out)
+        self.assertIn('faster', out.getvalue())
+        self.assertFalse(Shop.objects.filter(name='Price Benchmark').exists())
+
+
+class EffectivePriceTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.shop = self.create_shop(self.create_user('owner'))
+        self.tomato = self.create_product(self.shop, 'Tomato', price='40.00', discount='25.00')
+        self.onion = self.create_product(self.shop, 'Onion', price='34.00')
+        self.potato = self.create_product(self.shop, 'Potato', price='25.00', discount='12.50')
+
+    def stored(self, product):
+        return Product.objects.values_list('effective_price', flat=True).get(pk=product.pk)
+
+    def test_column_follows_every_write(self):
+        self.assertEqual(self.tomato.effective_price, Decimal('30.00'))
+        self.assertEqual(self.stored(self.potato), Decimal('21.88'))
+
+        self.tomato.discount_percentage = Decimal('10.00')
+        self.tomato.save()
+        self.assertEqual(self.stored(self.tomato), Decimal('36.00'))
+
+        Product.objects.filter(pk=self.onion.pk).update(discount_percentage=Decimal('50.00'))
+        self.assertEqual(self.stored(self.onion), Decimal('17.00'))
+
+        self.potato.price = Decimal('30.00')
+        Product.objects.bulk_update([self.potato], ['price'])
+        self.assertEqual(self.stored(self.potato), Decimal('26.25'))
+
+    def test_saved_instance_reports_the_new_price(self):
+        self.tomato.discount_percentage = Decimal('10.00')
+        self.tomato.save()
+        self.assertEqual(self.tomato.get_discounted_price(), Decimal('36.00'))
+
+        self.onion.price = Decimal('50.00')
+        self.onion.save(update_fields=['price'])
+        self.assertEqual(self.onion.get_discounted_price(), Decimal('50.00'))
+
+        with self.assertNumQueries(1):
+            self.potato.stock_quantity = 5
+            self.potato.save(update_fields=['stock_quantity'])
+
+    def test_shop_products_filter_and_sort_by_effective_price(self):
+        url = reverse('sabji_market:shop_products', args=[self.shop.id])
+        # Tomato lists at 40.00 but sells at 30.00
+        response = self.client.get(url, {'max_price': '31', 'sort': 'price'})
+        self.assertEqual([product.name for product in response.context['products']], ['Potato', 'Tomato'])
+
+        response = self.client.get(url, {'min_price': '25', 'sort': '-price'})
+        self.assertEqual([product.name for product in response.context['products']], ['Onion', 'Tomato'])
+        self.assertContains(response, '₹30.00')
+
+
+class FacetedSearchTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        owner = self.create_user('owner')
+        self.bhopal = self.create_shop(owner, 'Green Grocers')
+        self.indore = self.create_shop(owner, 'Fresh Farm', city='Indore', pincode='452001')
+        self.vegetables = ProductCategory.objects.create(name='Vegetables')
+        self.fruits = ProductCategory.objects.create(name='Fruits')
+        self.create_product(self.bhopal, 'Tomato', price='40.00', category=self.vegetables, is_organic=True)
+        self.create_product(self.bhopal, 'Onion', price='60.00', discount='50.00', category=self.vegetables)
+        self.create_product(self.bhopal, 'Mango', price='150.00', category=self.fruits, is_organic=True)
+        self.create_product(self.indore, 'Potato', price='30.00', category=self.vegetables)
+        self.create_product(self.indore, 'Apple', price='220.00', category=self.fruits)
+        self.create_product(self.indore, 'Okra', price='45.00', category=self.vegetables, is_available=False)
+        self.url = reverse('sabji_market:product_facets')
+
+    def counts(self, data, facet):
+        return {option['value']: option['count'] for option in data['facets'][facet]}
+
+    def test_counts_every_facet_from_one_grouped_query(self):
+        # Facet rows, the page, and category names for the reference cache
+        with assert_max_queries(3):
+            data = self.client.get(self.url).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(self.counts(data, 'category'), {self.fruits.pk: 2, self.vegetables.pk: 3})
+        self.assertEqual(self.counts(data, 'organic'), {'yes': 2, 'no': 3})
+        # Onion sells at 30.00, so it counts under 50 despite its list price
+        self.assertEqual(self.counts(data, 'price'), {'0-50': 3, '100-200': 1, '200-500': 1})
+        self.assertEqual(self.counts(data, 'city'), {'Bhopal': 3, 'Indore': 2})
+
+    def test_facet_counts_ignore_their_own_selection(self):
+        data = self.client.get(self.url, {'city': 'Bhopal', 'price': ['0-50', '100-200']}).json()
+        self.assertEqual(sorted(product['name'] for product in data['results']), ['Mango', 'Onion', 'Tomato'])
+        # Picking Indore as well would add Potato
+        self.assertEqual(self.counts(data, 'city'), {'Bhopal': 3, 'Indore': 1})
+        self.assertEqual(self.counts(data, 'price'), {'0-50': 2, '100-200': 1})
+        self.assertEqual(self.counts(data, 'organic'), {'yes': 2, 'no': 1})
+        self.assertTrue(all(option['selected'] for option in data['facets']['city'] if option['value'] == 'Bhopal'))
+
+    def test_search_and_shop_narrow_the_counted_set(self):
+        data = self.client.get(self.url, {'shop': self.indore.pk, 'sort': '-price'}).json()
+        self.assertEqual([product['name'] for product in data['results']], ['Apple', 'Potato'])
+        self.assertEqual(self.counts(data, 'city'), {'Indore': 2})
+
+        data = self.client.get(self.url, {'search': 'mango'}).json()
+        self.assertEqual([product['name'] for product in data['results']], ['Mango'])
+        self.assertEqual(self.counts(data, 'category'), {self.fruits.pk: 1})
+
+    def test_cached_counts_follow_product_writes(self):
+        self.client.get(self.url)
+        with assert_max_queries(1):
+            data = self.client.get(self.url, {'organic': 'yes'}).json()
+        self.assertEqual(self.counts(data, 'organic'), {'yes': 2, 'no': 3})
+
+        self.create_product(self.indore, 'Spinach', price='20.00', category=self.vegetables, is_organic=True)
+        data = self.client.get(self.url).json()
+        self.assertEqual(self.counts(data, 'organic'), {'yes': 3, 'no': 3})
+
+        # Bulk writes send no signals and invalidate on commit
+        mango = Product.objects.get(name='Mango')
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_patches(self.bhopal, [{'id': mango.pk, 'discount_percentage': '80.00'}])
+        data = self.client.get(self.url).json()
+        self.assertEqual(self.counts(data, 'price')['0-50'], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock({mango.pk: 100})
+        data = self.client.get(self.url).json()
+        self.assertEqual(self.counts(data, 'category'), {self.fruits.pk: 1, self.vegetables.pk: 4})
+
+    def test_invalid_selection_is_rejected(self):
+        response = self.client.get(self.url, {'price': 'cheap'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('price', response.json()['errors'])
+
+
+class PrefixIndexTests(TestCase):
+    def test_prefix_matches_rank_name_starts_and_shared_rows(self):
+        index = PrefixIndex()
+        index.load([
+            ('product', 1, 'Tomato', True),
+            ('product', 2, 'tomato', True),
+            ('product', 3, 'Cherry Tomato', True),
+            ('shop', 1, 'Tom & Co Vegetables', False),
+            ('product', 4, 'Onion', True),
+        ])
+        self.assertEqual(index.search('tom'), [
+            ('product', 'tomato', 'Tomato', 2),
+            ('shop', 1, 'Tom & Co Vegetables', 1),
+            ('product', 'cherry tomato', 'Cherry Tomato', 1),
+        ])
+        self.assertEqual(index.search('co veg', kinds=['shop']), [('shop', 1, 'Tom & Co Vegetables', 1)])
+        self.assertEqual(index.search('x'), [])
+
+    def test_incremental_updates_keep_suffixes_sorted(self):
+        index = PrefixIndex()
+        rng = random.Random(7)
+        words = ['ab', 'abc', 'b', 'ba', 'cab']
+        names = {}
+        with mock.patch('sabji_market.typeahead.CHUNK_SIZE', 4):
+            for step in range(400):
+                pk = rng.randint(1, 30)
+                if rng.random() < 0.7:
+                    names[pk] = ' '.join(rng.choices(words, k=rng.randint(1, 3)))
+                    index.add('shop', pk, names[pk])
+                else:
+                    names.pop(pk, None)
+                    index.remove('shop', pk)
+        suffixes = [index.text(code) for chunk in index.chunks for code in chunk]
+        self.assertEqual(suffixes, sorted(suffixes))
+        self.assertEqual(len(index), len(names))
+        expected = {pk for pk, name in names.items() if any(word.startswith('ca') for word in name.split())}
+        self.assertEqual({pk for kind, pk, label, rows in index.search('ca', limit=100)}, expected)
+        self.assertGreater(index.stats()['bytes'], 0)
+
+
+class SearchSuggestionTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        typeahead.reset()
+        self.shop = self.create_shop(self.create_user('owner'), 'Tomato Traders')
+        self.create_product(self.shop, 'Tomato')
+        self.url = reverse('sabji_market:search_suggestions')
+
+    def tearDown(self):
+        typeahead.reset()
+
+    def suggest(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        return [(item['kind'], item['label']) for item in response.json()['suggestions']]
+
+    def test_suggestions_follow_model_signals_without_queries(self):
+        self.assertEqual(self.suggest('tom'), [('product', 'Tomato'), ('shop', 'Tomato Traders')])
+
+        category = ProductCategory.objects.create(name='Tomatoes & Peppers')
+        self.create_product(self.shop, 'Cherry Tomato')
+        self.shop.status = 'suspended'
+        self.shop.save()
+        with assert_max_queries(0):
+            self.assertEqual(self.suggest('tom'), [
+                ('product', 'Tomato'), ('category', 'Tomatoes & Peppers'), ('product', 'Cherry Tomato'),
+            ])
+
+        category.delete()
+        response = self.client.get(self.url, {'q': 'tom', 'kind': 'product'})
+        self.assertEqual([item['label'] for item in response.json()['suggestions']], ['Tomato', 'Cherry Tomato'])
+        self.assertIsNone(response.json()['suggestions'][0]['url'])
+
+    def test_shop_suggestions_link_to_the_shop(self):
+        response = self.client.get(self.url, {'q': 'traders', 'kind': 'shop'})
+        self.assertEqual(
+            response.json()['suggestions'][0]['url'],
+            reverse('sabji_market:shop_products', args=[self.shop.pk]),
+        )
+
+
+class ImagePipelineTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        self.shop = self.create_shop(self.create_user('owner'))
+        self.product = self.create_product(self.shop)
+
+    def image_file(self, size=(1600, 1200), mode='RGB', format='JPEG'):
+        buffer = io.BytesIO()
+        Image.new(mode, size, (200, 60, 40, 128) if mode == 'RGBA' else (200, 60, 40)).save(buffer, format)
+        return ContentFile(buffer.getvalue())
+
+    def render(self, source='{% picture product.image "card" alt="Tomato" class="card-img-top" %}'):
+        return Template('{% load images %}' + source).render(Context({'product': self.product}))
+
+    def test_upload_builds_derivatives_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.image.save('tomato.jpg', self.image_file())
+        image_pipeline.drain()
+
+        name = self.product.image.name
+        self.assertTrue(image_pipeline.is_ready(name))
+        for size, longest in [('thumb', 160), ('card', 480), ('detail', 1200)]:
+            for fmt in ['webp', 'jpeg']:
+                with default_storage.open(derivative_name(name, size, fmt)) as handle:
+                    self.assertEqual(max(Image.open(handle).size), longest)
+
+        html = self.render()
+        self.assertIn(f'{default_storage.url(derivative_name(name, "card", "webp"))} 480w', html)
+        self.assertIn(f'src="{default_storage.url(derivative_name(name, "card", "jpeg"))}"', html)
+        self.assertIn('class="card-img-top"', html)
+
+    def test_missing_derivatives_are_built_on_first_request(self):
+        self.product.image.save('tomato.png', self.image_file(mode='RGBA', format='PNG'))
+        name = self.product.image.name
+        html = self.render()
+        lazy_url = reverse('image_derivative', args=['card', 'jpeg', name])
+        self.assertIn(f'src="{lazy_url}"', html)
+
+        response = self.client.get(lazy_url)
+        self.assertRedirects(response, default_storage.url(derivative_name(name, 'card', 'jpeg')), fetch_redirect_response=False)
+        with default_storage.open(derivative_name(name, 'card', 'jpeg')) as handle:
+            self.assertEqual(Image.open(handle).mode, 'RGB')
+        self.assertIn(default_storage.url(derivative_name(name, 'thumb', 'webp')), self.render())
+
+    def test_derivative_view_rejects_bad_requests(self):
+        self.product.image.save('tomato.jpg', self.image_file())
+        name = self.product.image.name
+        for args in [['huge', 'jpeg', name], ['card', 'gif', name], ['card', 'jpeg', '../secret.jpg'],
+                     ['card', 'jpeg', 'product_images/missing.jpg']]:
+            self.assertEqual(self.client.get(reverse('image_derivative', args=args)).status_code, 404)
+
+    def test_missing_image_renders_default(self):
+        html = self.render('{% picture product.image "thumb" alt="Tomato" default="/static/x.jpg" %}')
+        self.assertEqual(html, '<img src="/static/x.jpg" alt="Tomato" loading="lazy">')
+
+
+class ContentAddressedMediaTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.shop = self.create_shop(self.create_user('owner'))
+
+    def upload(self, product, content, name='photo.JPG'):
+        product.image.save(name, ContentFile(content))
+        return product.image.name
+
+    def stored(self):
+        return dict(StoredFile.objects.values_list('name', 'refcount'))
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.upload(self.create_product(self.shop, 'Tomato'), b'same bytes')
+        second = self.upload(self.create_product(self.shop, 'Onion'), b'same bytes', name='other.jpg')
+        other = self.upload(self.create_product(self.shop, 'Okra'), b'other bytes')
+
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^cas/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertNotEqual(first, other)
+        files = [name for root, dirs, names in os.walk(self.media_root) for name in names]
+        self.assertEqual(len(files), 2)
+        self.assertEqual(self.stored(), {first: 2, other: 1})
+
+    def test_replacing_and_deleting_rows_updates_refcounts(self):
+        tomato = self.create_product(self.shop, 'Tomato')
+        old = self.upload(tomato, b'old photo')
+        new = self.upload(tomato, b'new photo')
+        self.assertEqual(self.stored(), {old: 0, new: 1})
+
+        # A reload that does not touch the image leaves the counts alone
+        tomato = Product.objects.get(pk=tomato.pk)
+        tomato.price = Decimal('50.00')
+        tomato.save()
+        Product.objects.only('name').get(pk=tomato.pk).save()
+        self.assertEqual(self.stored(), {old: 0, new: 1})
+
+        tomato.delete()
+        self.assertEqual(self.stored(), {old: 0, new: 0})
+
+    def test_garbage_collection_keeps_referenced_and_recent_files(self):
+        kept = self.upload(self.create_product(self.shop, 'Tomato'), b'kept')
+        onion = self.create_product(self.shop, 'Onion')
+        dropped = self.upload(onion, b'dropped')
+        onion.delete()
+        stray = default_storage.save('stray.png', ContentFile(b'never referenced'))
+
+        self.assertEqual(collect_garbage(), (0, 0))
+        later = timezone.now() + timedelta(hours=2)
+        with mock.patch.object(default_storage, 'get_modified_time', return_value=timezone.now() - timedelta(hours=2)):
+            StoredFile.objects.update(updated_at=timezone.now() - timedelta(hours=2))
+            self.assertEqual(collect_garbage(dry_run=True, now=later)[0], 2)
+            self.assertEqual(collect_garbage(now=later), (2, len(b'dropped') + len(b'never referenced')))
+
+        self.assertTrue(default_storage.exists(kept))
+        self.assertFalse(default_storage.exists(dropped))
+        self.assertFalse(default_storage.exists(stray))
+        self.assertEqual(self.stored(), {kept: 1})
+
+    def test_recount_repairs_drift(self):
+        name = self.upload(self.create_product(self.shop, 'Tomato'), b'photo')
+        StoredFile.objects.all().delete()
+        self.assertEqual(rebuild_refcounts(), [(name, 0, 1)])
+        self.assertEqual(self.stored(), {name: 1})
+
+        StoredFile.objects.update(refcount=5)
+        out = StringIO()
+        call_command('collect_media_garbage', '--recount', stdout=out)
+        self.assertIn(f'{name}: refcount 5 -> 1', out.getvalue())
+        self.assertEqual(self.stored(), {name: 1})
+
+
+class NearbyShopsTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        shop_locator.reset()
+        self.addCleanup(shop_locator.reset)
+        self.owner = self.create_user('owner')
+
+    def test_pincode_lookup_falls_back_to_district(self):
+        self.assertEqual(pincodes.lookup('462001'), pincodes.centroids['462001'])
+        self.assertEqual(pincodes.lookup('462016'), pincodes.lookup('462001'))
+        self.assertIsNone(pincodes.lookup('999999'))
+
+    def test_saving_a_shop_locates_it(self):
+        shop = self.create_shop(self.owner)
+        self.assertEqual((shop.latitude, shop.longitude), pincodes.lookup('462001'))
+        shop.pincode = '999999'
+        shop.save()
+        self.assertEqual((shop.latitude, shop.longitude), (None, None))
+
+    def test_shop_moved_to_an_unknown_pincode_leaves_the_index(self):
+        shop = self.create_shop(self.owner)
+        lat, lon = pincodes.lookup('462001')
+        self.assertEqual([found.name for found in nearby_shops(lat, lon)], ['Green Grocers'])
+
+        shop.pincode = '999999'
+        shop.save()
+        self.assertEqual(nearby_shops(lat, lon), [])
+        shop.refresh_from_db()
+        self.assertIsNone(shop.latitude)
+
+    def test_grid_matches_full_scan(self):
+        rng = random.Random(7)
+        points = [(key, 23 + rng.uniform(-1, 1), 77 + rng.uniform(-1, 1)) for key in range(2000)]
+        index = GridIndex()
+        for key, lat, lon in points:
+            index.add(key, lat, lon)
+        for _ in range(20):
+            lat, lon = 23 + rng.uniform(-1, 1), 77 + rng.uniform(-1, 1)
+            expected = sorted(
+                (haversine_km(lat, lon, p_lat, p_lon), key) for key, p_lat, p_lon in points
+            )
+            expected = [key for distance, key in expected if distance <= 50][:10]
+            self.assertEqual([key for distance, key in index.nearest(lat, lon, 10)], expected)
+
+    def test_only_open_delivering_shops_are_listed_nearest_first(self):
+        bhopal = self.create_shop(self.owner, name='Bhopal')
+        self.create_shop(self.owner, name='Indore', pincode='452001')
+        self.create_shop(self.owner, name='Closed', is_open=False)
+        self.create_shop(self.owner, name='Pickup', is_delivery_available=False)
+        self.create_shop(self.owner, name='Pending', status='pending')
+        self.create_shop(self.owner, name='Mumbai', pincode='400001')
+
+        lat, lon = pincodes.lookup('462001')
+        self.assertEqual([shop.name for shop in nearby_shops(lat, lon, max_km=300)], ['Bhopal', 'Indore'])
+
+        # Signals keep a built index current
+        bhopal.is_open = False
+        bhopal.save()
+        self.assertEqual([shop.name for shop in nearby_shops(lat, lon, max_km=300)], ['Indore'])
+
+    def test_view_lists_shops_by_distance(self):
+        self.create_shop(self.owner, name='Noida', pincode='201301')
+        self.create_shop(self.owner, name='Delhi', pincode='110001')
+        self.create_shop(self.owner, name='Gurugram', pincode='122001')
+
+        response = self.client.get(reverse('sabji_market:nearby_shops'), {'pincode': '110002'})
+        self.assertEqual(response.status_code, 200)
+        shops = response.context['shops']
+        self.assertEqual([shop.name for shop in shops], ['Delhi', 'Noida', 'Gurugram'])
+        self.assertEqual(shops[0].distance_km, 0)
+        self.assertContains(response, '0.0 km')
+
+        response = self.client.get(reverse('sabji_market:nearby_shops'), {'pincode': '999999'})
+        self.assertTrue(response.context['unknown_pincode'])
+        self.assertEqual(response.context['shops'], [])
+
+
+class GuestCartTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.shop = self.create_shop(self.create_user('owner'))
+        self.tomato = self.create_product(self.shop, 'Tomato', price='40.00', discount='10.00', stock_quantity=10)
+        self.onion = self.create_product(self.shop, 'Onion', price='30.00', stock_quantity=5)
+
+    def add(self, product, quantity):
+        return self.client.post(reverse('sabji_market:add_to_cart', args=[product.pk]), {'quantity': quantity})
+
+    def writes(self, queries):
+        return [query['sql'] for query in queries if not query['sql'].startswith('SELECT')]
+
+    def test_guest_cart_costs_no_writes(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.add(self.tomato, 2)
+            self.add(self.tomato, 1)
+            self.add(self.onion, 6)
+            response = self.client.get(reverse('sabji_market:cart'))
+        self.assertEqual(self.writes(queries), [])
+        self.assertFalse(Cart.objects.exists())
+
+        summary = response.context['summary']
+        self.assertTrue(summary.is_guest)
+        self.assertEqual([(item.product.name, item.quantity) for item in summary], [('Tomato', 3)])
+        self.assertEqual(summary.total_price, Decimal('108.00'))
+        self.assertContains(response, reverse('sabji_market:remove_guest_cart_item', args=[self.tomato.pk]))
+
+        self.client.get(reverse('sabji_market:remove_guest_cart_item', args=[self.tomato.pk]))
+        self.assertFalse(self.client.get(reverse('sabji_market:cart')).context['summary'])
+
+    def test_tampered_cookie_reads_as_empty(self):
+        self.add(self.tomato, 2)
+        self.client.cookies['guest_cart'] = self.client.cookies['guest_cart'].value.replace(f'{self.tomato.pk}:2', f'{self.tomato.pk}:9')
+        self.assertFalse(self.client.get(reverse('sabji_market:cart')).context['summary'])
+
+    def test_login_merges_into_existing_cart(self):
+        user = self.create_user()
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.tomato, quantity=8)
+        self.add(self.tomato, 4)
+        self.add(self.onion, 2)
+
+        response = self.client.post(reverse('accounts:login'), {'username': 'customer', 'password': 'pass12345'})
+        self.assertEqual(response.cookies['guest_cart'].value, '')
+        quantities = dict(CartItem.objects.filter(cart=cart).values_list('product__name', 'quantity'))
+        # Summed, then capped at the stock
+        self.assertEqual(quantities, {'Tomato': 10, 'Onion': 2})
+
+        self.client.cookies.pop('guest_cart', None)
+        self.client.logout()
+        self.client.post(reverse('accounts:login'), {'username': 'customer', 'password': 'pass12345'})
+        self.assertEqual(CartItem.objects.get(cart=cart, product=self.onion).quantity, 2)
+
+    def test_merge_upserts_without_conflict_target(self):
+        user = self.create_user()
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.tomato, quantity=3)
+        self.add(self.tomato, 4)
+        self.add(self.onion, 2)
+        with self.untargeted_upserts():
+            response = self.client.post(reverse('accounts:login'), {'username': 'customer', 'password': 'pass12345'})
+        self.assertEqual(response.status_code, 302)
+        quantities = dict(CartItem.objects.filter(cart=cart).values_list('product__name', 'quantity'))
+        self.assertEqual(quantities, {'Tomato': 7, 'Onion': 2})
+
+    def test_registration_merges_guest_cart(self):
+        self.add(self.onion, 3)
+        self.client.post(reverse('accounts:register'), {
+            'username': 'newcomer', 'first_name': 'New', 'last_name': 'Comer', 'email': 'new@example.com',
+            'password1': 'Veggies-2024!', 'password2': 'Veggies-2024!',
+        })
+        cart = Cart.objects.get(user__username='newcomer')
+        self.assertEqual(list(cart.items.values_list('product__name', 'quantity')), [('Onion', 3)])
+
+    def test_cart_page_does_not_create_a_cart(self):
+        self.client.force_login(self.create_user())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('sabji_market:cart'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.writes(queries), [])
+        self.assertFalse(Cart.objects.exists())
+
+
+class BatchCartUpdateTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_login(self.user)
+        owner = self.create_user('owner')
+        self.shops = [self.create_shop(owner, name=f'Shop {i}') for i in range(2)]
+        self.products = [
+            self.create_product(self.shops[i % 2], f'Item {i}', price='10.00', discount='10.00', stock_quantity=20)
+            for i in range(6)
+        ]
+        self.cart = Cart.objects.create(user=self.user)
+        for product in self.products[:3]:
+            CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+
+    def post(self, version, operations):
+        return self.client.post(
+            reverse('sabji_market:batch_update_cart'),
+            json.dumps({'version': version, 'operations': operations}),
+            content_type='application/json',
+        )
+
+    def lines(self):
+        return dict(CartItem.objects.filter(cart=self.cart).values_list('product_id', 'quantity'))
+
+    def test_operations_apply_together_and_return_the_summary(self):
+        p = [product.pk for product in self.products]
+        operations = [
+            {'op': 'update', 'product': p[0], 'quantity': 5},
+            {'op': 'remove', 'product': p[1]},
+            {'op': 'update', 'product': p[2], 'quantity': 0},
+            {'op': 'add', 'product': p[3], 'quantity': 2},
+            {'op': 'add', 'product': p[3], 'quantity': 1},
+            {'op': 'add', 'product': p[4], 'quantity': 4},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(0, operations)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.lines(), {p[0]: 5, p[3]: 3, p[4]: 4})
+        # Constant however many operations: cart lock, lines, stock, delete, upsert, version, summary
+        self.assertLessEqual(len(queries), 12)
+
+        cart = response.json()['cart']
+        self.assertEqual(cart['version'], 1)
+        self.assertEqual(cart['item_count'], 12)
+        self.assertEqual(cart['total_price'], '108.00')
+        subtotals = {shop['name']: shop['subtotal'] for shop in cart['shops']}
+        self.assertEqual(subtotals, {'Shop 0': '81.00', 'Shop 1': '27.00'})
+        self.assertEqual(cart['shops'][0]['items'][0], {
+            'product': p[0], 'name': 'Item 0', 'quantity': 5, 'unit_price': '9.00', 'line_total': '45.00',
+        })
+
+    def test_operations_upsert_without_conflict_target(self):
+        p = [product.pk for product in self.products]
+        with self.untargeted_upserts():
+            response = self.post(0, [
+                {'op': 'update', 'product': p[0], 'quantity': 4},
+                {'op': 'add', 'product': p[5], 'quantity': 2},
+            ])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.lines(), {p[0]: 4, p[1]: 1, p[2]: 1, p[5]: 2})
+
+    def test_stale_version_is_rejected(self):
+        self.assertEqual(self.post(0, [{'op': 'add', 'product': self.products[0].pk, 'quantity': 1}]).status_code, 200)
+
+        # A second tab still holding version 0
+        response = self.post(0, [{'op': 'remove', 'product': self.products[0].pk}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['cart']['version'], 1)
+        self.assertEqual(self.lines()[self.products[0].pk], 2)
+
+    def test_one_bad_operation_rejects_the_batch(self):
+        response = self.post(0, [
+            {'op': 'remove', 'product': self.products[0].pk},
+            {'op': 'update', 'product': self.products[1].pk, 'quantity': 21},
+            {'op': 'fold', 'product': self.products[2].pk},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [2])
+
+        response = self.post(0, [
+            {'op': 'remove', 'product': self.products[0].pk},
+            {'op': 'update', 'product': self.products[1].pk, 'quantity': 21},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['index'], 1)
+        self.assertEqual(len(self.lines()), 3)
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).version, 0)
+
+    def test_other_cart_changes_bump_the_version(self):
+        self.client.post(reverse('sabji_market:add_to_cart', args=[self.products[4].pk]), {'quantity': 1})
+        item = CartItem.objects.get(cart=self.cart, product=self.products[0])
+        self.client.get(reverse('sabji_market:remove_cart_item', args=[item.pk]))
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).version, 2)
+
+        response = self.client.get(reverse('sabji_market:batch_update_cart'))
+        self.assertEqual(response.json()['cart']['version'], 2)
+        self.assertEqual(response.json()['cart']['line_count'], 3)
+
+
+class QueryPlanTests(TestCase):
+    def test_view_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('All view queries use an index', out.getvalue())
+
+    def test_full_scan_detection(self):
+        sqlite_plan = '3 0 0 SCAN sabji_market_product\n5 0 0 SCAN sabji_market_order USING INDEX order_shop_created_idx'
+        self.assertEqual(full_scan_tables(sqlite_plan, 'sqlite'), {'sabji_market_product'})
+        # As QuerySet.explain(format='JSON') returns it from MySQL 8
+        mysql_plan = json.dumps({
+            'query_block': {
+                'select_id': 1,
+                'cost_info': {'query_cost': '3.75'},
+                'ordering_operation': {
+                    'using_filesort': True,
+                    'nested_loop': [
+                        {'table': {
+                            'table_name': 'sabji_market_shop', 'access_type': 'ALL',
+                            'rows_examined_per_scan': 10, 'attached_condition': "(`status` = 'active')",
+                        }},
+                        {'table': {
+                            'table_name': 'sabji_market_order', 'access_type': 'ref',
+                            'key': 'order_shop_created_idx', 'used_key_parts': ['shop_id'],
+                        }},
+                    ],
+                },
+            },
+        }, indent=2)
+        self.assertEqual(full_scan_tables(mysql_plan, 'mysql'), {'sabji_market_shop'})
+
+    def test_mysql_plans_are_requested_as_json(self):
+        plan = json.dumps({'query_block': {'table': {'table_name': 'sabji_market_shop', 'access_type': 'index'}}})
+        with mock.patch.object(connection, 'vendor', 'mysql'), \
+                mock.patch('django.db.models.query.QuerySet.explain', autospec=True, return_value=plan) as explain:
+            call_command('check_query_plans', stdout=StringIO())
+        self.assertTrue(explain.call_args_list)
+        self.assertTrue(all(call.kwargs == {'format': 'JSON'} for call in explain.call_args_list))
+
+
+class CursorPaginationTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.shop = self.create_shop(self.create_user('owner'))
+        for i in range(25):
+            Order.objects.create(
+                order_id=f'ORD{i:08d}', customer=self.user, shop=self.shop, customer_name='Customer',
+                customer_phone='8888888888', subtotal=Decimal('10.00'), total_amount=Decimal('10.00'),
+            )
+        # Ties on created_at must be broken by id
+        Order.objects.filter(order_id__lt='ORD00000010').update(created_at=Order.objects.get(order_id='ORD00000010').created_at)
+        self.expected = list(Order.objects.order_by('-created_at', '-id').values_list('order_id', flat=True))
+
+    def ids(self, page):
+        return [order.order_id for order in page]
+
+    def test_walk_forward_and_back(self):
+        paginator = CursorPaginator(Order.objects.all(), 10)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+
+        self.assertEqual(self.ids(first) + self.ids(second) + self.ids(third), self.expected)
+        self.assertFalse(first.has_previous())
+        self.assertTrue(second.has_previous() and second.has_next())
+        self.assertFalse(third.has_next())
+        self.assertEqual(third.next_cursor, '')
+
+        back = paginator.get_page(third.previous_cursor)
+        self.assertEqual(self.ids(back), self.ids(second))
+        self.assertEqual(self.ids(paginator.get_page(back.previous_cursor)), self.ids(first))
+        self.assertFalse(paginator.get_page(back.previous_cursor).has_previous())
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        paginator = CursorPaginator(Order.objects.all(), 10)
+        cursor = paginator.get_page().next_cursor
+        page = paginator.get_page(cursor[:-2] + 'xx')
+        self.assertEqual(self.ids(page), self.expected[:10])
+
+    def test_pages_skip_count_query(self):
+        paginator = CursorPaginator(Order.objects.all(), 10)
+        cursor = paginator.get_page().next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(paginator.get_page(cursor)), 10)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT', queries[0]['sql'])
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+
+    def test_my_orders_links_next_page(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('sabji_market:my_orders'))
+        page = response.context['orders']
+        self.assertEqual(self.ids(page), self.expected[:10])
+        self.assertContains(response, '?' + urlencode({'cursor': page.next_cursor}))
+
+        response = self.client.get(reverse('sabji_market:my_orders'), {'cursor': page.next_cursor})
+        self.assertEqual(self.ids(response.context['orders']), self.expected[10:20])
+
+
+class QueryBudgetTests(MarketTestMixin, TestCase):
+    """Every list view runs a constant number of queries however many rows it shows"""
+
+    SIZES = (1, 10, 100)
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.owner = self.create_user('owner')
+        self.shop_category = ShopCategory.objects.create(name='Vegetables')
+        self.product_category = ProductCategory.objects.create(name='Leafy')
+        self.shop = self.create_shop(self.owner, category=self.shop_category)
+        self.client.force_login(self.user)
+        reference_cache.clear()
+
+    def seed(self, count):
+        """Grow every listed table to ``count`` rows"""
+        for i in range(Shop.objects.count(), count):
+            self.create_shop(self.owner, name=f'Shop {i}', category=self.shop_category)
+        Product.objects.bulk_create(
+            Product(shop=self.shop, category=self.product_category, name=f'Item {i}', price=Decimal('10.00'), stock_quantity=10)
+            for i in range(Product.objects.count(), count)
+        )
+        product = Product.objects.first()
+        for i in range(Order.objects.count(), count):
+            order = Order.objects.create(
+                order_id=f'ORD{i:08d}', customer=self.user, shop=self.shop, customer_name='Customer',
+                customer_phone='8888888888', subtotal=Decimal('20.00'), total_amount=Decimal('20.00'),
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, quantity=1, price=Decimal('10.00')) for _ in range(2)
+            )
+        reviewers = User.objects.bulk_create(
+            User(username=f'reviewer{i}') for i in range(ShopReview.objects.count(), count)
+        )
+        ShopReview.objects.bulk_create(ShopReview(shop=self.shop, customer=reviewer, rating=4) for reviewer in reviewers)
+
+    def assert_view_budget(self, budget, url):
+        # Measure the steady state, once reference data is cached
+        self.client.get(url)
+        for size in self.SIZES:
+            self.seed(size)
+            with assert_max_queries(budget):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_home(self):
+        self.assert_view_budget(3, reverse('sabji_market:home'))
+
+    # Pages that answer conditional GETs spend one more query on their validators
+
+    def test_shop_list(self):
+        self.assert_view_budget(4, reverse('sabji_market:shop_list'))
+
+    def test_shop_products(self):
+        self.assert_view_budget(6, reverse('sabji_market:shop_products', args=[self.shop.id]))
+
+    def test_products_by_category(self):
+        self.assert_view_budget(5, reverse('sabji_market:products_by_category', args=[self.product_category.id]))
+
+    def test_product_categories(self):
+        self.assert_view_budget(2, reverse('sabji_market:product_categories'))
+
+    def test_my_orders(self):
+        self.assert_view_budget(4, reverse('sabji_market:my_orders'))
+
+    def test_shop_dashboard(self):
+        self.client.force_login(self.owner)
+        self.assert_view_budget(2, reverse('sabji_market:shop_dashboard'))
+
+    def test_budget_failure_lists_queries(self):
+        with self.assertRaisesMessage(AssertionError, '2 queries executed, 1 allowed'):
+            with assert_max_queries(1):
+                Shop.objects.count()
+                Product.objects.count()
+
+
+class ReferenceCacheTests(TestCase):
+    def setUp(self):
+        reference_cache.clear()
+        self.cache = ReferenceCache()
+        self.fruit = ShopCategory.objects.create(name='Fruit')
+
+    def test_lookups_are_cached_until_a_write(self):
+        queryset = ShopCategory.objects.order_by('name')
+        with self.assertNumQueries(1):
+            self.cache.get_list(queryset)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get_list(queryset), (self.fruit,))
+
+        ShopCategory.objects.create(name='Greens')
+        with self.assertNumQueries(1):
+            names = [category.name for category in self.cache.get_list(queryset)]
+        self.assertEqual(names, ['Fruit', 'Greens'])
+
+        self.fruit.delete()
+        self.assertEqual([category.name for category in self.cache.get_list(queryset)], ['Greens'])
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 3)
+
+    def test_other_processes_share_lists_and_invalidations(self):
+        other = ReferenceCache()
+        self.cache.get_list(ShopCategory.objects.all())
+        with self.assertNumQueries(0):
+            other.get_list(ShopCategory.objects.all())
+        self.assertEqual(other.stats()['shared_hits'], 1)
+
+        self.cache.bump(ShopCategory)
+        with self.assertNumQueries(1):
+            other.get_list(ShopCategory.objects.all())
+
+    def test_writes_bump_versions_before_any_read(self):
+        fresh = ReferenceCache()
+        versions = {model: fresh.get_version(model) for model in (ShopCategory, ProductCategory)}
+        ShopCategory.objects.create(name='Greens')
+        ProductCategory.objects.create(name='Leafy')
+        for model, version in versions.items():
+            self.assertNotEqual(fresh.get_version(model), version, model)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ReferenceCache(maxsize=1)
+        cache.get_list(ShopCategory.objects.all())
+        cache.get_list(ProductCategory.objects.all())
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['size'], 1)
+
+    def test_search_form_validates_from_cache(self):
+        ShopSearchForm({'category': self.fruit.pk}).is_valid()
+        with self.assertNumQueries(0):
+            form = ShopSearchForm({'category': self.fruit.pk})
+            self.assertTrue(form.is_valid())
+            self.assertIn(self.fruit.name, str(form['category']))
+        self.assertEqual(form.cleaned_data['category'], self.fruit)
+        self.assertFalse(ShopSearchForm({'category': self.fruit.pk + 100}).is_valid())
+
+    def test_stats_endpoint_is_staff_only(self):
+        url = reverse('cache_stats')
+        self.client.force_login(User.objects.create_user(username='customer', password='pass12345'))
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_user(username='staff', password='pass12345', is_staff=True))
+        stats = self.client.get(url).json()
+        self.assertEqual(set(stats['reference']), {'hits', 'shared_hits', 'misses', 'evictions', 'size', 'maxsize', 'hit_ratio'})
+        self.assertEqual(set(stats['page']), {'hits', 'misses', 'bypasses', 'hit_ratio'})
+
+
+class PageCacheTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        page_cache.reset_stats()
+        self.owner = self.create_user('owner')
+        self.shop = self.create_shop(self.owner, name='Green Grocers')
+
+    def test_anonymous_page_is_served_from_cache_until_a_write(self):
+        url = reverse('sabji_market:home')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        self.assertIn('Cookie', second['Vary'])
+
+        self.create_shop(self.owner, name='Fresh Farm')
+        self.assertContains(self.client.get(url), 'Fresh Farm')
+        self.assertEqual(page_cache.stats()['hits'], 1)
+        self.assertEqual(page_cache.stats()['misses'], 2)
+
+    def test_rating_update_retires_cached_shop_list(self):
+        url = reverse('sabji_market:shop_list')
+        self.assertContains(self.client.get(url), '(0 reviews)')
+        record_review(self.shop, 4)
+        self.assertContains(self.client.get(url), '(1 review)')
+
+    def test_filtered_and_signed_in_requests_bypass_the_page_cache(self):
+        url = reverse('sabji_market:shop_list')
+        self.client.get(url)
+        self.client.get(url, {'search': 'green'})
+        self.client.force_login(self.create_user())
+        response = self.client.get(url)
+        self.assertContains(response, 'customer')
+        self.assertEqual(page_cache.stats()['bypasses'], 2)
+
+    def test_fragments_skip_queries_for_signed_in_users(self):
+        self.client.force_login(self.create_user())
+        url = reverse('sabji_market:home')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, 'Green Grocers')
+        self.assertFalse(any('sabji_market_shop' in query['sql'] for query in queries))
+
+    def test_warm_up_command_fills_page_and_fragment_caches(self):
+        call_command('warm_page_cache', stdout=StringIO())
+        for name in ('sabji_market:home', 'sabji_market:product_categories', 'sabji_market:shop_list'):
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+
+        self.client.force_login(self.create_user())
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('sabji_market:home'))
+        self.assertFalse(any('sabji_market_shop' in query['sql'] for query in queries))
+
+    def test_cached_page_answers_conditional_requests(self):
+        url = reverse('sabji_market:shop_list')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class ConditionalGetTests(MarketTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache.clear()
+        self.owner = self.create_user('owner')
+        self.shop = self.create_shop(self.owner)
+        self.tomato = self.create_product(self.shop, 'Tomato')
+        self.url = reverse('sabji_market:shop_products', args=[self.shop.id])
+
+    def revalidate(self, url, response, **headers):
+        """Conditional GET against ``response``'s validators; at most one query beyond signing in"""
+        headers.setdefault('HTTP_IF_NONE_MATCH', response['ETag'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **headers)
+        own = [query['sql'] for query in queries if 'django_session' not in query['sql'] and '"accounts_' not in query['sql']]
+        if response.status_code == 304:
+            self.assertLessEqual(len(own), 1, own)
+        return response
+
+    def test_unchanged_page_is_not_modified(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.revalidate(self.url, first, HTTP_IF_NONE_MATCH='', HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+        # Another page, query string or user gets its own ETag
+        self.assertEqual(self.revalidate(self.url + '?search=tom', first).status_code, 200)
+        self.client.force_login(self.create_user())
+        self.assertEqual(self.revalidate(self.url, first).status_code, 200)
+
+    def test_writes_change_the_validators(self):
+        first = self.client.get(self.url)
+        self.tomato.price = Decimal('45.00')
+        self.tomato.save()
+        second = self.revalidate(self.url, first)
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+        # update() and bulk writes stamp updated_at too
+        with transaction.atomic():
+            reserve_stock({self.tomato.pk: 1})
+        third = self.revalidate(self.url, second)
+        self.assertEqual(third.status_code, 200)
+
+        # Deletions leave the maximum alone but change the count
+        Product.objects.filter(pk=self.create_product(self.shop, 'Onion').pk).update(updated_at=timezone.now() - timedelta(days=1))
+        fourth = self.client.get(self.url)
+        Product.objects.filter(name='Onion').delete()
+        self.assertEqual(self.revalidate(self.url, fourth).status_code, 200)
+
+    def test_pending_messages_skip_the_check(self):
+        first = self.client.get(self.url)
+        self.client.post(reverse('sabji_market:add_to_cart', args=[self.tomato.pk]), {'quantity': 1})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Tomato added to cart!')
+
+
+class IdGeneratorTests(TestCase):
+    def test_ids_are_unique_and_sort_in_creation_order(self):
+        generator = IdGenerator(node=7)
+        ids = [generator.next_id('ORD') for _ in range(10000)]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(sorted(ids), ids)
+        self.assertTrue(all(len(value) == 16 for value in ids))
+
+    def test_stalled_or_backward_clock_stays_monotonic(self):
+        now = [1750000000.0]
+        generator = IdGenerator(node=1, clock=lambda: now[0])
+        ids = [generator.next_int() for _ in range(5000)]
+        now[0] -= 5
+        ids += [generator.next_int() for _ in range(10)]
+        self.assertEqual(sorted(set(ids)), ids)
+
+    def test_nodes_keep_concurrent_ids_apart(self):
+        clock = lambda: 1750000000.0
+        first, second = IdGenerator(node=1, clock=clock), IdGenerator(node=2, clock=clock)
+        self.assertNotEqual(first.next_id(), second.next_id())
+
+    def test_parse_id_recovers_time_and_node(self):
+        created_at, node, sequence = parse_id(IdGenerator(node=5, clock=lambda: 1750000000.25).next_id('TXN'), 'TXN')
+        self.assertEqual(created_at.timestamp(), 1750000000.25)
+        self.assertEqual((node, sequence), (5, 0))
+
+    def test_nodes_are_pinned_or_leased_from_a_shared_cache(self):
+        with self.settings(ID_GENERATOR_NODE=42):
+            self.assertEqual(IdGenerator().node, 42)
+        with self.settings(ID_GENERATOR_NODE=None):
+            # Every process would lease the same nodes from its own memory
+            with self.assertRaises(ImproperlyConfigured):
+                IdGenerator().node
+
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+        with self.settings(ID_GENERATOR_NODE=None, CACHES=shared):
+            first, second = IdGenerator(), IdGenerator()
+            self.assertNotEqual(first.node, second.node)
+            with mock.patch('one_stop_booking_hub.ids.MAX_NODE', 3):
+                self.assertEqual(len({lease_node('third'), lease_node('fourth')} | {first.node, second.node}), 4)
+                with self.assertRaises(ImproperlyConfigured):
+                    lease_node('fifth')
+
+            # A lease that lapsed while the process idled is not trusted again
+            lapsed = first.node
+            caches['default'].set(lease_key(lapsed), 'another process')
+            first.leased_at -= LEASE_TIMEOUT
+            node = first.node
+            self.assertNotIn(node, (lapsed, second.node))
+            self.assertEqual(caches['default'].get(lease_key(node)), first.token)
+
+    def test_system_check_reports_a_process_without_a_node(self):
+        with self.settings(ID_GENERATOR_NODE=None):
+            self.assertEqual([error.id for error in check_node_source(None)], ['ids.E002'])
+            with self.assertRaises(SystemCheckError):
+                call_command('check', stdout=StringIO(), stderr=StringIO())
+        with self.settings(ID_GENERATOR_NODE='4096'):
+            self.assertEqual([error.id for error in check_node_source(None)], ['ids.E001'])
+        with self.settings(ID_GENERATOR_NODE='3'):
+            self.assertEqual(check_node_source(None), [])
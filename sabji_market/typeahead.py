@@ -0,0 +1,324 @@
+# sabji_market/typeahead.py
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from itertools import islice
+
+from django.urls import reverse
+
+from .models import Product, ProductCategory, Shop
+from .search import tokenize
+
+# Model to (kind, the rows suggested, whether rows of the same name share one suggestion)
+SOURCES = {
+    Product: ('product', {'is_available': True}, True),
+    Shop: ('shop', {'status': 'active'}, False),
+    ProductCategory: ('category', {'is_active': True}, False),
+}
+
+KINDS = tuple(kind for kind, filters, shared in SOURCES.values())
+
+# Words of a name a suffix may start at; queries rarely begin further in
+MAX_SUFFIXES = 4
+
+# Suffix codes pack the character offset into 8 bits, and names are at most 200 characters
+MAX_NAME = 255
+
+# Sorted chunks are split when they reach twice this many codes
+CHUNK_SIZE = 1024
+
+# Matches examined per lookup before ranking, which bounds one-letter queries
+SCAN_LIMIT = 256
+
+# Other processes' writes, and bulk writes that send no signals, reach this
+# process's index by rebuilding it
+REBUILD_INTERVAL = 10 * 60
+
+
+def normalize(text):
+    return ' '.join(tokenize(text))[:MAX_NAME]
+
+
+class PrefixIndex:
+    """Name suffixes in sorted order, answering prefix queries by binary search.
+
+    Each name is indexed from the start of its first few words, so "tom"
+    finds "Cherry Tomato". A suffix is not a string of its own but an
+    8-byte code, ``slot << 8 | offset``, into the normalized name of a
+    suggestion slot. The codes sit in sorted chunks of about CHUNK_SIZE,
+    as in a B-tree leaf level: a lookup bisects the chunk heads and then one
+    chunk, and an insert or removal shifts a single chunk instead of the
+    whole array. Rows of a shared kind with the same name (one product sold
+    by many shops) are one suggestion carrying a row count.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        # Suffix text of each chunk's first code
+        self.heads = []
+        # Per slot; a freed slot holds None until reused
+        self.kinds = []
+        self.identities = []
+        self.labels = []
+        self.names = []
+        self.rows = []
+        self.free = []
+        # kind -> {pk: slot}, and for shared kinds kind -> {name: slot}
+        self.documents = defaultdict(dict)
+        self.shared = defaultdict(dict)
+
+    def __len__(self):
+        return sum(len(documents) for documents in self.documents.values())
+
+    def text(self, code):
+        return self.names[code >> 8][code & 0xFF:]
+
+    def codes(self, slot):
+        name = self.names[slot]
+        offsets = [0] + [position + 1 for position, char in enumerate(name) if char == ' ']
+        return [slot << 8 | offset for offset in offsets[:MAX_SUFFIXES]]
+
+    def _attach(self, kind, pk, label, shared):
+        """Record the row; returns its slot if that is a new suggestion whose codes need indexing"""
+        name = normalize(label)
+        if not name:
+            return None
+        slot = self.shared[kind].get(name) if shared else None
+        if slot is not None:
+            self.rows[slot] += 1
+            self.documents[kind][pk] = slot
+            return None
+        # Share the string when the label is already normalized
+        label = name if label == name else label
+        values = (kind, None if shared else pk, label, name, 1)
+        if self.free:
+            slot = self.free.pop()
+            for column, value in zip((self.kinds, self.identities, self.labels, self.names, self.rows), values):
+                column[slot] = value
+        else:
+            slot = len(self.names)
+            for column, value in zip((self.kinds, self.identities, self.labels, self.names, self.rows), values):
+                column.append(value)
+        if shared:
+            self.shared[kind][name] = slot
+        self.documents[kind][pk] = slot
+        return slot
+
+    def _locate(self, text):
+        """``(chunk, position)`` of the first code whose suffix is not below ``text``"""
+        index = max(bisect_left(self.heads, text) - 1, 0)
+        position = bisect_left(self.chunks[index], text, key=self.text)
+        if position == len(self.chunks[index]) and index + 1 < len(self.chunks):
+            return index + 1, 0
+        return index, position
+
+    def _insert(self, code):
+        text = self.text(code)
+        if not self.chunks:
+            self.chunks.append(array('Q', [code]))
+            self.heads.append(text)
+            return
+        index = max(bisect_right(self.heads, text) - 1, 0)
+        chunk = self.chunks[index]
+        position = bisect_right(chunk, text, key=self.text)
+        chunk.insert(position, code)
+        if position == 0:
+            self.heads[index] = text
+        if len(chunk) >= 2 * CHUNK_SIZE:
+            self.chunks[index:index + 1] = [chunk[:CHUNK_SIZE], chunk[CHUNK_SIZE:]]
+            self.heads.insert(index + 1, self.text(chunk[CHUNK_SIZE]))
+
+    def _delete(self, code):
+        index, position = self._locate(self.text(code))
+        while self.chunks[index][position] != code:
+            position += 1
+            if position == len(self.chunks[index]):
+                index, position = index + 1, 0
+        chunk = self.chunks[index]
+        del chunk[position]
+        if not chunk:
+            del self.chunks[index]
+            del self.heads[index]
+            return
+        if position == 0:
+            self.heads[index] = self.text(chunk[0])
+        # Fold a shrunken chunk into its successor so removals cannot fragment the index
+        if len(chunk) < CHUNK_SIZE // 2 and index + 1 < len(self.chunks):
+            if len(chunk) + len(self.chunks[index + 1]) < 2 * CHUNK_SIZE:
+                chunk.extend(self.chunks.pop(index + 1))
+                del self.heads[index + 1]
+
+    def add(self, kind, pk, label, shared=False):
+        self.remove(kind, pk)
+        slot = self._attach(kind, pk, label, shared)
+        if slot is not None:
+            for code in self.codes(slot):
+                self._insert(code)
+
+    def load(self, rows):
+        """Fill an empty index from ``(kind, pk, label, shared)`` rows with a single sort"""
+        codes = []
+        for kind, pk, label, shared in rows:
+            slot = self._attach(kind, pk, label, shared)
+            if slot is not None:
+                codes.extend(self.codes(slot))
+        codes.sort(key=self.text)
+        self.chunks = [array('Q', codes[start:start + CHUNK_SIZE]) for start in range(0, len(codes), CHUNK_SIZE)]
+        self.heads = [self.text(chunk[0]) for chunk in self.chunks]
+
+    def remove(self, kind, pk):
+        slot = self.documents[kind].pop(pk, None)
+        if slot is None:
+            return
+        self.rows[slot] -= 1
+        if self.rows[slot]:
+            return
+        for code in self.codes(slot):
+            self._delete(code)
+        if self.identities[slot] is None:
+            del self.shared[kind][self.names[slot]]
+        self.kinds[slot] = self.identities[slot] = self.labels[slot] = self.names[slot] = None
+        self.free.append(slot)
+
+    def matches(self, prefix):
+        """``(slot, offset)`` of every suffix starting with ``prefix``, in order"""
+        if not self.chunks:
+            return
+        index, position = self._locate(prefix)
+        names = self.names
+        for chunk in self.chunks[index:]:
+            for code in chunk[position:]:
+                slot, offset = code >> 8, code & 0xFF
+                if not names[slot].startswith(prefix, offset):
+                    return
+                yield slot, offset
+            position = 0
+
+    def search(self, query, limit=8, kinds=None):
+        """Up to ``limit`` ``(kind, pk or name, label, rows)``, names starting with the query first"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        ranked = {}
+        for slot, offset in islice(self.matches(prefix), SCAN_LIMIT):
+            if kinds is None or self.kinds[slot] in kinds:
+                name = self.names[slot]
+                rank = (offset != 0, -self.rows[slot], len(name), name)
+                if slot not in ranked or rank < ranked[slot]:
+                    ranked[slot] = rank
+        best = sorted(ranked, key=ranked.__getitem__)[:limit]
+        return [(self.kinds[slot], self.identity(slot), self.labels[slot], self.rows[slot]) for slot in best]
+
+    def identity(self, slot):
+        # Shared suggestions are known by their name, others by their row's pk
+        identity = self.identities[slot]
+        return self.names[slot] if identity is None else identity
+
+    def memory_bytes(self):
+        """Approximate bytes held by the index: containers, strings and boxed integers"""
+        size = sum(sys.getsizeof(chunk) for chunk in self.chunks) + sys.getsizeof(self.chunks)
+        size += sys.getsizeof(self.heads) + sum(sys.getsizeof(head) for head in self.heads)
+        for column in (self.kinds, self.identities, self.labels, self.names, self.rows, self.free):
+            size += sys.getsizeof(column)
+        for label, name, identity in zip(self.labels, self.names, self.identities):
+            if name is not None:
+                size += sys.getsizeof(name) + (0 if label is name else sys.getsizeof(label))
+                size += 0 if identity is None else sys.getsizeof(identity)
+        for mapping in (*self.documents.values(), *self.shared.values()):
+            # Keys and slot numbers are boxed integers; shared names are counted above
+            size += sys.getsizeof(mapping) + sum(sys.getsizeof(key) for key in mapping if isinstance(key, int))
+            size += sum(sys.getsizeof(slot) for slot in mapping.values() if slot > 256)
+        return size
+
+    def stats(self):
+        return {
+            'rows': len(self),
+            'suggestions': len(self.names) - len(self.free),
+            'suffixes': sum(len(chunk) for chunk in self.chunks),
+            'chunks': len(self.chunks),
+            'bytes': self.memory_bytes(),
+        }
+
+
+class Typeahead:
+    """In-process PrefixIndex over product, shop and category names.
+
+    Built lazily, kept current by save/delete signals in this process and
+    rebuilt every REBUILD_INTERVAL to pick up changes made elsewhere.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.built_at = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def is_listed(instance):
+        kind, filters, shared = SOURCES[type(instance)]
+        return all(getattr(instance, field) == value for field, value in filters.items())
+
+    def rows(self):
+        for model, (kind, filters, shared) in SOURCES.items():
+            names = model._default_manager.filter(**filters).values_list('pk', 'name').iterator(chunk_size=5000)
+            for pk, name in names:
+                yield kind, pk, name, shared
+
+    def build(self):
+        index = PrefixIndex()
+        index.load(self.rows())
+        return index
+
+    def get_index(self):
+        if self.index is None or time.monotonic() - self.built_at > REBUILD_INTERVAL:
+            with self.lock:
+                if self.index is None or time.monotonic() - self.built_at > REBUILD_INTERVAL:
+                    self.index = self.build()
+                    self.built_at = time.monotonic()
+        return self.index
+
+    def update(self, instance):
+        if self.index is None:
+            return
+        kind, filters, shared = SOURCES[type(instance)]
+        with self.lock:
+            if self.is_listed(instance):
+                self.index.add(kind, instance.pk, instance.name, shared)
+            else:
+                self.index.remove(kind, instance.pk)
+
+    def remove(self, instance):
+        if self.index is not None:
+            with self.lock:
+                self.index.remove(SOURCES[type(instance)][0], instance.pk)
+
+    def reset(self):
+        with self.lock:
+            self.index = None
+
+    def suggest(self, query, limit=8, kinds=None):
+        index = self.get_index()
+        with self.lock:
+            return index.search(query, limit, kinds)
+
+    def stats(self):
+        index = self.get_index()
+        with self.lock:
+            return index.stats()
+
+
+typeahead = Typeahead()
+
+
+def suggestion_result(suggestion):
+    kind, identity, label, rows = suggestion
+    if kind == 'shop':
+        url = reverse('sabji_market:shop_products', args=[identity])
+    elif kind == 'category':
+        url = reverse('sabji_market:products_by_category', args=[identity])
+    else:
+        # A product name spans shops: the search box takes it as the query
+        url = None
+    return {'kind': kind, 'label': label, 'rows': rows, 'url': url}
@@ -13,23 +13,33 @@ urlpatterns = [
     path('dashboard/', views.shop_dashboard, name='shop_dashboard'),
     path('shop/<int:shop_id>/', views.shop_detail, name='shop_detail'),
     path('shop/<int:shop_id>/toggle-status/', views.toggle_shop_status, name='toggle_shop_status'),
+    path('shop/<int:shop_id>/analytics/', views.shop_analytics, name='shop_analytics'),
     
     # Product management
     path('shop/<int:shop_id>/add-product/', views.add_product, name='add_product'),
+    path('shop/<int:shop_id>/products/import/', views.import_shop_products, name='import_products'),
+    path('shop/<int:shop_id>/products/batch/', views.batch_update_products, name='batch_update_products'),
+    path('shop/<int:shop_id>/products/export/', views.export_shop_products, name='export_products'),
     path('product/<int:product_id>/edit/', views.edit_product, name='edit_product'),
     path('product/<int:product_id>/delete/', views.delete_product, name='delete_product'),
     
     # Customer shopping views
     path('shops/', views.shop_list, name='shop_list'),
+    path('shops/nearby/', views.nearby_shops, name='nearby_shops'),
     path('shop/<int:shop_id>/products/', views.shop_products, name='shop_products'),
     path('categories/', views.product_categories, name='product_categories'),
     path('category/<int:category_id>/products/', views.products_by_category, name='products_by_category'),
+    path('products/facets/', views.product_facets, name='product_facets'),
+    path('search/suggest/', views.search_suggestions, name='search_suggestions'),
     
     # Cart management
     path('add-to-cart/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
     path('cart/', views.cart_view, name='cart'),
     path('cart/update/<int:item_id>/', views.update_cart_item, name='update_cart_item'),
     path('cart/remove/<int:item_id>/', views.remove_cart_item, name='remove_cart_item'),
+    path('cart/batch/', views.batch_update_cart, name='batch_update_cart'),
+    path('cart/guest/update/<int:product_id>/', views.update_guest_cart_item, name='update_guest_cart_item'),
+    path('cart/guest/remove/<int:product_id>/', views.remove_guest_cart_item, name='remove_guest_cart_item'),
     
     # Order management
     path('checkout/', views.checkout, name='checkout'),
@@ -1,11 +1,13 @@
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.core.paginator import Paginator
-from django.db.models import Q, Avg
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Prefetch
 from django.utils import timezone
-import uuid
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
 
 from .models import (
     Shop, Product, ShopCategory, ProductCategory, Cart, CartItem, 
@@ -13,19 +15,106 @@ from .models import (
 )
 from .forms import (
     ShopRegistrationForm, ProductForm, AddToCartForm, CheckoutForm,
-    ShopReviewForm, ShopSearchForm, ProductSearchForm, OrderStatusUpdateForm
+    ShopReviewForm, ShopSearchForm, ProductSearchForm, OrderStatusUpdateForm, NearbyShopsForm,
+    ProductFacetForm
 )
+from one_stop_booking_hub.conditional import conditional_page
+from one_stop_booking_hub.ids import new_id
+from one_stop_booking_hub.page_cache import cache_anonymous_page
+from one_stop_booking_hub.pagination import CursorPaginator
+from one_stop_booking_hub.reference_cache import reference_cache
+
+from . import guest_cart
+from .cart import CartSummary, GuestCartSummary, bump_version
+from .cart_operations import OperationError, VersionConflict, apply_operations
+from .checkout import place_orders
+from .facets import FACETS, faceted_search, product_result
+from .geo import nearby_shops as find_nearby_shops, pincodes
+from .inventory import OutOfStock, sync_order_stock
+from .pricing import PatchError, apply_patches, patch_result
+from .product_io import ImportFormatError, export_csv, export_ndjson, import_products
+from .ratings import record_review, with_average_rating
+from .rollups import record_order_status, sales_series, top_products
+from .search import RANK_ORDERING, search as search_catalog
+from .typeahead import KINDS, suggestion_result, typeahead
+
+# Order lines with their products, for pages that list what was ordered
+ORDER_ITEMS = Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+
+ORDERS_PER_PAGE = 10
+
+# The main query of each view, also EXPLAINed by check_query_plans (see
+# query_plans.py), so the plans checked are the ones production runs
+
+def featured_shops():
+    return Shop.objects.filter(status='active', is_open=True).select_related('category')[:6]
+
+def listed_shops(filters):
+    """Active shops for ShopSearchForm's cleaned data, as a CursorPaginator"""
+    shops = Shop.objects.filter(status='active').select_related('category')
+    ordering = ['-created_at', '-id']
+    if filters.get('search'):
+        shops = search_catalog(shops, filters['search'])
+        ordering = RANK_ORDERING
+    if filters.get('category'):
+        shops = shops.filter(category=filters['category'])
+    if filters.get('delivery_available'):
+        shops = shops.filter(is_delivery_available=True)
+    if filters.get('sort') == 'rating':
+        shops = with_average_rating(shops)
+        ordering = ['-avg_rating', '-review_count', 'id']
+    elif filters.get('sort') == 'reviews':
+        ordering = ['-review_count', 'id']
+    return CursorPaginator(shops, 12, ordering=ordering)
+
+def owner_shops(user):
+    return Shop.objects.filter(owner=user).select_related('category')
+
+def shop_inventory(shop):
+    return Product.objects.filter(shop=shop).select_related('category')
+
+def recent_shop_orders(shop):
+    return Order.objects.filter(shop=shop).select_related('customer').prefetch_related(ORDER_ITEMS).order_by('-created_at')[:10]
+
+def shop_catalog(shop, filters):
+    """Available products of ``shop`` for ProductSearchForm's cleaned data"""
+    products = Product.objects.filter(shop=shop, is_available=True)
+    if filters.get('search'):
+        products = search_catalog(products, filters['search'])
+    if filters.get('category'):
+        products = products.filter(category=filters['category'])
+    # Customers filter and sort by what they pay, not the list price
+    products = products.priced_between(filters.get('min_price'), filters.get('max_price'))
+    if filters.get('sort'):
+        products = products.order_by_price(descending=filters['sort'] == '-price')
+    return products
+
+def category_catalog(category, search=''):
+    """Available products in ``category``, as a CursorPaginator"""
+    products = Product.objects.filter(category=category, is_available=True).select_related('shop')
+    ordering = ['-created_at', '-id']
+    if search:
+        products = search_catalog(products, search)
+        ordering = RANK_ORDERING
+    return CursorPaginator(products, 12, ordering=ordering)
+
+def customer_orders(user):
+    return Order.objects.filter(customer=user).select_related('shop').prefetch_related(ORDER_ITEMS)
+
+def shop_order_list(shop):
+    return Order.objects.filter(shop=shop).select_related('customer').prefetch_related(ORDER_ITEMS)
 
 # Home view
+@cache_anonymous_page(Shop, ShopCategory, ProductCategory)
 def sabji_home(request):
-    categories = ShopCategory.objects.all()
-    featured_shops = Shop.objects.filter(status='active', is_open=True)[:6]
-    product_categories = ProductCategory.objects.all()[:8]
+    categories = reference_cache.get_list(ShopCategory.objects.all())
+    product_categories = reference_cache.get_list(ProductCategory.objects.all()[:8])
     
     context = {
         'categories': categories,
-        'featured_shops': featured_shops,
+        'featured_shops': featured_shops(),
         'product_categories': product_categories,
+        'catalog_version': reference_cache.version_tag(Shop, ShopCategory, ProductCategory),
     }
     return render(request, 'sabji_market/home.html', context)
 
@@ -62,12 +151,12 @@ def shop_payment(request, shop_id):
     if request.method == 'POST':
         # Simulate payment processing
         payment.status = 'completed'
-        payment.transaction_id = f"TXN{uuid.uuid4().hex[:10].upper()}"
+        payment.transaction_id = new_id('TXN')
         payment.save()
         
         shop.registration_fee_paid = True
         shop.status = 'active'
-        shop.save()
+        shop.save(update_fields=['registration_fee_paid', 'status', 'updated_at'])
         
         messages.success(request, 'Payment successful! Your shop is now active.')
         return redirect('sabji_market:shop_dashboard')
@@ -81,24 +170,37 @@ def shop_payment(request, shop_id):
 # Shop dashboard
 @login_required
 def shop_dashboard(request):
-    shops = Shop.objects.filter(owner=request.user)
-    context = {'shops': shops}
+    context = {'shops': owner_shops(request.user)}
     return render(request, 'sabji_market/shop_dashboard.html', context)
 
 # Shop detail view
 @login_required
 def shop_detail(request, shop_id):
     shop = get_object_or_404(Shop, id=shop_id, owner=request.user)
-    products = Product.objects.filter(shop=shop)
-    orders = Order.objects.filter(shop=shop).order_by('-created_at')[:10]
-    
     context = {
         'shop': shop,
-        'products': products,
-        'orders': orders,
+        'products': shop_inventory(shop),
+        'orders': recent_shop_orders(shop),
     }
     return render(request, 'sabji_market/shop_detail.html', context)
 
+# Shop sales analytics
+@login_required
+def shop_analytics(request, shop_id):
+    shop = get_object_or_404(Shop, id=shop_id, owner=request.user)
+    series = sales_series(shop, days=90)
+    
+    context = {
+        'shop': shop,
+        'series': series,
+        'top_products': top_products(shop, days=90),
+        'total_revenue': sum(day['revenue'] for day in series),
+        'total_orders': sum(day['orders'] for day in series),
+        'total_units': sum(day['units'] for day in series),
+        'total_cancelled': sum(day['cancelled'] for day in series),
+    }
+    return render(request, 'sabji_market/shop_analytics.html', context)
+
 # Add product
 @login_required
 def add_product(request, shop_id):
@@ -121,6 +223,53 @@ def add_product(request, shop_id):
     }
     return render(request, 'sabji_market/add_product.html', context)
 
+# Bulk product import (CSV or NDJSON upload)
+@login_required
+@require_POST
+def import_shop_products(request, shop_id):
+    shop = get_object_or_404(Shop, id=shop_id, owner=request.user)
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'Upload a CSV or NDJSON file as "file"'}, status=400)
+    
+    try:
+        result = import_products(shop, upload, format=request.POST.get('format') or None)
+    except (ImportFormatError, UnicodeDecodeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(result.as_dict())
+
+# Batch price and stock update (JSON list of patches)
+@login_required
+@require_POST
+def batch_update_products(request, shop_id):
+    shop = get_object_or_404(Shop, id=shop_id, owner=request.user)
+    try:
+        patches = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'errors': [{'index': None, 'errors': {'__all__': ['Invalid JSON']}}]}, status=400)
+    if isinstance(patches, dict):
+        patches = patches.get('patches')
+    
+    try:
+        products = apply_patches(shop, patches)
+    except PatchError as e:
+        return JsonResponse({'errors': e.errors}, status=400)
+    return JsonResponse({'products': [patch_result(product) for product in products]})
+
+# Bulk product export, streamed
+@login_required
+def export_shop_products(request, shop_id):
+    shop = get_object_or_404(Shop, id=shop_id, owner=request.user)
+    
+    if request.GET.get('format') == 'ndjson':
+        response = StreamingHttpResponse(export_ndjson(shop), content_type='application/x-ndjson')
+        extension = 'ndjson'
+    else:
+        response = StreamingHttpResponse(export_csv(shop), content_type='text/csv')
+        extension = 'csv'
+    response['Content-Disposition'] = f'attachment; filename="shop-{shop.id}-products.{extension}"'
+    return response
+
 # Edit product
 @login_required
 def edit_product(request, product_id):
@@ -142,68 +291,105 @@ def edit_product(request, product_id):
     return render(request, 'sabji_market/edit_product.html', context)
 
 # Shop list for customers
+@cache_anonymous_page(Shop, ShopCategory)
+@conditional_page(Shop, ShopCategory)
 def shop_list(request):
     form = ShopSearchForm(request.GET)
-    shops = Shop.objects.filter(status='active')
-    
-    if form.is_valid():
-        search = form.cleaned_data.get('search')
-        category = form.cleaned_data.get('category')
-        delivery_available = form.cleaned_data.get('delivery_available')
-        
-        if search:
-            shops = shops.filter(Q(name__icontains=search) | Q(description__icontains=search))
-        if category:
-            shops = shops.filter(category=category)
-        if delivery_available:
-            shops = shops.filter(is_delivery_available=True)
-    
-    paginator = Paginator(shops, 12)
-    page_number = request.GET.get('page')
-    shops = paginator.get_page(page_number)
+    paginator = listed_shops(form.cleaned_data if form.is_valid() else {})
+    shops = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'shops': shops,
         'form': form,
+        'categories': reference_cache.get_list(ShopCategory.objects.filter(is_active=True)),
     }
     return render(request, 'sabji_market/shop_list.html', context)
 
+# Shops near a pincode
+def nearby_shops(request):
+    form = NearbyShopsForm(request.GET or None)
+    shops = []
+    unknown_pincode = False
+    
+    if form.is_valid():
+        point = pincodes.lookup(form.cleaned_data['pincode'])
+        if point is None:
+            unknown_pincode = True
+        else:
+            shops = find_nearby_shops(*point, k=12)
+    
+    context = {
+        'form': form,
+        'shops': shops,
+        'unknown_pincode': unknown_pincode,
+    }
+    return render(request, 'sabji_market/nearby_shops.html', context)
+
 # Shop products view for customers
+@conditional_page(
+    lambda request, shop_id: Shop.objects.filter(pk=shop_id),
+    lambda request, shop_id: Product.objects.filter(shop_id=shop_id),
+    lambda request, shop_id: ShopReview.objects.filter(shop_id=shop_id),
+    ProductCategory,
+)
 def shop_products(request, shop_id):
-    shop = get_object_or_404(Shop, id=shop_id, status='active')
+    shop = get_object_or_404(Shop.objects.select_related('category'), id=shop_id, status='active')
     form = ProductSearchForm(request.GET)
-    products = Product.objects.filter(shop=shop, is_available=True)
-    
-    if form.is_valid():
-        search = form.cleaned_data.get('search')
-        category = form.cleaned_data.get('category')
-        min_price = form.cleaned_data.get('min_price')
-        max_price = form.cleaned_data.get('max_price')
-        
-        if search:
-            products = products.filter(Q(name__icontains=search) | Q(description__icontains=search))
-        if category:
-            products = products.filter(category=category)
-        if min_price:
-            products = products.filter(price__gte=min_price)
-        if max_price:
-            products = products.filter(price__lte=max_price)
+    products = shop_catalog(shop, form.cleaned_data if form.is_valid() else {})
     
     # Get reviews
-    reviews = ShopReview.objects.filter(shop=shop).order_by('-created_at')[:5]
-    avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
+    reviews = ShopReview.objects.filter(shop=shop).select_related('customer').order_by('-created_at')[:5]
     
     context = {
         'shop': shop,
         'products': products,
         'form': form,
         'reviews': reviews,
-        'avg_rating': round(avg_rating, 1),
+        'avg_rating': shop.average_rating,
+        'product_categories': reference_cache.get_list(ProductCategory.objects.filter(is_active=True)),
     }
     return render(request, 'sabji_market/shop_products.html', context)
 
-# Add to cart
-@login_required
+# Typeahead suggestions for the search boxes: ?q=<prefix>&kind=product|shop|category
+@require_GET
+def search_suggestions(request):
+    query = request.GET.get('q', '')[:100]
+    kinds = [kind for kind in request.GET.getlist('kind') if kind in KINDS] or None
+    suggestions = typeahead.suggest(query, kinds=kinds)
+    return JsonResponse({
+        'query': query,
+        'suggestions': [suggestion_result(suggestion) for suggestion in suggestions],
+    })
+
+# Faceted product search: a page of results with counts per category, organic, price bucket and city
+@require_GET
+def product_facets(request):
+    form = ProductFacetForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+    data = form.cleaned_data
+    products = Product.objects.filter(is_available=True, shop__status='active')
+    ordering = ['-created_at', '-id']
+    
+    if data['shop']:
+        products = products.filter(shop_id=data['shop'])
+    if data['search']:
+        products = search_catalog(products, data['search'])
+        ordering = RANK_ORDERING
+    if data['sort']:
+        ordering = ['-effective_price', '-id'] if data['sort'] == '-price' else ['effective_price', 'id']
+    
+    products, facets = faceted_search(products, {facet: data[facet] for facet in FACETS})
+    paginator = CursorPaginator(products.select_related('shop'), 24, ordering=ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [product_result(product) for product in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+        'facets': facets,
+    })
+
+# Add to cart; signed-out visitors get a guest cart in a signed cookie
 def add_to_cart(request, product_id):
     product = get_object_or_404(Product, id=product_id, is_available=True)
     
@@ -212,34 +398,55 @@ def add_to_cart(request, product_id):
         if form.is_valid():
             quantity = form.cleaned_data['quantity']
             
+            if not request.user.is_authenticated:
+                if guest_cart.add(request, product, quantity):
+                    messages.success(request, f'{product.name} added to cart!')
+                elif product.pk in guest_cart.read(request) or len(guest_cart.read(request)) < guest_cart.MAX_LINES:
+                    messages.error(request, f'Only {product.stock_quantity} {product.unit} of {product.name} in stock.')
+                else:
+                    messages.error(request, 'Your cart is full. Log in to add more items.')
+                response = redirect('sabji_market:shop_products', shop_id=product.shop_id)
+                return guest_cart.write(request, response)
+            
             cart, created = Cart.objects.get_or_create(user=request.user)
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-                defaults={'quantity': quantity}
-            )
+            cart_item = CartItem.objects.filter(cart=cart, product=product).first()
+            in_cart = cart_item.quantity if cart_item else 0
             
-            if not created:
+            if in_cart + quantity > product.stock_quantity:
+                messages.error(request, f'Only {product.stock_quantity} {product.unit} of {product.name} in stock.')
+                return redirect('sabji_market:shop_products', shop_id=product.shop.id)
+            
+            if cart_item:
                 cart_item.quantity += quantity
                 cart_item.save()
+            else:
+                CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+            bump_version(cart)
             
             messages.success(request, f'{product.name} added to cart!')
             return redirect('sabji_market:shop_products', shop_id=product.shop.id)
     
     return redirect('sabji_market:shop_products', shop_id=product.shop.id)
 
-# Cart view
-@login_required
+# Cart view; reads only, the cart row is created by the first add
 def cart_view(request):
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    context = {'cart': cart}
+    if request.user.is_authenticated:
+        cart = Cart.objects.filter(user=request.user).first()
+        summary = CartSummary(cart)
+    else:
+        cart = None
+        summary = GuestCartSummary(guest_cart.read(request))
+    context = {
+        'cart': cart,
+        'summary': summary,
+    }
     return render(request, 'sabji_market/cart.html', context)
 
 # Update cart item
 @login_required
 def update_cart_item(request, item_id):
     if request.method == 'POST':
-        cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
+        cart_item = get_object_or_404(CartItem.objects.select_related('cart'), id=item_id, cart__user=request.user)
         quantity = int(request.POST.get('quantity', 1))
         
         if quantity > 0:
@@ -247,16 +454,58 @@ def update_cart_item(request, item_id):
             cart_item.save()
         else:
             cart_item.delete()
+        bump_version(cart_item.cart)
         
         return JsonResponse({'success': True})
     
     return JsonResponse({'success': False})
 
+# Batch cart update: {"version": n, "operations": [{"op", "product", "quantity"}]}
+@login_required
+@require_http_methods(['GET', 'POST'])
+def batch_update_cart(request):
+    if request.method == 'GET':
+        cart = Cart.objects.filter(user=request.user).first()
+        return JsonResponse({'cart': CartSummary(cart).as_dict()})
+    
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict) or not isinstance(payload.get('version'), int):
+        return JsonResponse({'errors': [{'index': None, 'errors': {'__all__': ['Send a JSON object with the cart version and operations']}}]}, status=400)
+    
+    try:
+        cart = apply_operations(request.user, payload['version'], payload.get('operations'))
+    except OperationError as e:
+        return JsonResponse({'errors': e.errors}, status=400)
+    except VersionConflict as e:
+        return JsonResponse({'errors': [{'index': None, 'errors': {'version': ['The cart changed; reload it and try again']}}],
+                             'cart': CartSummary(e.cart).as_dict()}, status=409)
+    return JsonResponse({'cart': CartSummary(cart).as_dict()})
+
+# Update a guest cart line
+@require_POST
+def update_guest_cart_item(request, product_id):
+    try:
+        quantity = int(request.POST.get('quantity', 1))
+    except ValueError:
+        return JsonResponse({'success': False})
+    guest_cart.set_quantity(request, product_id, quantity)
+    return guest_cart.write(request, JsonResponse({'success': True}))
+
+# Remove a guest cart line
+def remove_guest_cart_item(request, product_id):
+    guest_cart.set_quantity(request, product_id, 0)
+    messages.success(request, 'Item removed from cart!')
+    return guest_cart.write(request, redirect('sabji_market:cart'))
+
 # Remove cart item
 @login_required
 def remove_cart_item(request, item_id):
-    cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
+    cart_item = get_object_or_404(CartItem.objects.select_related('cart'), id=item_id, cart__user=request.user)
     cart_item.delete()
+    bump_version(cart_item.cart)
     messages.success(request, 'Item removed from cart!')
     return redirect('sabji_market:cart')
 
@@ -265,67 +514,43 @@ def remove_cart_item(request, item_id):
 def checkout(request):
     cart = get_object_or_404(Cart, user=request.user)
     
-    if not cart.items.exists():
+    summary = CartSummary(cart)
+    
+    if not summary:
         messages.error(request, 'Your cart is empty!')
         return redirect('sabji_market:cart')
     
-    # Group cart items by shop
-    shops_data = {}
-    for item in cart.items.all():
-        shop = item.product.shop
-        if shop not in shops_data:
-            shops_data[shop] = {
-                'items': [],
-                'subtotal': 0,
-                'delivery_charge': shop.delivery_charge if shop.is_delivery_available else 0,
-            }
-        shops_data[shop]['items'].append(item)
-        shops_data[shop]['subtotal'] += item.get_total_price()
+    # Cart items grouped by shop
+    shops_data = summary.shops
     
     if request.method == 'POST':
         form = CheckoutForm(request.POST, user=request.user)
         if form.is_valid():
-            # Create orders for each shop
-            for shop, data in shops_data.items():
-                delivery_type = form.cleaned_data['delivery_type']
-                delivery_charge = data['delivery_charge'] if delivery_type == 'delivery' else 0
-                
-                order = Order.objects.create(
-                    order_id=f"ORD{uuid.uuid4().hex[:8].upper()}",
-                    customer=request.user,
-                    shop=shop,
+            try:
+                orders, timings = place_orders(
+                    request.user,
+                    summary,
                     customer_name=form.cleaned_data['customer_name'],
                     customer_phone=form.cleaned_data['customer_phone'],
+                    delivery_type=form.cleaned_data['delivery_type'],
                     delivery_address=form.cleaned_data['delivery_address'],
-                    delivery_type=delivery_type,
-                    subtotal=data['subtotal'],
-                    delivery_charge=delivery_charge,
-                    total_amount=data['subtotal'] + delivery_charge,
                 )
-                
-                # Create order items
-                for item in data['items']:
-                    OrderItem.objects.create(
-                        order=order,
-                        product=item.product,
-                        quantity=item.quantity,
-                        price=item.product.get_discounted_price()
-                    )
-            
-            # Clear cart
-            cart.items.all().delete()
+            except OutOfStock as e:
+                product = next(item.product for item in summary if item.product_id == e.product_id)
+                messages.error(request, f'Sorry, {product.name} does not have enough stock left. Please update your cart.')
+                return redirect('sabji_market:cart')
             
             messages.success(request, 'Order placed successfully!')
-            return redirect('sabji_market:order_success')
+            response = redirect('sabji_market:order_success')
+            response['Server-Timing'] = timings.as_server_timing()
+            return response
     else:
         form = CheckoutForm(user=request.user)
     
-    total_amount = sum([data['subtotal'] + data['delivery_charge'] for data in shops_data.values()])
-    
     context = {
         'form': form,
         'shops_data': shops_data,
-        'total_amount': total_amount,
+        'total_amount': summary.total_amount,
     }
     return render(request, 'sabji_market/checkout.html', context)
 
@@ -337,19 +562,17 @@ def order_success(request):
 # My orders
 @login_required
 def my_orders(request):
-    orders = Order.objects.filter(customer=request.user).order_by('-created_at')
-    
-    paginator = Paginator(orders, 10)
-    page_number = request.GET.get('page')
-    orders = paginator.get_page(page_number)
+    paginator = CursorPaginator(customer_orders(request.user), ORDERS_PER_PAGE)
+    orders = paginator.get_page(request.GET.get('cursor'))
     
     context = {'orders': orders}
     return render(request, 'sabji_market/my_orders.html', context)
 
 # Order detail
 @login_required
+@conditional_page(lambda request, order_id: Order.objects.filter(order_id=order_id, customer=request.user))
 def order_detail(request, order_id):
-    order = get_object_or_404(Order, order_id=order_id, customer=request.user)
+    order = get_object_or_404(customer_orders(request.user), order_id=order_id)
     context = {'order': order}
     return render(request, 'sabji_market/order_detail.html', context)
 
@@ -357,11 +580,8 @@ def order_detail(request, order_id):
 @login_required
 def shop_orders(request, shop_id):
     shop = get_object_or_404(Shop, id=shop_id, owner=request.user)
-    orders = Order.objects.filter(shop=shop).order_by('-created_at')
-    
-    paginator = Paginator(orders, 10)
-    page_number = request.GET.get('page')
-    orders = paginator.get_page(page_number)
+    paginator = CursorPaginator(shop_order_list(shop), ORDERS_PER_PAGE)
+    orders = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'shop': shop,
@@ -377,8 +597,19 @@ def update_order_status(request, order_id):
     if request.method == 'POST':
         form = OrderStatusUpdateForm(request.POST, instance=order)
         if form.is_valid():
-            form.save()
-            messages.success(request, 'Order status updated successfully!')
+            try:
+                with transaction.atomic():
+                    # The status the row holds under lock: two concurrent changes
+                    # must not both see the old status and both release stock or
+                    # both count the transition in the rollups
+                    previous_status = Order.objects.select_for_update().values_list('status', flat=True).get(pk=order.pk)
+                    form.save()
+                    sync_order_stock(order, previous_status)
+                    record_order_status(order, previous_status)
+            except OutOfStock:
+                messages.error(request, 'Not enough stock left to restore this cancelled order.')
+            else:
+                messages.success(request, 'Order status updated successfully!')
             return redirect('sabji_market:shop_orders', shop_id=order.shop.id)
     else:
         form = OrderStatusUpdateForm(instance=order)
@@ -404,22 +635,30 @@ def add_review(request, shop_id):
     if request.method == 'POST':
         form = ShopReviewForm(request.POST)
         if form.is_valid():
-            review, created = ShopReview.objects.get_or_create(
-                shop=shop,
-                customer=request.user,
-                defaults={
-                    'rating': form.cleaned_data['rating'],
-                    'comment': form.cleaned_data['comment']
-                }
-            )
+            rating = form.cleaned_data['rating']
+            with transaction.atomic():
+                review, created = ShopReview.objects.get_or_create(
+                    shop=shop,
+                    customer=request.user,
+                    defaults={
+                        'rating': rating,
+                        'comment': form.cleaned_data['comment']
+                    }
+                )
+                
+                if not created:
+                    previous_rating = review.rating
+                    review.rating = rating
+                    review.comment = form.cleaned_data['comment']
+                    review.save()
+                    record_review(shop, rating, previous_rating=previous_rating)
+                else:
+                    record_review(shop, rating)
             
-            if not created:
-                review.rating = form.cleaned_data['rating']
-                review.comment = form.cleaned_data['comment']
-                review.save()
-                messages.success(request, 'Review updated successfully!')
-            else:
+            if created:
                 messages.success(request, 'Review added successfully!')
+            else:
+                messages.success(request, 'Review updated successfully!')
             
             return redirect('sabji_market:shop_products', shop_id=shop.id)
     else:
@@ -434,24 +673,26 @@ def add_review(request, shop_id):
     return render(request, 'sabji_market/add_review.html', context)
 
 # Product categories
+@cache_anonymous_page(ProductCategory)
+@conditional_page(ProductCategory)
 def product_categories(request):
-    categories = ProductCategory.objects.all()
-    context = {'categories': categories}
+    categories = reference_cache.get_list(ProductCategory.objects.all())
+    context = {
+        'categories': categories,
+        'catalog_version': reference_cache.version_tag(ProductCategory),
+    }
     return render(request, 'sabji_market/product_categories.html', context)
 
 # Products by category
+@conditional_page(
+    ProductCategory,
+    lambda request, category_id: Product.objects.filter(category_id=category_id),
+    lambda request, category_id: Shop.objects.filter(products__category_id=category_id),
+)
 def products_by_category(request, category_id):
     category = get_object_or_404(ProductCategory, id=category_id)
-    products = Product.objects.filter(category=category, is_available=True)
-    
-    # Search functionality
     search = request.GET.get('search', '')
-    if search:
-        products = products.filter(Q(name__icontains=search) | Q(description__icontains=search))
-    
-    paginator = Paginator(products, 12)
-    page_number = request.GET.get('page')
-    products = paginator.get_page(page_number)
+    products = category_catalog(category, search).get_page(request.GET.get('cursor'))
     
     context = {
         'category': category,
@@ -479,7 +720,7 @@ def delete_product(request, product_id):
 def toggle_shop_status(request, shop_id):
     shop = get_object_or_404(Shop, id=shop_id, owner=request.user)
     shop.is_open = not shop.is_open
-    shop.save()
+    shop.save(update_fields=['is_open', 'updated_at'])
     
     status = "opened" if shop.is_open else "closed"
     messages.success(request, f'Shop {status} successfully!')